@@ -1,6 +1,26 @@
 import streamlit as st
-from rag import analyze_html, get_vectorstore_chunks
-from pdf import gerar_pdf_relatorio
+from config import LARGE_UPLOAD_PROMPT_BYTES, METRICS_PORT, STREAMING_PARSE_THRESHOLD
+from findings import FindingsError
+from rag import analyze_html_stream, get_vectorstore_chunks, pre_analyze_file, warmup, WCAG_PDF_PATH
+from pdf import gerar_pdf_bytes
+from tracing import trace, start_metrics_server
+
+
+# ------------------------------------------------
+# Inicialização única do LLM e do vectorstore por processo
+# ------------------------------------------------
+@st.cache_resource
+def inicializar_servidor() -> dict:
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    return warmup()
+
+
+try:
+    inicializar_servidor()
+except FileNotFoundError:
+    st.error(f"❌ PDF WCAG não encontrado em '{WCAG_PDF_PATH}'")
+    st.stop()
 
 # ------------------------------------------------
 # Tradução do botão "Browse files" para português
@@ -48,11 +68,26 @@ uploaded_file = st.file_uploader(
 )
 
 nome_arquivo = None
+arquivo_grande = False
 
 if uploaded_file is not None:
     nome_arquivo = uploaded_file.name
-    html_from_file = uploaded_file.read().decode("utf-8", errors="ignore")
-    st.session_state["html_input"] = html_from_file
+    # uploaded_file.size está em bytes, a mesma unidade do limite
+    if uploaded_file.size >= STREAMING_PARSE_THRESHOLD:
+        # Os bytes do upload já estão na memória do Streamlit; o que se
+        # evita é a cópia decodificada, o editor, a sessão e a árvore do
+        # BeautifulSoup. As regras leem o próprio arquivo em blocos e só o
+        # início dele vai para o prompt do LLM.
+        arquivo_grande = True
+        st.info(
+            f"📄 Arquivo de {uploaded_file.size / (1024 * 1024):.1f} MB: as regras "
+            "automáticas analisam o arquivo inteiro em modo streaming, mas o modelo "
+            f"recebe apenas os primeiros {LARGE_UPLOAD_PROMPT_BYTES // 1024} KB. "
+            "O arquivo não é exibido no editor."
+        )
+    else:
+        html_from_file = uploaded_file.read().decode("utf-8", errors="ignore")
+        st.session_state["html_input"] = html_from_file
 
 # ------------------------------------------------
 # Entrada do usuário
@@ -68,31 +103,59 @@ st.session_state["html_input"] = html_input
 # ------------------------------------------------
 # Ação
 # ------------------------------------------------
+def exibir_relatorio(html: str, sinais: list | None = None):
+    """
+    Repassa o Markdown do stream ao st.write_stream e guarda o relatório
+    estruturado (valor de retorno do gerador) na sessão.
+    """
+    st.session_state.pop("resultado", None)
+    relatorio = yield from analyze_html_stream(html, sinais)
+    if relatorio is not None:
+        st.session_state["resultado"] = relatorio
+
 
 col1, col2 = st.columns([3, 1])
 
 with col1:
     if st.button("Analisar Acessibilidade"):
+        sinais = None
+        if arquivo_grande:
+            uploaded_file.seek(0)
+            sinais = pre_analyze_file(uploaded_file)
+            uploaded_file.seek(0)
+            html_input = uploaded_file.read(LARGE_UPLOAD_PROMPT_BYTES).decode("utf-8", errors="ignore")
         if not html_input.strip():
             st.warning("⚠️ Preencha o campo com um código ou anexe um arquivo HTML para análise.")
         else:
-            with st.spinner("Analisando acessibilidade com base no WCAG..."):
-                resultado = analyze_html(html_input)
+            st.subheader("Relatório de Acessibilidade")
 
-            st.session_state["resultado"] = resultado
+            # Cada falha é exibida assim que o LLM termina de gerá-la;
+            # o relatório estruturado fica na sessão para o PDF.
+            with trace("requisicao_streamlit") as registro:
+                with st.spinner("Analisando acessibilidade com base no WCAG..."):
+                    try:
+                        st.write_stream(exibir_relatorio(html_input, sinais))
+                    except FindingsError as e:
+                        # Só uma resposta ilegível como um todo chega aqui;
+                        # itens inválidos já foram descartados no stream
+                        st.error(f"❌ Não foi possível ler o relatório gerado pelo modelo: {e}")
 
-            st.subheader("Relatório de Acessibilidade")
-            st.markdown(resultado)
+            # Painel de debug (apenas com WCAG_TRACING=1)
+            if registro is not None:
+                with st.expander("Debug: tempos por etapa"):
+                    st.json(registro)
 
 with col2:
     if "resultado" in st.session_state:
-        pdf = gerar_pdf_relatorio(
-            texto=st.session_state["resultado"],
-            nome_arquivo_html=nome_arquivo
-            )
+        # O PDF só é gerado quando o download é solicitado (callable)
+        # e fica memoizado por hash do relatório, nome do arquivo e template
+        relatorio = st.session_state["resultado"]
         st.download_button(
             label="Baixar Relatório",
-            data=pdf,
+            data=lambda: gerar_pdf_bytes(
+                relatorio=relatorio,
+                nome_arquivo_html=nome_arquivo,
+            ),
             file_name="relatorio_acessibilidade_wcag.pdf",
             mime="application/pdf"
         )
@@ -0,0 +1,143 @@
+# ============================================================
+# Benchmark dos tipos de índice vetorial: flat x HNSW x IVF-PQ
+# ============================================================
+# Calcula uma vez os embeddings do corpus (corpus.embed_texts, em lotes
+# paralelos) e constrói os três tipos de índice sobre os mesmos vetores.
+# Para as queries de bench_retrieval mede, em relação à busca exata
+# (flat): recall@k (fração dos documentos entre os k vizinhos exatos
+# que o índice devolve nos seus k primeiros), tempo médio por query,
+# tempo de construção e tamanho serializado do índice.
+#
+# --escala N replica o corpus N vezes com ruído gaussiano (vetores
+# renormalizados), para simular um corpus maior que o atual. As cópias
+# de um mesmo chunk são quase idênticas, então o recall compara os
+# documentos de origem (posição módulo o tamanho do corpus), não as cópias.
+#
+# Usa o provedor de embeddings configurado; para rodar offline:
+#   WCAG_EMBEDDING_PROVIDER=local python benchmarks/bench_ann.py
+#
+# Uso: python benchmarks/bench_ann.py [--escala N] [k1 k2 ...]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_retrieval import gerar_consultas  # noqa: E402
+from config import (  # noqa: E402
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_WORKERS,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    IVF_NLIST,
+    IVF_NPROBE,
+    LOCAL_EMBEDDING_DIM,
+    OPENAI_API_KEY,
+    PQ_M,
+    PQ_NBITS,
+)
+from corpus import build_index_documents, embed_texts  # noqa: E402
+from embedding_providers import create_embeddings  # noqa: E402
+from index_store import INDEX_TYPES, configure_search, create_ann_index, index_build_params  # noqa: E402
+
+RUIDO = 0.02
+
+
+def escalar(vetores: np.ndarray, escala: int, semente: int = 7) -> np.ndarray:
+    if escala <= 1:
+        return vetores
+    sorteio = np.random.default_rng(semente)
+    copias = [vetores]
+    for _ in range(escala - 1):
+        copia = vetores + sorteio.normal(0, RUIDO, vetores.shape).astype(np.float32)
+        copia /= np.linalg.norm(copia, axis=1, keepdims=True)
+        copias.append(copia)
+    return np.vstack(copias)
+
+
+def main(ks: list, escala: int) -> None:
+    import faiss
+
+    embeddings = create_embeddings(
+        EMBEDDING_PROVIDER,
+        openai_model=EMBEDDING_MODEL,
+        api_key=OPENAI_API_KEY,
+        local_dim=LOCAL_EMBEDDING_DIM,
+    )
+    documentos = build_index_documents()
+
+    inicio = time.perf_counter()
+    vetores = embed_texts(embeddings, [doc.page_content for doc in documentos])
+    tempo_embeddings = time.perf_counter() - inicio
+    print(
+        f"{len(documentos)} documentos: embeddings em {tempo_embeddings:.2f}s "
+        f"(lotes de {EMBEDDING_BATCH_SIZE}, {EMBEDDING_WORKERS} workers)"
+    )
+
+    vetores = escalar(vetores, escala)
+    consultas = np.asarray(
+        [embeddings.embed_query(consulta) for consulta, _ in gerar_consultas()], dtype=np.float32
+    )
+    profundidade = max(ks)
+
+    exato = faiss.IndexFlatL2(vetores.shape[1])
+    exato.add(vetores)
+    _, vizinhos_exatos = exato.search(consultas, profundidade)
+    origens_exatas = vizinhos_exatos % len(documentos)
+    print(f"{vetores.shape[0]} vetores de dimensão {vetores.shape[1]}, {len(consultas)} consultas\n")
+
+    print(
+        f"{'índice':>8} " + " ".join(f"{'R@' + str(k):>7}" for k in ks)
+        + f" {'ms/query':>9} {'build s':>8} {'MB':>7}"
+    )
+    for tipo in INDEX_TYPES:
+        params = index_build_params(
+            tipo,
+            hnsw_m=HNSW_M,
+            hnsw_ef_construction=HNSW_EF_CONSTRUCTION,
+            ivf_nlist=IVF_NLIST,
+            pq_m=PQ_M,
+            pq_nbits=PQ_NBITS,
+        )
+        inicio = time.perf_counter()
+        indice = create_ann_index(vetores, params)
+        tempo_build = time.perf_counter() - inicio
+        configure_search(indice, ef_search=HNSW_EF_SEARCH, nprobe=IVF_NPROBE)
+
+        # Uma query por vez, como no retrieval de uma auditoria
+        inicio = time.perf_counter()
+        vizinhos = np.vstack([indice.search(consulta[None, :], profundidade)[1] for consulta in consultas])
+        tempo = (time.perf_counter() - inicio) / len(consultas)
+
+        origens = vizinhos % len(documentos)
+        recall = {
+            k: np.mean([
+                len(set(obtidos[:k]) & set(esperados[:k])) / len(set(esperados[:k]))
+                for obtidos, esperados in zip(origens, origens_exatas)
+            ])
+            for k in ks
+        }
+        tamanho = faiss.serialize_index(indice).nbytes / (1024 * 1024)
+
+        print(
+            f"{tipo:>8} "
+            + " ".join(f"{recall[k]:>7.3f}" for k in ks)
+            + f" {tempo * 1000:>9.3f} {tempo_build:>8.2f} {tamanho:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    escala = 1
+    if "--escala" in argumentos:
+        posicao = argumentos.index("--escala")
+        escala = int(argumentos[posicao + 1])
+        del argumentos[posicao:posicao + 2]
+    ks = [int(arg) for arg in argumentos] or [1, 5, 10, 20]
+    main(ks, escala)
@@ -0,0 +1,91 @@
+# ============================================================
+# Benchmark da recuperação: vetorial x BM25 x híbrida (RRF)
+# ============================================================
+# Para cada frase de SIGNAL_TO_CRITERIA (e combinações de 2 e 3 frases,
+# como numa página com vários sinais) monta a query de busca e mede o
+# recall de critérios em k: fração dos critérios da query que têm ao
+# menos um documento (chunk da WCAG ou técnica) entre os k primeiros.
+# Também informa o tempo médio por query de cada método.
+#
+# Usa o provedor de embeddings configurado; para rodar offline:
+#   WCAG_EMBEDDING_PROVIDER=local python benchmarks/bench_retrieval.py
+#
+# Uso: python benchmarks/bench_retrieval.py [k1 k2 ...]
+
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag import (  # noqa: E402
+    CRITERION_NUMBER,
+    QUERY_PREFIX,
+    SIGNAL_TO_CRITERIA,
+    get_lexical_index,
+    get_vectorstore,
+    hybrid_search,
+    vector_search,
+)
+
+PROFUNDIDADE = 30
+
+
+def gerar_consultas(combinacoes: int = 40, semente: int = 7) -> list:
+    frases = list(dict.fromkeys(SIGNAL_TO_CRITERIA.values()))
+    grupos = [[frase] for frase in frases]
+    sorteio = random.Random(semente)
+    for tamanho in (2, 3):
+        todos = list(itertools.combinations(frases, tamanho))
+        grupos += [list(g) for g in sorteio.sample(todos, min(combinacoes, len(todos)))]
+
+    consultas = []
+    for grupo in grupos:
+        criterios = set(CRITERION_NUMBER.findall(" ".join(grupo)))
+        consultas.append((QUERY_PREFIX + " ".join(grupo), criterios))
+    return consultas
+
+
+def criterios_do_documento(vectorstore, doc_id: str) -> set:
+    metadata = vectorstore.docstore.search(doc_id).metadata
+    return set(metadata.get("criteria", [])) | {metadata.get("criterion")}
+
+
+def main(ks: list) -> None:
+    vectorstore = get_vectorstore()
+    lexical = get_lexical_index()
+    metodos = {
+        "vetorial": lambda q: vector_search(q, PROFUNDIDADE),
+        "bm25": lambda q: lexical.search(q, PROFUNDIDADE),
+        "híbrida": lambda q: hybrid_search(q, PROFUNDIDADE),
+    }
+
+    consultas = gerar_consultas()
+    print(f"{len(consultas)} consultas, {vectorstore.index.ntotal} documentos\n")
+    print(f"{'método':>10} " + " ".join(f"{'R@' + str(k):>7}" for k in ks) + f" {'ms/query':>9}")
+
+    for nome, buscar in metodos.items():
+        recall = {k: 0.0 for k in ks}
+        inicio = time.perf_counter()
+        rankings = [buscar(consulta) for consulta, _ in consultas]
+        tempo = (time.perf_counter() - inicio) / len(consultas)
+
+        for ids, (_, criterios) in zip(rankings, consultas):
+            for k in ks:
+                cobertos = set()
+                for doc_id in ids[:k]:
+                    cobertos |= criterios_do_documento(vectorstore, doc_id)
+                recall[k] += len(criterios & cobertos) / len(criterios)
+
+        print(
+            f"{nome:>10} "
+            + " ".join(f"{recall[k] / len(consultas):>7.3f}" for k in ks)
+            + f" {tempo * 1000:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    ks = [int(arg) for arg in sys.argv[1:]] or [3, 5, 8, 12, 18]
+    main(ks)
@@ -0,0 +1,53 @@
+# ============================================================
+# Benchmark do motor de regras (rules.run_rules)
+# ============================================================
+# Gera páginas com N controles de formulário (metade sem label) e mede
+# o tempo da pré-análise. Com a passada única indexada o tempo por
+# controle deve ficar aproximadamente constante (escala linear).
+#
+# Uso: python benchmarks/bench_rules.py [N1 N2 ...]
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rules import run_rules  # noqa: E402
+
+
+def gerar_pagina(n_controles: int) -> str:
+    campos = []
+    for i in range(n_controles):
+        if i % 2 == 0:
+            campos.append(f'<label for="campo{i}">Campo {i}</label><input type="text" id="campo{i}">')
+        elif i % 3 == 0:
+            campos.append(f'<select id="sel{i}"><option>{i}</option></select>')
+        else:
+            campos.append(f'<input type="text" id="campo{i}" name="campo{i}">')
+    return (
+        '<html lang="pt-BR"><head><title>Formulário</title></head><body>'
+        f'<form>{"".join(campos)}<button>Enviar</button></form>'
+        "</body></html>"
+    )
+
+
+def medir(html: str, repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        run_rules(html)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main(tamanhos: list) -> None:
+    print(f"{'controles':>10} {'tempo (ms)':>12} {'µs/controle':>12}")
+    for n in tamanhos:
+        tempo = medir(gerar_pagina(n))
+        print(f"{n:>10} {tempo * 1000:>12.1f} {tempo / n * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [500, 1000, 2000, 4000, 8000]
+    main(tamanhos)
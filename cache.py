@@ -0,0 +1,185 @@
+# ============================================================
+# Cache de resultados de auditoria (endereçado por conteúdo)
+# ============================================================
+# Dois níveis:
+#   1. LRU em memória (por processo), para hits em microssegundos;
+#   2. SQLite em disco, compartilhado entre processos/workers, com
+#      expiração por TTL e despejo por tamanho total.
+# A chave é um hash SHA-256 de tudo que determina o relatório.
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_html(html: str) -> str:
+    """
+    Normalização conservadora: quebras de linha, espaços no fim das
+    linhas e espaços nas extremidades não alteram o relatório.
+    """
+    html = html.replace("\r\n", "\n").replace("\r", "\n")
+    html = re.sub(r"[ \t]+\n", "\n", html)
+    return html.strip()
+
+
+def make_cache_key(*parts) -> str:
+    """
+    Gera a chave a partir de partes serializáveis em JSON
+    (HTML normalizado, sinais, versão do prompt, modelo, índice...).
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        db_path: str | None,
+        memory_items: int = 128,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.db_path = db_path
+        self.memory_items = memory_items
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    " key TEXT PRIMARY KEY,"
+                    " value TEXT NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " created REAL NOT NULL,"
+                    " accessed REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed)")
+
+    @contextmanager
+    def _connect(self):
+        # Uma conexão por operação: seguro entre threads e processos
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[0]
+            if entry is not None:
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT value, created FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and now - row[1] > self.ttl_seconds:
+                        conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                        row = None
+                    elif row is not None:
+                        conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logger.warning(f"Cache em disco indisponível: {e}")
+                row = None
+
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                self._count("disk_hits")
+                return row[0]
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        self._remember(key, value, now)
+        self._count("writes")
+
+        if not self.db_path:
+            return
+
+        size = len(value.encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar no cache em disco: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute(
+            "DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,)
+        ).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        removed = 0
+        if total > self.max_bytes:
+            # Remove os menos acessados recentemente até caber no limite
+            for key, size in conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed ASC"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+
+        if expired or removed:
+            with self._lock:
+                self._counters["evictions"] += expired + removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM results")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,327 @@
+# ============================================================
+# Auditor em lote via linha de comando
+# ============================================================
+# Audita diretórios inteiros (ex: saída de build de um site estático)
+# ou listas de arquivos. Parse e regras rodam em um pool de processos
+# (cada worker com seu próprio GIL); as chamadas ao LLM são assíncronas
+# e passam pelo agendador compartilhado (llm_scheduler.py). Gera um
+# relatório por arquivo (Markdown e JSON estruturado), um resumo, e
+# registra o progresso para permitir retomar execuções interrompidas.
+#
+# Uso:
+#   python cli.py site/_build --output relatorios --mode rules
+#   python cli.py --file-list arquivos.txt --mode full --llm-concurrency 4 --pdf
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from findings import dump_report, render_markdown
+from pdf import extrair_estatisticas, gerar_pdf_relatorio
+from rag import analyze_html, analyze_html_async, audit_version, pre_analyze_html
+
+logger = logging.getLogger(__name__)
+
+HTML_SUFFIXES = {".html", ".htm"}
+PROGRESS_FILE = "progresso.jsonl"
+SUMMARY_FILE = "resumo.json"
+
+
+# ============================================================
+# Descoberta de arquivos
+# ============================================================
+def discover_files(paths: list, file_list: str | None = None) -> list:
+    """
+    Retorna pares (arquivo, caminho relativo) para cada HTML encontrado.
+    O caminho relativo parte do ancestral comum de todas as entradas e
+    define onde o relatório é gravado na saída: arquivos de mesmo nome
+    em diretórios diferentes (a/index.html, b/index.html) não colidem.
+    """
+    found = []
+    anchors = []
+    entries = [Path(p) for p in paths]
+    if file_list:
+        with open(file_list, encoding="utf-8") as f:
+            entries.extend(Path(line.strip()) for line in f if line.strip())
+
+    for entry in entries:
+        if entry.is_dir():
+            anchors.append(entry.absolute())
+            for root, _, files in os.walk(entry):
+                for name in sorted(files):
+                    if Path(name).suffix.lower() in HTML_SUFFIXES:
+                        found.append(Path(root) / name)
+        elif entry.is_file():
+            anchors.append(entry.absolute().parent)
+            found.append(entry)
+        else:
+            logger.warning(f"Caminho ignorado (não encontrado): {entry}")
+
+    # Mesmo arquivo citado mais de uma vez (ex: diretório + lista): audita uma vez
+    unique = {}
+    for path in found:
+        unique.setdefault(Path(os.path.normpath(path.absolute())), path)
+    if not unique:
+        return []
+
+    base = Path(os.path.commonpath([os.path.normpath(anchor) for anchor in anchors]))
+    return [(path, absolute.relative_to(base)) for absolute, path in unique.items()]
+
+
+def _report_path(output_dir: Path, relative: Path, suffix: str) -> Path:
+    return output_dir / relative.with_suffix(relative.suffix + suffix)
+
+
+# ============================================================
+# Etapa 1 — parse + regras (pool de processos)
+# ============================================================
+def _rules_job(path: str, mode: str) -> dict:
+    """
+    Executado em um processo worker. No modo "rules" produz o relatório
+    final; no modo "full" calcula apenas os sinais para a etapa do LLM.
+    Os modos "segmented" e "incremental" calculam sinais por segmento,
+    então aqui só é lido o hash do arquivo.
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        raw = f.read()
+    html = raw.decode("utf-8", errors="ignore")
+
+    result = {"path": path, "sha256": hashlib.sha256(raw).hexdigest()}
+    if mode == "rules":
+        result["report"] = analyze_html(html, mode="rules")
+    elif mode == "full":
+        result["signals"] = pre_analyze_html(html)
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+def _pdf_job(report: dict, html_name: str, pdf_path: str) -> None:
+    Path(pdf_path).parent.mkdir(parents=True, exist_ok=True)
+    buffer = gerar_pdf_relatorio(relatorio=report, nome_arquivo_html=html_name)
+    with open(pdf_path, "wb") as f:
+        f.write(buffer.getvalue())
+
+
+def _write_report(md_path: Path, json_path: Path, report: dict) -> dict:
+    md_path.parent.mkdir(parents=True, exist_ok=True)
+    md_path.write_text(render_markdown(report), encoding="utf-8")
+    json_path.write_text(dump_report(report), encoding="utf-8")
+    return extrair_estatisticas(report)
+
+
+# ============================================================
+# Progresso retomável
+# ============================================================
+def _file_sha256(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_progress(progress_path: Path) -> dict:
+    done = {}
+    if progress_path.exists():
+        with open(progress_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Linha parcial de uma execução interrompida
+                    continue
+                done[entry["path"]] = entry
+    return done
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct * len(ordered)) - 1)]
+
+
+# ============================================================
+# Orquestração
+# ============================================================
+async def run_batch(
+    files: list,
+    output_dir: Path,
+    mode: str = "rules",
+    workers: int | None = None,
+    llm_concurrency: int = 4,
+    write_pdf: bool = False,
+    resume: bool = True,
+) -> dict:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    progress_path = output_dir / PROGRESS_FILE
+    done = load_progress(progress_path) if resume else {}
+    # Retomar só vale para a mesma configuração (modo, PDF, prompt e índice)
+    version = await asyncio.to_thread(audit_version, mode)
+
+    loop = asyncio.get_running_loop()
+    llm_semaphore = asyncio.Semaphore(max(1, llm_concurrency))
+
+    results = []
+    # Só dos arquivos auditados nesta execução (os retomados trazem a
+    # latência da execução anterior)
+    latencies = []
+    errors = []
+    skipped = 0
+
+    with open(progress_path, "a" if resume else "w", encoding="utf-8") as progress, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def record(entry: dict) -> None:
+            # Chamado só no event loop: as linhas de progresso não se intercalam
+            progress.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            progress.flush()
+            results.append(entry)
+            latencies.append(entry["latency"])
+
+        async def process(path: Path, relative: Path) -> None:
+            nonlocal skipped
+            try:
+                # Arquivo e configuração inalterados desde a última execução: reaproveita
+                previous = done.get(str(path))
+                if (
+                    previous
+                    and previous.get("mode") == mode
+                    and previous.get("pdf") == write_pdf
+                    and previous.get("version") == version
+                    and previous["sha256"] == await asyncio.to_thread(_file_sha256, path)
+                ):
+                    skipped += 1
+                    results.append(previous)
+                    return
+
+                job = await loop.run_in_executor(pool, _rules_job, str(path), mode)
+
+                latency = job["latency"]
+                if mode == "rules":
+                    report = job["report"]
+                else:
+                    async with llm_semaphore:
+                        # Lido só com a vaga do LLM: limita quantos HTMLs ficam na memória
+                        html = await asyncio.to_thread(path.read_text, encoding="utf-8", errors="ignore")
+                        start = time.perf_counter()
+                        report = await analyze_html_async(html, mode, job.get("signals"))
+                        latency += time.perf_counter() - start
+
+                md_path = _report_path(output_dir, relative, ".md")
+                json_path = _report_path(output_dir, relative, ".json")
+                if write_pdf:
+                    # ReportLab é CPU puro: também vai para o pool de processos
+                    pdf_path = _report_path(output_dir, relative, ".pdf")
+                    await loop.run_in_executor(pool, _pdf_job, report, path.name, str(pdf_path))
+                stats = await asyncio.to_thread(_write_report, md_path, json_path, report)
+
+                record({
+                    "path": str(path),
+                    "sha256": job["sha256"],
+                    "mode": mode,
+                    "pdf": write_pdf,
+                    "version": version,
+                    "report": str(md_path),
+                    "report_json": str(json_path),
+                    "latency": latency,
+                    "total": stats["total"],
+                    "por_nivel": stats["por_nivel"],
+                })
+            except Exception as e:
+                logger.error(f"Falha ao auditar {path}: {e}")
+                errors.append({"path": str(path), "erro": str(e)})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(process(path, relative) for path, relative in files))
+        elapsed = time.perf_counter() - start
+
+    summary = {
+        "modo": mode,
+        "arquivos": len(files),
+        "auditados": len(results) - skipped,
+        "retomados": skipped,
+        "erros": errors,
+        "com_falhas": sum(1 for r in results if r["total"] > 0),
+        "total_falhas": sum(r["total"] for r in results),
+        "tempo_total_s": elapsed,
+        "arquivos_por_s": (len(results) - skipped) / elapsed if elapsed > 0 else 0.0,
+        "latencia_p50_s": _percentile(latencies, 0.50),
+        "latencia_p95_s": _percentile(latencies, 0.95),
+        "arquivos_detalhe": sorted(results, key=lambda r: r["path"]),
+    }
+
+    with open(output_dir / SUMMARY_FILE, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Auditoria de acessibilidade WCAG 2.1 em lote para arquivos HTML.",
+    )
+    parser.add_argument("paths", nargs="*", help="Arquivos .html ou diretórios a auditar")
+    parser.add_argument("--file-list", help="Arquivo texto com um caminho por linha")
+    parser.add_argument("--output", default="relatorios", help="Diretório de saída (padrão: relatorios)")
+    parser.add_argument(
+        "--mode", choices=("rules", "full", "segmented", "incremental"), default="rules",
+        help="rules = offline, sem LLM (padrão); full/segmented/incremental = RAG + LLM "
+             "(incremental reaproveita as seções inalteradas)",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Processos para parse/regras (padrão: nº de CPUs)")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Chamadas simultâneas ao LLM (padrão: 4)")
+    parser.add_argument("--pdf", action="store_true", help="Gera também o PDF de cada relatório")
+    parser.add_argument("--no-resume", action="store_true", help="Ignora o progresso salvo e audita tudo novamente")
+    parser.add_argument(
+        "--fail-on-findings", action="store_true",
+        help="Retorna código de saída 1 se algum arquivo tiver falhas (útil em CI)",
+    )
+    return parser
+
+
+def main(argv: list | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    args = build_parser().parse_args(argv)
+
+    files = discover_files(args.paths, args.file_list)
+    if not files:
+        print("Nenhum arquivo HTML encontrado.", file=sys.stderr)
+        return 2
+
+    summary = asyncio.run(run_batch(
+        files,
+        output_dir=Path(args.output),
+        mode=args.mode,
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        write_pdf=args.pdf,
+        resume=not args.no_resume,
+    ))
+
+    print(
+        f"{summary['auditados']} auditado(s), {summary['retomados']} retomado(s), "
+        f"{len(summary['erros'])} erro(s) | {summary['total_falhas']} critério(s) com falha "
+        f"em {summary['com_falhas']} arquivo(s)"
+    )
+    print(
+        f"{summary['arquivos_por_s']:.1f} arquivos/s | "
+        f"p50 {summary['latencia_p50_s'] * 1000:.1f} ms | p95 {summary['latencia_p95_s'] * 1000:.1f} ms"
+    )
+    print(f"Resumo: {Path(args.output) / SUMMARY_FILE}")
+
+    if summary["erros"]:
+        return 1
+    if args.fail_on_findings and summary["com_falhas"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
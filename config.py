@@ -1,16 +1,109 @@
 import os
+import threading
+
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Provedor de embeddings: "openai" (EMBEDDING_MODEL via API) ou "local"
+# (TF-IDF com hashing em CPU, sem rede nem chave de API)
+EMBEDDING_PROVIDER = os.getenv("WCAG_EMBEDDING_PROVIDER", "openai")
+# Dimensão dos vetores do provedor local
+LOCAL_EMBEDDING_DIM = int(os.getenv("WCAG_LOCAL_EMBEDDING_DIM", "2048"))
+
+# Diretório onde o índice FAISS pré-construído é persistido
+INDEX_DIR = os.getenv("WCAG_INDEX_DIR", ".cache/wcag_index")
+
+# Tipo do índice vetorial: "flat" (busca exata), "hnsw" (grafo) ou
+# "ivfpq" (listas invertidas + vetores comprimidos por quantização)
+INDEX_TYPE = os.getenv("WCAG_INDEX_TYPE", "flat")
+# Parâmetros de construção (fazem parte da chave do índice)
+HNSW_M = int(os.getenv("WCAG_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("WCAG_HNSW_EF_CONSTRUCTION", "80"))
+IVF_NLIST = int(os.getenv("WCAG_IVF_NLIST", "256"))
+PQ_M = int(os.getenv("WCAG_PQ_M", "64"))
+PQ_NBITS = int(os.getenv("WCAG_PQ_NBITS", "8"))
+# Parâmetros de busca (aplicados ao carregar; não exigem reconstrução)
+HNSW_EF_SEARCH = int(os.getenv("WCAG_HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("WCAG_IVF_NPROBE", "16"))
+
+# PDFs adicionais para o corpus (ex: documentos "Understanding" e técnicas
+# da W3C), separados por os.pathsep
+EXTRA_SOURCES = [path for path in os.getenv("WCAG_EXTRA_SOURCES", "").split(os.pathsep) if path]
+
+# Embeddings dos documentos na construção do índice: lotes, chamadas
+# paralelas e novas tentativas por lote
+EMBEDDING_BATCH_SIZE = int(os.getenv("WCAG_EMBEDDING_BATCH_SIZE", "128"))
+EMBEDDING_WORKERS = int(os.getenv("WCAG_EMBEDDING_WORKERS", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("WCAG_EMBEDDING_MAX_RETRIES", "5"))
+
+# Orçamento de tokens do prompt enviado ao LLM (template + sinais + contexto + HTML)
+PROMPT_TOKEN_BUDGET = int(os.getenv("WCAG_PROMPT_TOKEN_BUDGET", "24000"))
+
+# Tamanho (bytes do HTML em UTF-8) a partir do qual a pré-análise por
+# regras usa o parser incremental (rules_streaming.py) em vez da árvore
+# completa. Vale tanto para texto colado quanto para arquivos enviados
+STREAMING_PARSE_THRESHOLD = int(os.getenv("WCAG_STREAMING_PARSE_THRESHOLD", str(2 * 1024 * 1024)))
+# Uploads acima do limite: só este início do arquivo (bytes) vai para o
+# prompt do LLM; as regras em streaming cobrem o arquivo inteiro
+LARGE_UPLOAD_PROMPT_BYTES = int(os.getenv("WCAG_LARGE_UPLOAD_PROMPT_BYTES", str(256 * 1024)))
+
+# Máximo de segmentos auditados em paralelo no modo "segmented"
+SEGMENT_CONCURRENCY = int(os.getenv("WCAG_SEGMENT_CONCURRENCY", "4"))
+
+# Agendador das chamadas assíncronas ao LLM (compartilhado pelo processo)
+LLM_MAX_CONCURRENCY = int(os.getenv("WCAG_LLM_MAX_CONCURRENCY", "8"))
+# Orçamento de tokens por minuto (0 = sem limite); ajustar à cota da conta
+LLM_TOKENS_PER_MINUTE = int(os.getenv("WCAG_LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("WCAG_LLM_MAX_RETRIES", "5"))
+
+# Instrumentação por etapa (desligada por padrão)
+TRACING_ENABLED = os.getenv("WCAG_TRACING", "0") == "1"
+# Arquivo com métricas no formato texto do Prometheus (opcional)
+METRICS_FILE = os.getenv("WCAG_METRICS_FILE")
+# Porta do endpoint HTTP de métricas (opcional)
+METRICS_PORT = int(os.getenv("WCAG_METRICS_PORT", "0")) or None
+
+# Cache de resultados de auditoria (LRU em memória + SQLite em disco)
+RESULT_CACHE_ENABLED = os.getenv("WCAG_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_PATH = os.getenv("WCAG_RESULT_CACHE_PATH", ".cache/results.sqlite3")
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("WCAG_RESULT_CACHE_MEMORY_ITEMS", "128"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("WCAG_RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("WCAG_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Cache de embeddings das queries de busca (LRU em memória + SQLite em disco)
+EMBEDDING_CACHE_ENABLED = os.getenv("WCAG_EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_PATH = os.getenv("WCAG_EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("WCAG_EMBEDDING_CACHE_MEMORY_ITEMS", "256"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("WCAG_EMBEDDING_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("WCAG_EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+# ============================================================
+# LLM criado sob demanda
+# ============================================================
+# Importar este módulo não constrói o cliente nem importa
+# langchain_openai; o LLM só é criado na primeira chamada a get_llm().
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
 
-llm = ChatOpenAI(
-    model=MODEL,
-    api_key=OPENAI_API_KEY,
-)
+                _llm = ChatOpenAI(
+                    model=MODEL,
+                    api_key=OPENAI_API_KEY,
+                )
 
-print(f"SDK detectado. LLM: {MODEL} via OpenAI")
-print("✅ Ambiente configurado com sucesso!")
+                print(f"SDK detectado. LLM: {MODEL} via OpenAI")
+                print("✅ Ambiente configurado com sucesso!")
+    return _llm
@@ -0,0 +1,401 @@
+# ============================================================
+# Análise de contraste (WCAG 1.4.3 / 1.4.6)
+# ============================================================
+# Resolve cor do texto e cor de fundo de cada elemento com texto,
+# herdando dos ancestrais (a cor do texto é herdada; os fundos
+# semitransparentes são compostos sobre o do ancestral, partindo do
+# branco padrão do navegador), e calcula luminância relativa e razão de
+# contraste de todos os elementos de uma vez com NumPy.
+#
+# As declarações de cada elemento vêm de uma função (no motor de
+# regras, a cascata de stylesheet.py): o analisador não depende de onde o CSS foi declarado.
+# Fundos com imagem/gradiente e valores não reconhecidos tornam o par
+# de cores indeterminado: esses elementos voltam como "a verificar".
+# Texto oculto (display: none, visibility: hidden/collapse ou atributo
+# hidden, no elemento ou num ancestral) não é medido.
+
+import re
+
+import numpy as np
+from bs4 import Comment, NavigableString, Tag
+
+# Razões exigidas (texto normal, texto grande)
+AA_RATIOS = (4.5, 3.0)
+AAA_RATIOS = (7.0, 4.5)
+
+# Texto grande: 18pt (24px), ou 14pt (18.66px) em negrito
+LARGE_TEXT_PX = 24.0
+LARGE_BOLD_TEXT_PX = 18.66
+
+DEFAULT_FONT_PX = 16.0
+DEFAULT_FOREGROUND = (0.0, 0.0, 0.0, 1.0)
+DEFAULT_BACKGROUND = (255.0, 255.0, 255.0)
+
+# Tamanhos e pesos padrão do navegador
+DEFAULT_TAG_FONT_PX = {"h1": 32.0, "h2": 24.0, "h3": 18.72, "h4": 16.0, "h5": 13.28, "h6": 10.72}
+DEFAULT_BOLD_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "b", "strong", "th"}
+
+FONT_SIZE_KEYWORDS = {
+    "xx-small": 9.0, "x-small": 10.0, "small": 13.0, "medium": 16.0,
+    "large": 18.0, "x-large": 24.0, "xx-large": 32.0, "xxx-large": 48.0,
+}
+
+# Elementos cujo texto não é renderizado
+NON_RENDERED_TAGS = {"script", "style", "head", "title", "meta", "link", "noscript", "template", "option"}
+
+NAMED_COLORS = {
+    "black": "000000", "silver": "c0c0c0", "gray": "808080", "grey": "808080", "white": "ffffff",
+    "maroon": "800000", "red": "ff0000", "purple": "800080", "fuchsia": "ff00ff", "green": "008000",
+    "lime": "00ff00", "olive": "808000", "yellow": "ffff00", "navy": "000080", "blue": "0000ff",
+    "teal": "008080", "aqua": "00ffff", "orange": "ffa500", "aliceblue": "f0f8ff",
+    "antiquewhite": "faebd7", "aquamarine": "7fffd4", "azure": "f0ffff", "beige": "f5f5dc",
+    "bisque": "ffe4c4", "blanchedalmond": "ffebcd", "blueviolet": "8a2be2", "brown": "a52a2a",
+    "burlywood": "deb887", "cadetblue": "5f9ea0", "chartreuse": "7fff00", "chocolate": "d2691e",
+    "coral": "ff7f50", "cornflowerblue": "6495ed", "cornsilk": "fff8dc", "crimson": "dc143c",
+    "cyan": "00ffff", "darkblue": "00008b", "darkcyan": "008b8b", "darkgoldenrod": "b8860b",
+    "darkgray": "a9a9a9", "darkgrey": "a9a9a9", "darkgreen": "006400", "darkkhaki": "bdb76b",
+    "darkmagenta": "8b008b", "darkolivegreen": "556b2f", "darkorange": "ff8c00",
+    "darkorchid": "9932cc", "darkred": "8b0000", "darksalmon": "e9967a", "darkseagreen": "8fbc8f",
+    "darkslateblue": "483d8b", "darkslategray": "2f4f4f", "darkslategrey": "2f4f4f",
+    "darkturquoise": "00ced1", "darkviolet": "9400d3", "deeppink": "ff1493",
+    "deepskyblue": "00bfff", "dimgray": "696969", "dimgrey": "696969", "dodgerblue": "1e90ff",
+    "firebrick": "b22222", "floralwhite": "fffaf0", "forestgreen": "228b22", "gainsboro": "dcdcdc",
+    "ghostwhite": "f8f8ff", "gold": "ffd700", "goldenrod": "daa520", "greenyellow": "adff2f",
+    "honeydew": "f0fff0", "hotpink": "ff69b4", "indianred": "cd5c5c", "indigo": "4b0082",
+    "ivory": "fffff0", "khaki": "f0e68c", "lavender": "e6e6fa", "lavenderblush": "fff0f5",
+    "lawngreen": "7cfc00", "lemonchiffon": "fffacd", "lightblue": "add8e6", "lightcoral": "f08080",
+    "lightcyan": "e0ffff", "lightgoldenrodyellow": "fafad2", "lightgray": "d3d3d3",
+    "lightgrey": "d3d3d3", "lightgreen": "90ee90", "lightpink": "ffb6c1", "lightsalmon": "ffa07a",
+    "lightseagreen": "20b2aa", "lightskyblue": "87cefa", "lightslategray": "778899",
+    "lightslategrey": "778899", "lightsteelblue": "b0c4de", "lightyellow": "ffffe0",
+    "limegreen": "32cd32", "linen": "faf0e6", "magenta": "ff00ff", "mediumaquamarine": "66cdaa",
+    "mediumblue": "0000cd", "mediumorchid": "ba55d3", "mediumpurple": "9370db",
+    "mediumseagreen": "3cb371", "mediumslateblue": "7b68ee", "mediumspringgreen": "00fa9a",
+    "mediumturquoise": "48d1cc", "mediumvioletred": "c71585", "midnightblue": "191970",
+    "mintcream": "f5fffa", "mistyrose": "ffe4e1", "moccasin": "ffe4b5", "navajowhite": "ffdead",
+    "oldlace": "fdf5e6", "olivedrab": "6b8e23", "orangered": "ff4500", "orchid": "da70d6",
+    "palegoldenrod": "eee8aa", "palegreen": "98fb98", "paleturquoise": "afeeee",
+    "palevioletred": "db7093", "papayawhip": "ffefd5", "peachpuff": "ffdab9", "peru": "cd853f",
+    "pink": "ffc0cb", "plum": "dda0dd", "powderblue": "b0e0e6", "rebeccapurple": "663399",
+    "rosybrown": "bc8f8f", "royalblue": "4169e1", "saddlebrown": "8b4513", "salmon": "fa8072",
+    "sandybrown": "f4a460", "seagreen": "2e8b57", "seashell": "fff5ee", "sienna": "a0522d",
+    "skyblue": "87ceeb", "slateblue": "6a5acd", "slategray": "708090", "slategrey": "708090",
+    "snow": "fffafa", "springgreen": "00ff7f", "steelblue": "4682b4", "tan": "d2b48c",
+    "thistle": "d8bfd8", "tomato": "ff6347", "turquoise": "40e0d0", "violet": "ee82ee",
+    "wheat": "f5deb3", "whitesmoke": "f5f5f5", "yellowgreen": "9acd32",
+}
+
+HEX_PATTERN = re.compile(r"#([0-9a-f]{3,4}|[0-9a-f]{6}|[0-9a-f]{8})\b")
+FUNCTION_PATTERN = re.compile(r"\b(rgba?|hsla?)\(([^)]*)\)")
+NAMED_PATTERN = re.compile(r"\b(" + "|".join(sorted(NAMED_COLORS, key=len, reverse=True)) + r"|transparent)\b")
+FONT_SIZE_PATTERN = re.compile(r"^(-?[\d.]+)(px|pt|em|rem|%)$")
+
+# Valor não resolvível estaticamente (var(), gradiente, imagem...)
+UNKNOWN = object()
+
+
+# ============================================================
+# Valores CSS
+# ============================================================
+def _channel(value: str, scale: float) -> float:
+    value = value.strip()
+    if value.endswith("%"):
+        return float(value[:-1]) * scale / 100.0
+    return float(value)
+
+
+def _hsl_to_rgb(h: float, s: float, l: float) -> tuple:
+    h = (h % 360) / 360.0
+    q = l * (1 + s) if l < 0.5 else l + s - l * s
+    p = 2 * l - q
+
+    def hue(t: float) -> float:
+        t %= 1.0
+        if t < 1 / 6:
+            return p + (q - p) * 6 * t
+        if t < 1 / 2:
+            return q
+        if t < 2 / 3:
+            return p + (q - p) * (2 / 3 - t) * 6
+        return p
+
+    return hue(h + 1 / 3) * 255, hue(h) * 255, hue(h - 1 / 3) * 255
+
+
+def parse_color(value: str):
+    """
+    Cor CSS -> (r, g, b, alpha) com r/g/b em 0–255. Aceita hex (#rgb,
+    #rgba, #rrggbb, #rrggbbaa), rgb()/rgba(), hsl()/hsla() e nomes.
+    Retorna UNKNOWN se o valor não puder ser resolvido e None se não
+    houver cor (ex: "none").
+    """
+    value = value.strip().lower()
+    if not value or value == "none":
+        return None
+    if value in ("inherit", "currentcolor", "unset", "initial", "revert") or "var(" in value:
+        return UNKNOWN
+
+    match = HEX_PATTERN.fullmatch(value)
+    if match:
+        digits = match.group(1)
+        if len(digits) <= 4:
+            digits = "".join(d * 2 for d in digits)
+        alpha = int(digits[6:8], 16) / 255.0 if len(digits) == 8 else 1.0
+        return int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16), alpha
+
+    match = FUNCTION_PATTERN.fullmatch(value)
+    if match:
+        # Sintaxe com vírgulas ou moderna: rgb(0 0 0 / 50%)
+        args = re.split(r"[,\s/]+", match.group(2).strip())
+        try:
+            alpha = _channel(args[3], 1.0) if len(args) > 3 else 1.0
+            if match.group(1).startswith("rgb"):
+                r, g, b = (_channel(a, 255.0) for a in args[:3])
+            else:
+                h = float(args[0].removesuffix("deg"))
+                r, g, b = _hsl_to_rgb(h, _channel(args[1], 1.0), _channel(args[2], 1.0))
+        except (ValueError, IndexError):
+            return UNKNOWN
+        return (
+            min(max(r, 0.0), 255.0), min(max(g, 0.0), 255.0), min(max(b, 0.0), 255.0),
+            min(max(alpha, 0.0), 1.0),
+        )
+
+    if value == "transparent":
+        return 0.0, 0.0, 0.0, 0.0
+    if value in NAMED_COLORS:
+        digits = NAMED_COLORS[value]
+        return int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16), 1.0
+    return UNKNOWN
+
+
+def background_color(declarations: dict):
+    """
+    Cor de fundo declarada (background-color ou a cor do atalho
+    background). UNKNOWN para imagens/gradientes, None se não houver.
+    """
+    value = declarations.get("background-color")
+    shorthand = declarations.get("background")
+    if shorthand is not None:
+        if "url(" in shorthand or "gradient(" in shorthand or "var(" in shorthand:
+            return UNKNOWN
+        if value is None:
+            tokens = HEX_PATTERN.search(shorthand) or FUNCTION_PATTERN.search(shorthand) or NAMED_PATTERN.search(shorthand)
+            value = tokens.group(0) if tokens else None
+            if value is None and shorthand not in ("none", "initial", "unset"):
+                return UNKNOWN
+    if "background-image" in declarations and declarations["background-image"] != "none":
+        return UNKNOWN
+    return parse_color(value) if value is not None else None
+
+
+def font_size_px(value: str, parent_px: float):
+    value = value.strip().lower()
+    if value in FONT_SIZE_KEYWORDS:
+        return FONT_SIZE_KEYWORDS[value]
+    if value == "smaller":
+        return parent_px / 1.2
+    if value == "larger":
+        return parent_px * 1.2
+    match = FONT_SIZE_PATTERN.match(value)
+    if not match:
+        return UNKNOWN
+    number, unit = float(match.group(1)), match.group(2)
+    if unit == "px":
+        return number
+    if unit == "pt":
+        return number * 4.0 / 3.0
+    if unit == "rem":
+        return number * DEFAULT_FONT_PX
+    if unit == "em":
+        return number * parent_px
+    return number * parent_px / 100.0
+
+
+def _is_bold(value: str, parent_bold: bool) -> bool:
+    value = value.strip().lower()
+    if value in ("bold", "bolder"):
+        return True
+    if value in ("normal", "lighter"):
+        return False
+    try:
+        return int(value) >= 700
+    except ValueError:
+        return parent_bold
+
+
+# ============================================================
+# Estilo resolvido (herança pelos ancestrais, memoizada)
+# ============================================================
+# Estilo de um elemento: (cor do texto rgba, fundo rgb opaco ou UNKNOWN,
+# tamanho da fonte px ou UNKNOWN, negrito, com cor declarada, oculto).
+# Oculto: None, "display" (display: none; vale para toda a subárvore) ou
+# "visibility" (herdado, mas um descendente pode voltar a ser visível)
+ROOT_STYLE = (DEFAULT_FOREGROUND, DEFAULT_BACKGROUND, DEFAULT_FONT_PX, False, False, None)
+
+HIDDEN_VISIBILITY = {"hidden", "collapse"}
+
+
+def _blend(top: tuple, bottom: tuple) -> tuple:
+    alpha = top[3]
+    return tuple(top[i] * alpha + bottom[i] * (1 - alpha) for i in range(3))
+
+
+def _hidden(el: Tag, parent_hidden, declarations: dict):
+    if parent_hidden == "display":
+        return parent_hidden
+    # O atributo hidden equivale a display: none na folha do navegador
+    display = declarations.get("display", "none" if el.has_attr("hidden") else None)
+    if display == "none":
+        return "display"
+    visibility = declarations.get("visibility")
+    if visibility in HIDDEN_VISIBILITY:
+        return "visibility"
+    if visibility == "visible":
+        return None
+    return parent_hidden
+
+
+def own_style(el: Tag, parent: tuple, declarations: dict) -> tuple:
+    fg, bg, size, bold, styled, hidden = parent
+    hidden = _hidden(el, hidden, declarations)
+
+    if el.name in DEFAULT_TAG_FONT_PX:
+        size = DEFAULT_TAG_FONT_PX[el.name]
+    if el.name in DEFAULT_BOLD_TAGS:
+        bold = True
+
+    if "color" in declarations:
+        value = declarations["color"]
+        if value == "initial":
+            fg = DEFAULT_FOREGROUND
+        elif value not in ("inherit", "currentcolor", "unset", "revert"):
+            fg = parse_color(value)
+            if fg is None:
+                fg = parent[0]
+        styled = True
+
+    own_bg = background_color(declarations)
+    if own_bg is not None:
+        styled = True
+        if own_bg is UNKNOWN:
+            bg = UNKNOWN
+        elif own_bg[3] >= 1.0:
+            bg = own_bg[:3]
+        elif bg is not UNKNOWN and own_bg[3] > 0.0:
+            bg = _blend(own_bg, bg)
+
+    if "font-size" in declarations and size is not UNKNOWN:
+        size = font_size_px(declarations["font-size"], size)
+    if "font-weight" in declarations:
+        bold = _is_bold(declarations["font-weight"], bold)
+
+    return fg, bg, size, bold, styled, hidden
+
+
+def resolve_styles(elements: list, declarations_of) -> list:
+    """
+    Estilo resolvido de cada elemento, subindo pelos ancestrais só até
+    o primeiro já resolvido (memo por id): O(n) no total.
+    """
+    memo = {}
+    resolved = []
+    for el in elements:
+        chain = []
+        node = el
+        while isinstance(node, Tag) and id(node) not in memo and node.name != "[document]":
+            chain.append(node)
+            node = node.parent
+        style = memo.get(id(node), ROOT_STYLE)
+        for node in reversed(chain):
+            style = own_style(node, style, declarations_of(node))
+            memo[id(node)] = style
+        resolved.append(style)
+    return resolved
+
+
+def has_text(el: Tag) -> bool:
+    """Elemento com texto visível próprio (não apenas nos filhos)."""
+    if el.name in NON_RENDERED_TAGS:
+        return False
+    return any(
+        isinstance(child, NavigableString) and not isinstance(child, Comment) and child.strip()
+        for child in el.children
+    )
+
+
+# ============================================================
+# Razões de contraste (vetorizado)
+# ============================================================
+def relative_luminance(rgb: np.ndarray) -> np.ndarray:
+    """Luminância relativa WCAG de uma matriz N×3 (0–255)."""
+    srgb = rgb / 255.0
+    linear = np.where(srgb <= 0.03928, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+    return linear @ np.array([0.2126, 0.7152, 0.0722])
+
+
+def contrast_ratios(foreground: np.ndarray, background: np.ndarray) -> np.ndarray:
+    """
+    Razões de contraste de N pares. foreground N×4 (rgba) é composto
+    sobre background N×3 antes do cálculo.
+    """
+    alpha = foreground[:, 3:4]
+    fg = foreground[:, :3] * alpha + background * (1 - alpha)
+    l1 = relative_luminance(fg)
+    l2 = relative_luminance(background)
+    return (np.maximum(l1, l2) + 0.05) / (np.minimum(l1, l2) + 0.05)
+
+
+def measure_contrast(elements: list, styles: list) -> dict:
+    """
+    Mede o contraste de elementos cujo estilo resolvido já é conhecido
+    (ex: resolvido durante a passada em streaming). Só os elementos
+    visíveis com cores declaradas (próprias ou herdadas) entram. Retorna
+    {"measured": [...], "undetermined": [elementos]}; cada item medido
+    traz elemento, razão, exigências AA/AAA e se o texto é grande.
+    """
+    measured_elements = []
+    foregrounds = []
+    backgrounds = []
+    large = []
+    undetermined = []
+    for el, (fg, bg, size, bold, styled, hidden) in zip(elements, styles):
+        if not styled or hidden:
+            # Cores padrão do navegador (preto sobre branco) ou texto oculto
+            continue
+        if fg is UNKNOWN or bg is UNKNOWN:
+            undetermined.append(el)
+            continue
+        measured_elements.append(el)
+        foregrounds.append(fg)
+        backgrounds.append(bg)
+        large.append(size is not UNKNOWN and (size >= LARGE_TEXT_PX or (bold and size >= LARGE_BOLD_TEXT_PX)))
+
+    measured = []
+    if measured_elements:
+        ratios = contrast_ratios(
+            np.asarray(foregrounds, dtype=np.float64),
+            np.asarray(backgrounds, dtype=np.float64),
+        )
+        large_mask = np.asarray(large)
+        required_aa = np.where(large_mask, AA_RATIOS[1], AA_RATIOS[0])
+        required_aaa = np.where(large_mask, AAA_RATIOS[1], AAA_RATIOS[0])
+        for i, el in enumerate(measured_elements):
+            measured.append({
+                "element": el,
+                "ratio": float(ratios[i]),
+                "required_aa": float(required_aa[i]),
+                "required_aaa": float(required_aaa[i]),
+                "large": bool(large_mask[i]),
+            })
+
+    return {"measured": measured, "undetermined": undetermined}
+
+
+def analyze_contrast(elements: list, declarations_of) -> dict:
+    """
+    Mede o contraste dos elementos com texto do DOM, resolvendo o
+    estilo de cada um pelos ancestrais (ver measure_contrast).
+    """
+    candidates = [el for el in elements if has_text(el)]
+    return measure_contrast(candidates, resolve_styles(candidates, declarations_of))
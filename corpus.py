@@ -0,0 +1,297 @@
+# ============================================================
+# Corpus do índice: fontes, chunking e embeddings em lote
+# ============================================================
+# O índice reúne várias fontes, cada uma com o seu carregador e os seus
+# metadados ("source", "source_kind"), que acompanham todos os chunks:
+#   - o documento completo da WCAG 2.1 (até o glossário e os propósitos
+#     de entrada; changelog, agradecimentos e índice remissivo ficam de fora),
+#     dividido por critério de sucesso;
+#   - as Técnicas de Falha de wcag_techniques;
+#   - PDFs adicionais de WCAG_EXTRA_SOURCES (ex: "Understanding"),
+#     divididos pelo splitter genérico.
+#
+# Os embeddings dos documentos são calculados em lotes, com chamadas
+# paralelas e novas tentativas por lote. Cada lote pronto é gravado num
+# diretório de checkpoint: uma construção interrompida (queda, cota da
+# API) retoma de onde parou em vez de pagar todos os embeddings de novo.
+
+import hashlib
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config import EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_RETRIES, EMBEDDING_WORKERS, EXTRA_SOURCES
+from wcag_techniques import WCAG_FAILURE_TECHNIQUES
+
+logger = logging.getLogger(__name__)
+
+WCAG_PDF_PATH = "assets/WCAG21-completo.pdf"
+
+# Padrão para detectar início de critérios WCAG
+# Captura variações como "Critério de Sucesso 1.1.1" ou "1.1.1 Conteúdo Não Textual"
+CRITERIA_PATTERN = r'(?=(?:Critério de Sucesso\s+|Success Criterion\s+)?\d+\.\d+\.\d+[\s\u2013\u2014–—-]+[A-ZÀ-Ú])'
+
+CRITERION_NUMBER = re.compile(r"\d+\.\d+\.\d+")
+
+# Parâmetros do chunking — fazem parte da chave do índice persistido
+SPLITTER_PARAMS = {
+    "pattern": CRITERIA_PATTERN,
+    "chunk_size": 1200,
+    "chunk_overlap": 200,
+    "max_criterion_chars": 2000,
+    "min_general_chars": 200,
+}
+
+# Fontes fixas do corpus. "pages" = [primeira, última) (base 0): no PDF
+# completo, a página 80 começa no Apêndice A (Change Log)
+CORPUS_SOURCES = [
+    {"id": "wcag21", "type": "wcag_pdf", "path": WCAG_PDF_PATH, "kind": "normative", "pages": [0, 80]},
+    {"id": "failure_techniques", "type": "techniques", "kind": "technique"},
+]
+
+# Espera máxima entre tentativas de um lote de embeddings (segundos)
+EMBEDDING_BACKOFF_MAX = 30.0
+
+
+# ============================================================
+# Fontes
+# ============================================================
+def corpus_sources(extra_paths: list = EXTRA_SOURCES) -> list:
+    """
+    Fontes fixas + PDFs adicionais (id = nome do arquivo sem extensão).
+    """
+    extra = [
+        {"id": Path(path).stem, "type": "pdf", "path": path, "kind": "supplementary"}
+        for path in extra_paths
+    ]
+    return CORPUS_SOURCES + extra
+
+
+def _load_pdf_pages(source: dict) -> list:
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = PyPDFLoader(source["path"]).load()
+    if "pages" in source:
+        first, last = source["pages"]
+        pages = [page for page in pages if first <= page.metadata.get("page", 0) < last]
+    return pages
+
+
+# ============================================================
+# MELHORIA 2: Chunking semântico por critério WCAG
+# ============================================================
+def split_by_wcag_criteria(documents: list) -> list:
+    """
+    Divide os documentos WCAG por limite de critério de sucesso,
+    mantendo cada critério como um chunk coeso em vez de cortar
+    no meio com splitter genérico.
+    """
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    full_text = "\n".join([doc.page_content for doc in documents])
+
+    sections = re.split(SPLITTER_PARAMS["pattern"], full_text)
+
+    criterion_docs = []
+    fallback_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=SPLITTER_PARAMS["chunk_size"],
+        chunk_overlap=SPLITTER_PARAMS["chunk_overlap"],
+    )
+
+    for section in sections:
+        section = section.strip()
+        if not section:
+            continue
+
+        criterion_match = re.match(r'(\d+\.\d+\.\d+)', section)
+
+        if criterion_match:
+            criterion_num = criterion_match.group(1)
+            if len(section) > SPLITTER_PARAMS["max_criterion_chars"]:
+                sub_chunks = fallback_splitter.split_text(section)
+                for i, chunk in enumerate(sub_chunks):
+                    criterion_docs.append(Document(
+                        page_content=chunk,
+                        metadata={"criterion": criterion_num, "chunk_part": i},
+                    ))
+            else:
+                criterion_docs.append(Document(
+                    page_content=section,
+                    metadata={"criterion": criterion_num},
+                ))
+        else:
+            if len(section) > SPLITTER_PARAMS["min_general_chars"]:
+                sub_chunks = fallback_splitter.split_text(section)
+                for chunk in sub_chunks:
+                    criterion_docs.append(Document(
+                        page_content=chunk,
+                        metadata={"type": "general"},
+                    ))
+
+    return criterion_docs
+
+
+def _split_general(documents: list) -> list:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=SPLITTER_PARAMS["chunk_size"],
+        chunk_overlap=SPLITTER_PARAMS["chunk_overlap"],
+    )
+    chunks = splitter.split_documents(documents)
+    for chunk in chunks:
+        chunk.metadata = {"type": "general", "page": chunk.metadata.get("page")}
+    return chunks
+
+
+def _technique_documents(techniques: list) -> list:
+    from langchain_core.documents import Document
+
+    # Critérios citados na primeira linha ("... — Critério 1.4.3 ... / 1.4.6 ...")
+    return [
+        Document(
+            page_content=tech["content"],
+            metadata={
+                "type": "technique",
+                "technique_id": tech["id"],
+                "criteria": CRITERION_NUMBER.findall(tech["content"].split("\n", 1)[0]),
+            },
+        )
+        for tech in techniques
+    ]
+
+
+def load_source(source: dict) -> list:
+    """
+    Chunks de uma fonte, já com os metadados da fonte.
+    """
+    if source["type"] == "wcag_pdf":
+        documents = split_by_wcag_criteria(_load_pdf_pages(source))
+    elif source["type"] == "pdf":
+        documents = _split_general(_load_pdf_pages(source))
+    elif source["type"] == "techniques":
+        documents = _technique_documents(WCAG_FAILURE_TECHNIQUES)
+    else:
+        raise ValueError(f"Tipo de fonte desconhecido: {source['type']!r}")
+
+    for document in documents:
+        document.metadata["source"] = source["id"]
+        document.metadata["source_kind"] = source["kind"]
+    return documents
+
+
+def build_index_documents(sources: list | None = None) -> list:
+    """
+    Documentos que compõem o índice, na ordem das fontes.
+    """
+    documents = []
+    for source in sources if sources is not None else corpus_sources():
+        loaded = load_source(source)
+        logger.info(f"Fonte '{source['id']}': {len(loaded)} documentos")
+        documents += loaded
+    return documents
+
+
+def source_fingerprints(sources: list) -> list:
+    """
+    Descrição de cada fonte + hash do arquivo, para a chave do índice.
+    """
+    fingerprints = []
+    for source in sources:
+        entry = dict(source)
+        if "path" in source:
+            digest = hashlib.sha256()
+            with open(source["path"], "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            entry["sha256"] = digest.hexdigest()
+        fingerprints.append(entry)
+    return fingerprints
+
+
+# ============================================================
+# Embeddings em lote
+# ============================================================
+def _embed_with_retry(embeddings, texts: list, max_retries: int) -> np.ndarray:
+    from llm_scheduler import is_retryable
+
+    for attempt in range(max_retries + 1):
+        try:
+            return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            # Backoff exponencial com jitter total, como no agendador do LLM
+            delay = random.uniform(0, min(EMBEDDING_BACKOFF_MAX, 2 ** attempt))
+            logger.warning(
+                f"Lote de embeddings falhou ({e}); tentativa {attempt + 2} de "
+                f"{max_retries + 1} em {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def _batch_path(checkpoint_dir: Path, position: int, texts: list) -> Path:
+    digest = hashlib.sha256("\0".join(texts).encode("utf-8")).hexdigest()[:16]
+    return checkpoint_dir / f"{position:05d}-{digest}.npy"
+
+
+def _save_batch(path: Path, vectors: np.ndarray) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def embed_texts(
+    embeddings,
+    texts: list,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    workers: int = EMBEDDING_WORKERS,
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+    checkpoint_dir: Path | None = None,
+) -> np.ndarray:
+    """
+    Matriz (len(texts), dim) float32 com os embeddings dos textos, na
+    ordem recebida. Os lotes rodam em paralelo e falhas transitórias
+    (429, 5xx, conexão) são repetidas com backoff. Com checkpoint_dir,
+    lotes já calculados (mesma posição e mesmo conteúdo) são lidos do
+    disco em vez de recalculados.
+    """
+    if hasattr(embeddings, "fit"):
+        # Provedor com estado (IDF): ajustado no corpus inteiro, antes dos lotes
+        embeddings.fit(texts)
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if checkpoint_dir is not None:
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def embed_batch(position: int) -> np.ndarray:
+        batch = batches[position]
+        path = _batch_path(checkpoint_dir, position, batch) if checkpoint_dir is not None else None
+        if path is not None and path.exists():
+            try:
+                vectors = np.load(path)
+                if vectors.shape[0] == len(batch):
+                    return vectors
+            except (OSError, ValueError):
+                pass
+        vectors = _embed_with_retry(embeddings, batch, max_retries)
+        if path is not None:
+            _save_batch(path, vectors)
+        return vectors
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(embed_batch, range(len(batches))))
+    return np.vstack(results) if results else np.zeros((0, 0), dtype=np.float32)
@@ -0,0 +1,244 @@
+# ============================================================
+# Tabela de critérios WCAG 2.1 (número -> nome, nível, princípio...)
+# ============================================================
+# Extraída uma única vez do PDF da WCAG, quando o índice é construído,
+# e gravada em assets/ junto do PDF. Em tempo de execução é só um JSON
+# carregado no warmup e congelado (MappingProxyType): motor de regras,
+# retrieval, validação do relatório e PDF consultam nível e nome em O(1),
+# sem regex sobre chunks e sem confiar no nível escrito pelo modelo.
+#
+# Formato de cada entrada:
+#   {"number": "1.4.3", "name": "Contrast (Minimum)", "level": "AA",
+#    "principle": "Perceivable", "guideline": "Distinguishable",
+#    "techniques": ["F24"]}
+#
+# Os nomes vêm do PDF (em inglês); os relatórios continuam com os nomes
+# em português definidos nas regras e devolvidos pelo modelo.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from types import MappingProxyType
+
+from wcag_techniques import WCAG_FAILURE_TECHNIQUES
+
+logger = logging.getLogger(__name__)
+
+# Relativo ao módulo, não ao diretório de trabalho (CLI, Streamlit, testes)
+CRITERIA_TABLE_PATH = str(Path(__file__).resolve().parent / "assets" / "wcag21_criteria.json")
+
+# Incrementar quando a extração ou o formato da tabela mudar
+CRITERIA_TABLE_VERSION = 1
+
+# "1.Perceivable" ... "4.Robust" (a seção 5 já é "Conformance")
+PRINCIPLE_LINE = re.compile(r"^([1-4])\.\s*([A-Z][a-z]+)$")
+GUIDELINE_LINE = re.compile(r"^Guideline (\d\.\d+) (.+)$")
+CRITERION_LINE = re.compile(r"^Success Criterion (\d\.\d+\.\d+) (.+)$")
+LEVEL_LINE = re.compile(r"^\(Level (A{1,3})\)$")
+
+CRITERION_NUMBER = re.compile(r"\d+\.\d+\.\d+")
+
+# Linhas de continuação do nome antes de "(Level X)"
+MAX_NAME_LINES = 3
+
+
+# ============================================================
+# Extração
+# ============================================================
+def technique_criteria(techniques: list) -> dict:
+    """
+    Critério -> ids das Técnicas de Falha que o citam na primeira linha
+    ("... — Critério 1.4.3 ... / 1.4.6 ...").
+    """
+    by_criterion = {}
+    for tech in techniques:
+        for number in CRITERION_NUMBER.findall(tech["content"].split("\n", 1)[0]):
+            by_criterion.setdefault(number, []).append(tech["id"])
+    return by_criterion
+
+
+def extract_criteria_table(text: str, techniques: list) -> dict:
+    """
+    Percorre o texto do PDF linha a linha acompanhando o princípio e a
+    diretriz correntes. Cada "Success Criterion X.Y.Z Nome" termina no
+    primeiro "(Level ...)"; nomes quebrados em mais de uma linha
+    ("... Media Alternative" / "(Prerecorded)") são reunidos.
+    Vale a primeira ocorrência de cada número (o sumário do PDF não usa
+    o prefixo "Success Criterion").
+    """
+    by_criterion = technique_criteria(techniques)
+    table = {}
+    principle_number = principle = guideline = None
+    pending = None  # [número, partes do nome, linhas restantes]
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        if pending is not None:
+            match = LEVEL_LINE.match(line)
+            if match:
+                number, parts, _ = pending
+                table.setdefault(number, {
+                    "number": number,
+                    "name": " ".join(parts),
+                    "level": match.group(1),
+                    "principle": principle,
+                    "guideline": guideline,
+                    "techniques": by_criterion.get(number, []),
+                })
+                pending = None
+                continue
+            pending[2] -= 1
+            if pending[2] > 0 and not CRITERION_LINE.match(line):
+                pending[1].append(line)
+                continue
+            logger.warning(f"Critério {pending[0]} sem linha de nível no PDF")
+            pending = None
+
+        match = PRINCIPLE_LINE.match(line)
+        if match:
+            principle_number, principle = match.groups()
+            continue
+        match = GUIDELINE_LINE.match(line)
+        if match:
+            guideline = match.group(2).strip()
+            continue
+        match = CRITERION_LINE.match(line)
+        # Só dentro do princípio correspondente (exclui citações em outras seções)
+        if match and match.group(1).split(".", 1)[0] == principle_number:
+            pending = [match.group(1), [match.group(2).strip()], MAX_NAME_LINES]
+
+    return dict(sorted(table.items(), key=lambda item: tuple(int(p) for p in item[0].split("."))))
+
+
+def read_pdf_text(pdf_path: str) -> str:
+    from pypdf import PdfReader
+
+    return "\n".join(page.extract_text() or "" for page in PdfReader(pdf_path).pages)
+
+
+def compute_table_key(pdf_path: str, techniques: list) -> str:
+    """
+    Chave de conteúdo da tabela: bytes do PDF, técnicas e versão da
+    extração. Chave diferente da gravada -> a tabela é extraída de novo.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"version={CRITERIA_TABLE_VERSION}\n".encode("utf-8"))
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps(techniques, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ============================================================
+# Persistência
+# ============================================================
+def _read_table_file(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Tabela de critérios ilegível em '{path}': {e}")
+        return None
+
+
+def save_criteria_table(data: dict, path: str) -> None:
+    """
+    Grava a tabela de forma atômica (arquivo temporário + rename).
+    """
+    folder = Path(path).parent
+    folder.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def ensure_criteria_table(
+    pdf_path: str,
+    techniques: list = WCAG_FAILURE_TECHNIQUES,
+    path: str = CRITERIA_TABLE_PATH,
+) -> bool:
+    """
+    Chamado na construção do índice: extrai a tabela do PDF se a gravada
+    não corresponder à chave atual. Retorna True se ela foi reextraída.
+    Se a gravação falhar (ex: assets/ somente leitura), a tabela nova vale
+    só para este processo.
+    """
+    key = compute_table_key(pdf_path, techniques)
+    stored = _read_table_file(path)
+    if stored is not None and stored.get("key") == key:
+        return False
+
+    criteria = extract_criteria_table(read_pdf_text(pdf_path), techniques)
+    data = {"key": key, "pdf": os.path.basename(pdf_path), "criteria": criteria}
+    logger.info(f"Tabela de critérios extraída de '{pdf_path}': {len(criteria)} critérios")
+    try:
+        save_criteria_table(data, path)
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar a tabela de critérios em '{path}': {e}")
+    _set_table(freeze_criteria_table(criteria))
+    return True
+
+
+def freeze_criteria_table(criteria: dict) -> MappingProxyType:
+    return MappingProxyType({
+        number: MappingProxyType({**entry, "techniques": tuple(entry["techniques"])})
+        for number, entry in criteria.items()
+    })
+
+
+# ============================================================
+# Singleton (carregado no warmup)
+# ============================================================
+_table = None
+_table_lock = threading.Lock()
+
+
+def _set_table(table: MappingProxyType) -> None:
+    global _table
+    with _table_lock:
+        _table = table
+
+
+def get_criteria_table() -> MappingProxyType:
+    """
+    Tabela congelada do processo, lida do JSON na primeira chamada.
+    Vazia (com aviso) se o arquivo não existir: as consultas devolvem None.
+    """
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                data = _read_table_file(CRITERIA_TABLE_PATH)
+                if data is None:
+                    logger.warning(f"Tabela de critérios não encontrada em '{CRITERIA_TABLE_PATH}'")
+                _table = freeze_criteria_table((data or {}).get("criteria", {}))
+    return _table
+
+
+def criterion_info(number: str):
+    """
+    Entrada do critério (somente leitura) ou None se não existir na WCAG 2.1.
+    """
+    return get_criteria_table().get(number)
+
+
+def criterion_level(number: str) -> str | None:
+    entry = get_criteria_table().get(number)
+    return entry["level"] if entry is not None else None
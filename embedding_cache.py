@@ -0,0 +1,77 @@
+# ============================================================
+# Cache de embeddings de query
+# ============================================================
+# As queries de busca saem de um conjunto pequeno de combinações de
+# frases (SIGNAL_TO_CRITERIA), mas cada auditoria pagaria uma ida à
+# API de embeddings (100–400 ms). CachedEmbeddings envolve o modelo de
+# embeddings e guarda os vetores por (modelo, query normalizada) num
+# ResultCache: LRU em memória + SQLite compartilhado entre workers.
+# Os vetores são gravados como float32 em base64 (~8 KB cada).
+
+import base64
+import logging
+import re
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from cache import ResultCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def encode_vector(vector: list) -> str:
+    return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+
+def decode_vector(value: str) -> list:
+    vector = array("f")
+    vector.frombytes(base64.b64decode(value))
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings com cache nas queries. embed_documents (construção do
+    índice) passa direto para o modelo.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: ResultCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def _key(self, text: str) -> str:
+        return make_cache_key("embedding", self.model, text)
+
+    def embed_documents(self, texts: list) -> list:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        text = normalize_query(text)
+        key = self._key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return decode_vector(cached)
+
+        vector = self.embeddings.embed_query(text)
+        self.cache.put(key, encode_vector(vector))
+        return vector
+
+    def prewarm(self, queries: list) -> int:
+        """
+        Calcula, numa única chamada em lote, os vetores das queries que
+        ainda não estão no cache. Retorna quantas foram calculadas.
+        """
+        texts = list(dict.fromkeys(normalize_query(q) for q in queries))
+        missing = [text for text in texts if self.cache.get(self._key(text)) is None]
+        if not missing:
+            return 0
+
+        for text, vector in zip(missing, self.embeddings.embed_documents(missing)):
+            self.cache.put(self._key(text), encode_vector(vector))
+        return len(missing)
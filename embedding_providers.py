@@ -0,0 +1,110 @@
+# ============================================================
+# Provedores de embeddings (OpenAI ou local, sem rede)
+# ============================================================
+# O índice tem poucas centenas de chunks (PDF da WCAG + Técnicas de
+# Falha), então um TF-IDF com hashing em CPU já separa bem os critérios
+# e permite indexar e buscar sem chave de API (CI, ambientes isolados).
+# O provedor é escolhido por WCAG_EMBEDDING_PROVIDER e o seu
+# identificador entra na chave do índice: cada provedor tem o seu.
+#
+# Provedores com estado (o IDF do TF-IDF) expõem get_state()/set_state();
+# o estado é salvo junto do índice por index_store.
+
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+EMBEDDING_PROVIDERS = ("openai", "local")
+
+# Incrementar quando a tokenização ou a ponderação do TF-IDF mudar
+HASHED_TFIDF_VERSION = 1
+
+def _tokens(text: str) -> list:
+    # Mesma tokenização do BM25: "critério" e "criterio" caem no mesmo termo
+    words = tokenize(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashedTfidfEmbeddings(Embeddings):
+    """
+    TF-IDF com hashing (unigramas + bigramas) em `dim` posições, TF
+    sublinear e normalização L2. O IDF é calculado na primeira chamada
+    a embed_documents (construção do índice) e persistido com ele.
+    """
+
+    def __init__(self, dim: int = 2048):
+        self.dim = dim
+        self.idf = None
+
+    @property
+    def model(self) -> str:
+        return f"hashed-tfidf-v{HASHED_TFIDF_VERSION}-{self.dim}"
+
+    def _buckets(self, text: str) -> tuple:
+        indices = np.fromiter(
+            (zlib.crc32(token.encode("utf-8")) % self.dim for token in _tokens(text)),
+            dtype=np.int64,
+        )
+        return np.unique(indices, return_counts=True)
+
+    def fit(self, texts: list) -> None:
+        document_frequency = np.zeros(self.dim, dtype=np.float64)
+        for text in texts:
+            buckets, _ = self._buckets(text)
+            document_frequency[buckets] += 1
+        self.idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+
+    def get_state(self) -> dict:
+        return {"model": self.model, "idf": self.idf.tolist()}
+
+    def set_state(self, state: dict) -> None:
+        if state.get("model") != self.model:
+            raise ValueError(f"Estado de embeddings de outro modelo: {state.get('model')!r}")
+        self.idf = np.asarray(state["idf"], dtype=np.float64)
+
+    def _embed(self, text: str, idf) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        buckets, counts = self._buckets(text)
+        if len(buckets):
+            vector[buckets] = (1 + np.log(counts)) * idf[buckets]
+            vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        if self.idf is None:
+            self.fit(texts)
+        return [self._embed(text, self.idf) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        # Sem IDF ajustado (nenhum índice construído/carregado): pesos uniformes
+        idf = self.idf if self.idf is not None else np.ones(self.dim)
+        return self._embed(text, idf)
+
+
+def embedding_model_id(provider: str, openai_model: str, local_dim: int) -> str:
+    """
+    Identificador do modelo de embeddings, usado na chave do índice e
+    na chave do cache de embeddings de query.
+    """
+    if provider == "openai":
+        return openai_model
+    if provider == "local":
+        return HashedTfidfEmbeddings(local_dim).model
+    raise ValueError(
+        f"Provedor de embeddings desconhecido: {provider!r} (use {', '.join(EMBEDDING_PROVIDERS)})"
+    )
+
+
+def create_embeddings(provider: str, openai_model: str, api_key: str | None, local_dim: int) -> Embeddings:
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=openai_model, api_key=api_key)
+    if provider == "local":
+        return HashedTfidfEmbeddings(local_dim)
+    raise ValueError(
+        f"Provedor de embeddings desconhecido: {provider!r} (use {', '.join(EMBEDDING_PROVIDERS)})"
+    )
@@ -0,0 +1,316 @@
+# ============================================================
+# Relatório estruturado: esquema, validação e renderização
+# ============================================================
+# O LLM devolve as falhas em JSON (não em Markdown livre). O objeto é
+# validado uma única vez, na fronteira com o modelo; a partir daí a
+# visualização Markdown, o PDF, a CLI e as estatísticas trabalham
+# direto sobre ele, sem reinterpretar texto.
+#
+# Formato:
+#   {"falhas": [{"criterio": "1.1.1", "nome": "Conteúdo Não Textual",
+#                "nivel": "A", "descricao": "...", "evidencia": "...",
+#                "correcao": "...", "tecnica": "F65"}, ...]}
+
+import json
+import logging
+import re
+
+from criteria_table import criterion_info, get_criteria_table
+
+logger = logging.getLogger(__name__)
+
+REPORT_HEADER = "## Relatório de Acessibilidade WCAG 2.1"
+
+EMPTY_REPORT_TEXT = "Nenhuma falha comprovada encontrada."
+
+LEVELS = ("A", "AA", "AAA")
+
+CRITERION_PATTERN = re.compile(r"^\d+\.\d+\.\d+$")
+
+# Campo -> obrigatório
+FINDING_FIELDS = {
+    "criterio": True,
+    "nome": True,
+    "nivel": True,
+    "descricao": True,
+    "evidencia": True,
+    "correcao": True,
+    "tecnica": False,
+}
+
+
+class FindingsError(ValueError):
+    """Resposta do modelo fora do esquema de falhas."""
+
+
+# ============================================================
+# Validação
+# ============================================================
+def validate_finding(data) -> dict:
+    if not isinstance(data, dict):
+        raise FindingsError(f"Falha deve ser um objeto, recebido {type(data).__name__}")
+
+    finding = {}
+    for field, required in FINDING_FIELDS.items():
+        value = data.get(field)
+        if value is None:
+            if required:
+                raise FindingsError(f"Campo obrigatório ausente na falha: {field}")
+            value = ""
+        if not isinstance(value, str):
+            raise FindingsError(f"Campo '{field}' deve ser texto")
+        finding[field] = value.strip()
+
+    if not CRITERION_PATTERN.match(finding["criterio"]):
+        raise FindingsError(f"Número de critério inválido: {finding['criterio']!r}")
+
+    # O nível vem da tabela de critérios, não do que o modelo escreveu
+    info = criterion_info(finding["criterio"])
+    if info is not None:
+        finding["nivel"] = info["level"]
+        return finding
+    # Sem tabela (arquivo ausente), só dá para conferir o formato
+    if get_criteria_table():
+        raise FindingsError(f"Critério inexistente na WCAG 2.1: {finding['criterio']}")
+
+    finding["nivel"] = finding["nivel"].upper()
+    if finding["nivel"] not in LEVELS:
+        raise FindingsError(f"Nível inválido no critério {finding['criterio']}: {finding['nivel']!r}")
+
+    return finding
+
+
+def _accept_finding(data) -> dict | None:
+    """
+    Falha validada, ou None (com aviso no log) se ela estiver fora do
+    esquema. Um item inválido não derruba o relatório inteiro.
+    """
+    try:
+        return validate_finding(data)
+    except FindingsError as e:
+        logger.warning(f"Falha descartada: {e}")
+        return None
+
+
+def validate_report(data) -> dict:
+    """
+    Valida o objeto devolvido pelo modelo e retorna uma cópia
+    normalizada ({"falhas": [...]}), sem os itens fora do esquema.
+    Levanta FindingsError só se o objeto em si não for um relatório.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("falhas"), list):
+        raise FindingsError("Relatório deve ser um objeto com a lista 'falhas'")
+    findings = (_accept_finding(item) for item in data["falhas"])
+    return {"falhas": [finding for finding in findings if finding is not None]}
+
+
+def _json_document(text: str) -> str:
+    # Tolera cercas ```json ou texto ao redor do objeto
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise FindingsError("Resposta do modelo não contém um objeto JSON")
+    return text[start:end + 1]
+
+
+def parse_report(text: str) -> dict:
+    try:
+        data = json.loads(_json_document(text))
+    except json.JSONDecodeError as e:
+        raise FindingsError(f"JSON inválido na resposta do modelo: {e}") from e
+    return validate_report(data)
+
+
+def dump_report(report: dict) -> str:
+    return json.dumps(report, ensure_ascii=False)
+
+
+def load_report(text: str) -> dict:
+    """
+    Lê um relatório já validado (ex: do cache), sem validar de novo.
+    """
+    return json.loads(text)
+
+
+def empty_report() -> dict:
+    return {"falhas": []}
+
+
+# ============================================================
+# Leitura incremental (streaming)
+# ============================================================
+class FindingsStream:
+    """
+    Recebe o JSON do modelo em pedaços e devolve cada falha assim que
+    o seu objeto fecha, já validada (itens inválidos são descartados).
+    Acompanha apenas profundidade e strings: custo linear no tamanho
+    da resposta.
+    """
+
+    def __init__(self):
+        self.findings = []
+        self._parts = []
+        self._current = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> list:
+        self._parts.append(text)
+        completed = []
+        for char in text:
+            if self._depth >= 2:
+                self._current.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 3 and char == "{":
+                    # Início de um item de "falhas": {"falhas": [ {...
+                    self._current = [char]
+            elif char in "}]":
+                if self._depth == 3 and char == "}":
+                    finding = self._finding("".join(self._current))
+                    if finding is not None:
+                        self.findings.append(finding)
+                        completed.append(finding)
+                    self._current = []
+                self._depth -= 1
+        return completed
+
+    @staticmethod
+    def _finding(text: str) -> dict | None:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Falha descartada: JSON inválido no item ({e})")
+            return None
+        return _accept_finding(data)
+
+    @staticmethod
+    def _load(text: str):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise FindingsError(f"JSON inválido na resposta do modelo: {e}") from e
+
+    def close(self) -> dict:
+        """
+        Confere que a resposta completa é um JSON bem formado e devolve
+        o relatório com as falhas já validadas durante o stream.
+        """
+        data = self._load(_json_document("".join(self._parts)))
+        if not isinstance(data, dict) or not isinstance(data.get("falhas"), list):
+            raise FindingsError("Relatório deve ser um objeto com a lista 'falhas'")
+        return {"falhas": list(self.findings)}
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+# ============================================================
+# Agregação
+# ============================================================
+def criterion_sort_key(numero: str) -> tuple:
+    return tuple(int(part) for part in numero.split("."))
+
+
+def merge_findings(reports: list) -> dict:
+    """
+    Funde relatórios parciais (ex: segmentos): remove falhas repetidas
+    e ordena pelo número do critério, mantendo a ordem de chegada
+    dentro de cada critério.
+    """
+    seen = set()
+    findings = []
+    for report in reports:
+        for finding in report["falhas"]:
+            key = (finding["criterio"], finding["descricao"], finding["evidencia"])
+            if key not in seen:
+                seen.add(key)
+                findings.append(finding)
+    findings.sort(key=lambda f: criterion_sort_key(f["criterio"]))
+    return {"falhas": findings}
+
+
+def summarize(report: dict) -> dict:
+    """
+    Critérios distintos com falha (primeira ocorrência define o nome; o
+    nível vem da tabela de critérios) e contagens por nível e por
+    princípio WCAG.
+    """
+    criterios = {}
+    for finding in report["falhas"]:
+        if finding["criterio"] not in criterios:
+            # Relatórios em cache não passam por validate_finding de novo
+            info = criterion_info(finding["criterio"])
+            criterios[finding["criterio"]] = {
+                "numero": finding["criterio"],
+                "nome": finding["nome"],
+                "nivel": info["level"] if info is not None else finding["nivel"],
+            }
+
+    contagem_nivel = {level: 0 for level in LEVELS}
+    contagem_principio = {"1": 0, "2": 0, "3": 0, "4": 0}
+    for c in criterios.values():
+        # Nível desconhecido (relatório antigo, tabela ausente): só não é contado
+        if c["nivel"] in contagem_nivel:
+            contagem_nivel[c["nivel"]] += 1
+        principio = c["numero"].split(".", 1)[0]
+        if principio in contagem_principio:
+            contagem_principio[principio] += 1
+
+    return {
+        "criterios": list(criterios.values()),
+        "total": len(criterios),
+        "por_nivel": contagem_nivel,
+        "por_principio": contagem_principio,
+    }
+
+
+# ============================================================
+# Renderização Markdown
+# ============================================================
+def _inline_code(text: str) -> str:
+    return text.replace("\n", " ").replace("`", "'")
+
+
+def render_finding(finding: dict, previous: dict | None = None) -> str:
+    """
+    Bloco Markdown de uma falha. O cabeçalho do critério só é repetido
+    quando o critério muda em relação à falha anterior.
+    """
+    lines = []
+    if previous is None or previous["criterio"] != finding["criterio"]:
+        if previous is not None:
+            lines.append("---\n")
+        lines.append(f"### Critério {finding['criterio']} – {finding['nome']} (Nível {finding['nivel']})")
+    lines.append(f"**Falha:** {finding['descricao']}")
+    lines.append(f"**Evidência:** `{_inline_code(finding['evidencia'])}`")
+    lines.append(f"**Correção:** {finding['correcao']}")
+    if finding["tecnica"]:
+        lines.append(f"**Técnica:** {finding['tecnica']}")
+    return "\n".join(lines) + "\n\n"
+
+
+def render_markdown(report: dict) -> str:
+    findings = report["falhas"]
+    if not findings:
+        return f"{REPORT_HEADER}\n\n{EMPTY_REPORT_TEXT}"
+
+    parts = [f"{REPORT_HEADER}\n\n"]
+    previous = None
+    for finding in findings:
+        parts.append(render_finding(finding, previous))
+        previous = finding
+    return "".join(parts).rstrip()
@@ -0,0 +1,269 @@
+# ============================================================
+# Persistência do índice FAISS em disco
+# ============================================================
+# O índice é construído uma única vez e salvo com FAISS.save_local
+# em um diretório cujo nome é o hash de tudo que influencia o seu
+# conteúdo (fontes do corpus e bytes dos seus arquivos, técnicas de falha,
+# parâmetros do splitter, modelo de embeddings e tipo do índice). Ao iniciar, o processo carrega o índice
+# via mmap; só há nova chamada de embeddings quando a chave muda.
+# Junto do índice vai um mapa critério -> ids de chunks/técnicas,
+# usado para buscar o contexto dos critérios detectados sem embeddings,
+# e o estado do provedor de embeddings local (IDF), quando houver.
+#
+# Tipos de índice (WCAG_INDEX_TYPE), todos em distância L2:
+#   - "flat": busca exata, força bruta; a referência de recall;
+#   - "hnsw": grafo navegável, sublinear, vetores completos em memória;
+#   - "ivfpq": listas invertidas + product quantization: cada vetor vira
+#     PQ_M bytes (~100x menor), a busca só visita IVF_NPROBE listas.
+# Os parâmetros de construção entram na chave do índice; os de busca
+# (efSearch, nprobe) são aplicados ao carregar.
+# benchmarks/bench_ann.py compara recall@k e latência dos três.
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o formato do artefato salvo mudar
+INDEX_FORMAT_VERSION = 3
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# O k-means do IVF precisa de ~39 pontos por lista para não degenerar
+IVF_MIN_POINTS_PER_LIST = 39
+
+INDEX_NAME = "index"
+MANIFEST_FILE = "manifest.json"
+CRITERIA_FILE = "criteria.json"
+EMBEDDING_STATE_FILE = "embeddings.json"
+
+# Chunks de critério menores que isso são entradas de sumário
+# ("1.4.3 Contrast (Minimum)") e não entram no mapa de critérios
+MIN_CRITERION_CHUNK_CHARS = 80
+
+
+def compute_index_key(
+    sources: list,
+    techniques: list,
+    splitter_params: dict,
+    embedding_model: str,
+    index_params: dict,
+) -> str:
+    """
+    Calcula a chave de conteúdo do índice. Qualquer alteração nas fontes
+    (descrição e hash de cada arquivo, ver corpus.source_fingerprints),
+    nas técnicas, nos parâmetros de chunking, no modelo de embeddings ou
+    no tipo do índice produz uma chave diferente e, portanto, um novo índice.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"format={INDEX_FORMAT_VERSION}\n".encode("utf-8"))
+
+    for part in (sources, techniques, splitter_params, index_params):
+        digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    digest.update(embedding_model.encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+# ============================================================
+# Tipos de índice
+# ============================================================
+def index_build_params(index_type: str, hnsw_m: int, hnsw_ef_construction: int,
+                       ivf_nlist: int, pq_m: int, pq_nbits: int) -> dict:
+    """
+    Parâmetros de construção do tipo escolhido (só os que ele usa).
+    """
+    if index_type == "flat":
+        return {"type": "flat"}
+    if index_type == "hnsw":
+        return {"type": "hnsw", "m": hnsw_m, "ef_construction": hnsw_ef_construction}
+    if index_type == "ivfpq":
+        return {"type": "ivfpq", "nlist": ivf_nlist, "pq_m": pq_m, "nbits": pq_nbits}
+    raise ValueError(f"Tipo de índice desconhecido: {index_type!r} (use {', '.join(INDEX_TYPES)})")
+
+
+def _pq_subquantizers(dim: int, pq_m: int) -> int:
+    # O PQ exige que o número de subquantizadores divida a dimensão
+    return max(m for m in range(1, min(pq_m, dim) + 1) if dim % m == 0)
+
+
+def create_ann_index(vectors: np.ndarray, params: dict):
+    """
+    Cria, treina (IVF-PQ) e preenche o índice FAISS do tipo pedido.
+    Em corpora pequenos o IVF-PQ reduz nlist e nbits para que o
+    treinamento tenha pontos suficientes.
+    """
+    faiss = dependable_faiss_import()
+    count, dim = vectors.shape
+
+    if params["type"] == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif params["type"] == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    elif params["type"] == "ivfpq":
+        nlist = max(1, min(params["nlist"], count // IVF_MIN_POINTS_PER_LIST))
+        nbits = max(1, min(params["nbits"], int(np.log2(max(count, 2)))))
+        index = faiss.index_factory(dim, f"IVF{nlist},PQ{_pq_subquantizers(dim, params['pq_m'])}x{nbits}")
+        # Corpus pequeno é o caso normal aqui: sem o aviso de poucos pontos por centróide
+        index.cp.min_points_per_centroid = 1
+        index.pq.cp.min_points_per_centroid = 1
+        # O treino polissêmico (padrão do index_factory com 8 bits) só serve
+        # à busca por Hamming, que não é usada, e custa minutos em CPU
+        index.do_polysemous_training = False
+        index.train(vectors)
+    else:
+        raise ValueError(f"Tipo de índice desconhecido: {params['type']!r}")
+
+    index.add(vectors)
+    return index
+
+
+def configure_search(index, ef_search: int, nprobe: int) -> None:
+    """
+    Parâmetros de busca: efSearch (HNSW) e nprobe (IVF). Flat ignora.
+    """
+    faiss = dependable_faiss_import()
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+
+
+def build_vectorstore(documents: list, vectors: np.ndarray, embeddings, params: dict) -> FAISS:
+    """
+    Monta o vectorstore a partir de embeddings já calculados
+    (corpus.embed_texts), no lugar de FAISS.from_documents.
+    """
+    index = create_ann_index(vectors, params)
+    ids = [str(uuid.uuid4()) for _ in documents]
+    docstore = InMemoryDocstore(dict(zip(ids, documents)))
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+
+def index_path(index_dir: str, key: str) -> Path:
+    return Path(index_dir) / key[:32]
+
+
+def load_index(folder: Path, embeddings) -> FAISS | None:
+    """
+    Carrega um índice salvo, mapeando o arquivo .faiss em memória (mmap)
+    em vez de copiá-lo para o heap. Retorna None se o artefato não existir
+    ou estiver incompleto.
+    """
+    faiss_file = folder / f"{INDEX_NAME}.faiss"
+    pkl_file = folder / f"{INDEX_NAME}.pkl"
+    if not (faiss_file.exists() and pkl_file.exists() and (folder / MANIFEST_FILE).exists()):
+        return None
+
+    if hasattr(embeddings, "set_state"):
+        # Provedor com estado: sem ele as queries não seriam comparáveis
+        try:
+            with open(folder / EMBEDDING_STATE_FILE, encoding="utf-8") as f:
+                embeddings.set_state(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Estado de embeddings em '{folder}' inválido, índice será reconstruído: {e}")
+            return None
+
+    try:
+        index = _read_faiss_index(faiss_file)
+        # Arquivo gerado por este próprio processo de build (não é entrada de usuário)
+        with open(pkl_file, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Índice em '{folder}' inválido, será reconstruído: {e}")
+        return None
+
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def _read_faiss_index(faiss_file: Path):
+    faiss = dependable_faiss_import()
+    flags = (
+        getattr(faiss, "IO_FLAG_MMAP", 0)
+        | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+    )
+    try:
+        return faiss.read_index(str(faiss_file), flags)
+    except RuntimeError:
+        # Listas invertidas (IVF) não suportam mmap: lidas para o heap,
+        # já comprimidas pelo PQ
+        return faiss.read_index(str(faiss_file))
+
+
+def build_criteria_index(vectorstore: FAISS) -> dict:
+    """
+    Mapa critério -> ids do docstore, separado em "chunks" (texto da
+    WCAG, do maior para o menor) e "techniques" (Técnicas de Falha),
+    além de "technique_ids" (id da técnica, ex: F65 -> id do docstore).
+    """
+    chunks = {}
+    techniques = {}
+    technique_ids = {}
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        doc = vectorstore.docstore.search(doc_id)
+        metadata = doc.metadata
+        if metadata.get("type") == "technique":
+            technique_ids[metadata["technique_id"]] = doc_id
+            for criterion in metadata.get("criteria", []):
+                techniques.setdefault(criterion, []).append(doc_id)
+        elif metadata.get("criterion") and len(doc.page_content) >= MIN_CRITERION_CHUNK_CHARS:
+            chunks.setdefault(metadata["criterion"], []).append((len(doc.page_content), doc_id))
+
+    return {
+        "chunks": {
+            criterion: [doc_id for _, doc_id in sorted(entries, key=lambda e: -e[0])]
+            for criterion, entries in chunks.items()
+        },
+        "techniques": techniques,
+        "technique_ids": technique_ids,
+    }
+
+
+def load_criteria_index(folder: Path) -> dict | None:
+    try:
+        with open(folder / CRITERIA_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_index(vectorstore: FAISS, folder: Path, manifest: dict, criteria: dict | None = None) -> None:
+    """
+    Salva o índice de forma atômica: grava em um diretório temporário
+    ao lado do destino e renomeia. Workers concorrentes que construírem
+    o mesmo índice simplesmente descartam a cópia perdedora.
+    """
+    folder.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=folder.parent))
+
+    try:
+        vectorstore.save_local(str(tmp_dir), index_name=INDEX_NAME)
+        with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        if criteria is not None:
+            with open(tmp_dir / CRITERIA_FILE, "w", encoding="utf-8") as f:
+                json.dump(criteria, f, ensure_ascii=False)
+        if hasattr(vectorstore.embeddings, "get_state"):
+            with open(tmp_dir / EMBEDDING_STATE_FILE, "w", encoding="utf-8") as f:
+                json.dump(vectorstore.embeddings.get_state(), f)
+        os.replace(tmp_dir, folder)
+    except OSError:
+        # Outro processo já publicou o mesmo índice
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not folder.exists():
+            raise
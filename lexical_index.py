@@ -0,0 +1,91 @@
+# ============================================================
+# Índice invertido BM25 + fusão por ranking recíproco (RRF)
+# ============================================================
+# O texto da WCAG é cheio de tokens exatos (números de critério como
+# 1.4.3, atributos como alt/lang/tabindex, ids de técnica como F65) que
+# embeddings densos ranqueiam mal. O BM25 é construído em memória a
+# partir dos mesmos documentos do FAISS (docstore) e as duas listas são
+# fundidas por RRF, que só usa as posições: não é preciso calibrar as
+# escalas de score de cada busca.
+
+import math
+import re
+import unicodedata
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)+|[a-z0-9]+")
+
+# Parâmetros usuais do Okapi BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constante do RRF (Cormack et al., 2009): amortece o peso do topo
+RRF_K = 60
+
+
+def tokenize(text: str) -> list:
+    """
+    Minúsculas sem acentos; números de critério ("1.4.3") ficam inteiros.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_PATTERN.findall(text)
+
+
+class BM25Index:
+    """
+    Índice invertido termo -> [(posição do documento, frequência)].
+    Os documentos são identificados pelos ids do docstore do FAISS.
+    """
+
+    def __init__(self, documents: dict):
+        self.doc_ids = list(documents)
+        self.postings = {}
+        self.lengths = []
+        for position, text in enumerate(documents.values()):
+            terms = Counter(tokenize(text))
+            self.lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, []).append((position, frequency))
+
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        total = len(self.doc_ids)
+        self.idf = {
+            term: math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            for term, entries in self.postings.items()
+        }
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "BM25Index":
+        return cls({
+            doc_id: vectorstore.docstore.search(doc_id).page_content
+            for doc_id in vectorstore.index_to_docstore_id.values()
+        })
+
+    def search(self, query: str, k: int) -> list:
+        """
+        Ids dos k documentos com maior score BM25 (apenas score > 0).
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / self.average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores, key=lambda position: -scores[position])[:k]
+        return [self.doc_ids[position] for position in ranked]
+
+
+def reciprocal_rank_fusion(rankings: list, k: int, rrf_k: int = RRF_K) -> list:
+    """
+    Funde listas de ids ordenadas: score = soma de 1 / (rrf_k + posição).
+    Empates mantêm a ordem da primeira lista em que o id aparece.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])[:k]
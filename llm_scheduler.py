@@ -0,0 +1,180 @@
+# ============================================================
+# Agendador compartilhado das chamadas assíncronas ao LLM
+# ============================================================
+# Todas as chamadas assíncronas do processo (sessões Streamlit, CLI em
+# lote) passam por um único event loop dedicado, numa thread daemon.
+# Ali ficam, sem locks:
+#   - o limite global de chamadas simultâneas;
+#   - o orçamento de tokens por minuto (balde de tokens), para não
+#     estourar a cota do provedor e colecionar 429;
+#   - novas tentativas com backoff exponencial com jitter em 429, 5xx e
+#     erros de conexão (respeitando Retry-After quando informado);
+#   - coalescência: pedidos idênticos em andamento compartilham a mesma
+#     chamada.
+# Uma chamada em espera não ocupa thread: o throughput fica limitado
+# pela cota do provedor, não pelo número de threads.
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBudget:
+    """
+    Balde de tokens: capacidade de um minuto, reposto continuamente.
+    Usado só dentro do loop do agendador.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.available = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Reserva `tokens` no balde e retorna o que foi de fato debitado:
+        um pedido maior que a capacidade esperaria para sempre, então a
+        reserva é limitada à capacidade. É esse valor que vai para settle.
+        """
+        tokens = min(tokens, self.capacity)
+        while True:
+            self._refill()
+            if self.available >= tokens:
+                self.available -= tokens
+                return tokens
+            await asyncio.sleep((tokens - self.available) / self.rate)
+
+    def settle(self, reserved: float, used: int) -> None:
+        """
+        Acerta a reserva (o valor retornado por acquire) com o consumo
+        real informado pelo provedor.
+        """
+        self._refill()
+        self.available = min(self.capacity, self.available + reserved - used)
+
+
+def _retry_after(error) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx e falhas de conexão/timeout com o provedor."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    try:
+        from openai import APIConnectionError
+    except ImportError:
+        return False
+    return isinstance(error, APIConnectionError)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        tokens_per_minute: int = 0,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._semaphore = None
+        self._budget = None
+        self._inflight = {}
+        self.stats = {"calls": 0, "retries": 0, "coalesced": 0}
+
+    # ========================================================
+    # Loop dedicado
+    # ========================================================
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-scheduler", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    async def run(self, key: str, factory, tokens: int = 0, usage=None):
+        """
+        Executa `factory()` (que cria a corrotina da chamada) no loop do
+        agendador e aguarda o resultado a partir de qualquer event loop.
+        `key` identifica pedidos idênticos; `tokens` é a estimativa
+        reservada no orçamento e `usage(resultado)` o consumo real.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._coalesced(key, factory, tokens, usage), self._get_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    # ========================================================
+    # Dentro do loop do agendador
+    # ========================================================
+    async def _coalesced(self, key: str, factory, tokens: int, usage):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._call(factory, tokens, usage))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: o cancelamento de um dos interessados não cancela os demais
+        return await asyncio.shield(task)
+
+    async def _call(self, factory, tokens: int, usage):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            if self.tokens_per_minute > 0:
+                self._budget = TokenBudget(self.tokens_per_minute)
+
+        for attempt in range(self.max_retries + 1):
+            reserved = 0
+            if self._budget is not None:
+                reserved = await self._budget.acquire(tokens)
+            async with self._semaphore:
+                self.stats["calls"] += 1
+                try:
+                    result = await factory()
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        raise
+                    error = e
+                else:
+                    if self._budget is not None and usage is not None:
+                        used = usage(result)
+                        if used:
+                            self._budget.settle(reserved, used)
+                    return result
+
+            # Backoff exponencial com jitter total (fora do semáforo)
+            delay = _retry_after(error)
+            if delay is None:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            self.stats["retries"] += 1
+            logger.warning(
+                f"Chamada ao LLM falhou ({error}); tentativa {attempt + 2} de "
+                f"{self.max_retries + 1} em {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
@@ -18,10 +18,16 @@ from reportlab.lib.colors import (
 from reportlab.graphics.shapes import Drawing, String, Rect
 from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics.charts.barcharts import VerticalBarChart
+from collections import OrderedDict
 from datetime import datetime
 from io import BytesIO
+import hashlib
 import html
-import re
+import json
+import threading
+
+from findings import EMPTY_REPORT_TEXT, summarize
+from tracing import trace
 
 
 # ============================================================
@@ -50,54 +56,25 @@ CORES_PRINCIPIOS = {
     "4": COR_ROBUST,
 }
 
+# Incrementar quando o layout do PDF mudar: invalida o cache de PDFs
+PDF_TEMPLATE_VERSION = 2
+
+# Limite de memória do cache de PDFs renderizados (compartilhado entre sessões)
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
 
 # ============================================================
-# Parser do relatório — extrai estatísticas do texto Markdown
+# Estatísticas — calculadas direto do relatório estruturado
 # ============================================================
-def extrair_estatisticas(texto: str) -> dict:
+def extrair_estatisticas(relatorio: dict) -> dict:
     """
-    Analisa o texto do relatório Markdown e extrai:
-    - Lista de critérios encontrados (número, nome, nível)
+    A partir do relatório estruturado (findings.py), retorna:
+    - Lista de critérios com falha (número, nome, nível)
     - Contagem por nível (A, AA, AAA)
     - Contagem por princípio WCAG (1.x–4.x)
     """
-    criterios = []
-
-    # Padrão: ### Critério 1.4.3 – Contraste Mínimo (Nível AA)
-    pattern = re.compile(
-        r"###?\s*Critério\s+(\d+\.\d+\.\d+)\s*[\u2013\u2014–—-]\s*(.+?)\s*\(Nível\s+(A{1,3})\)",
-        re.IGNORECASE,
-    )
+    return summarize(relatorio)
 
-    for match in pattern.finditer(texto):
-        numero = match.group(1)
-        nome = match.group(2).strip()
-        nivel = match.group(3).upper()
-        criterios.append({
-            "numero": numero,
-            "nome": nome,
-            "nivel": nivel,
-        })
-
-    # Contagens por nível
-    contagem_nivel = {"A": 0, "AA": 0, "AAA": 0}
-    for c in criterios:
-        if c["nivel"] in contagem_nivel:
-            contagem_nivel[c["nivel"]] += 1
-
-    # Contagens por princípio (primeiro dígito do número)
-    contagem_principio = {"1": 0, "2": 0, "3": 0, "4": 0}
-    for c in criterios:
-        principio = c["numero"][0]
-        if principio in contagem_principio:
-            contagem_principio[principio] += 1
-
-    return {
-        "criterios": criterios,
-        "total": len(criterios),
-        "por_nivel": contagem_nivel,
-        "por_principio": contagem_principio,
-    }
 
 # ============================================================
 # Gráfico de Barras — Distribuição por Princípio WCAG
@@ -290,30 +267,48 @@ def criar_resumo_visual(stats: dict) -> Drawing:
 
 
 # ============================================================
-# Formatação de texto Markdown → ReportLab
+# Detalhamento das falhas (um bloco por falha)
 # ============================================================
-def preparar_texto_para_pdf(texto: str) -> str:
-    texto = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", texto)
-
-    texto = html.escape(texto)
-
-    texto = texto.replace("&lt;b&gt;", "<b>")
-    texto = texto.replace("&lt;/b&gt;", "</b>")
-    texto = texto.replace("&lt;br/&gt;", "<br/>")
-
-    texto = texto.replace("\n", "<br/>")
+def criar_detalhamento_falhas(relatorio: dict, criterio_style, corpo_style) -> list:
+    elements = []
+    anterior = None
+
+    for falha in relatorio["falhas"]:
+        if falha["criterio"] != anterior:
+            elements.append(Paragraph(
+                html.escape(f"Critério {falha['criterio']} – {falha['nome']} (Nível {falha['nivel']})"),
+                criterio_style,
+            ))
+            anterior = falha["criterio"]
+
+        linhas = [
+            f"<b>Falha:</b> {html.escape(falha['descricao'])}",
+            f"<b>Evidência:</b> {html.escape(falha['evidencia'])}",
+            f"<b>Correção:</b> {html.escape(falha['correcao'])}",
+        ]
+        if falha["tecnica"]:
+            linhas.append(f"<b>Técnica:</b> {html.escape(falha['tecnica'])}")
+        elements.append(Paragraph("<br/>".join(linhas), corpo_style))
+        elements.append(Spacer(1, 6))
+
+    if not elements:
+        elements.append(Paragraph(EMPTY_REPORT_TEXT, corpo_style))
 
-    return texto
+    return elements
 
 
 # ============================================================
 # Função principal — gera o PDF completo com gráficos
 # ============================================================
 def gerar_pdf_relatorio(
-    texto: str,
+    relatorio: dict,
     nome_arquivo_html: str | None = None,
 ) -> BytesIO:
+    with trace("pdf", findings=len(relatorio["falhas"])):
+        return _montar_pdf(relatorio, nome_arquivo_html)
+
 
+def _montar_pdf(relatorio: dict, nome_arquivo_html: str | None) -> BytesIO:
     buffer = BytesIO()
 
     doc = SimpleDocTemplate(
@@ -356,6 +351,14 @@ def gerar_pdf_relatorio(
         spaceAfter=10,
     )
 
+    criterio_style = ParagraphStyle(
+        "Criterio",
+        parent=styles["Heading3"],
+        alignment=TA_LEFT,
+        spaceBefore=10,
+        spaceAfter=6,
+    )
+
     story = []
 
     # --- Título ---
@@ -381,8 +384,8 @@ def gerar_pdf_relatorio(
     story.append(HRFlowable(width="100%"))
     story.append(Spacer(1, 16))
 
-    # --- Extrai estatísticas do relatório ---
-    stats = extrair_estatisticas(texto)
+    # --- Estatísticas do relatório estruturado ---
+    stats = extrair_estatisticas(relatorio)
 
     if stats["total"] > 0:
         # --- Resumo visual (cards com totais) ---
@@ -413,16 +416,59 @@ def gerar_pdf_relatorio(
         story.append(HRFlowable(width="100%"))
         story.append(Spacer(1, 12))
 
-    # --- Corpo do relatório (texto completo) ---
+    # --- Corpo do relatório (uma seção por falha) ---
     story.append(Paragraph("Detalhamento das Falhas", subtitulo_style))
     story.append(Spacer(1, 8))
-
-    for bloco in texto.split("\n\n"):
-        safe_text = preparar_texto_para_pdf(bloco)
-        story.append(Paragraph(safe_text, corpo_style))
-        story.append(Spacer(1, 6))
+    story.extend(criar_detalhamento_falhas(relatorio, criterio_style, corpo_style))
 
     doc.build(story)
     buffer.seek(0)
 
     return buffer
+
+
+# ============================================================
+# Cache de PDFs renderizados
+# ============================================================
+# Reruns do Streamlit pedem o mesmo PDF várias vezes; o resultado é
+# memoizado por hash(relatório, nome do arquivo, versão do template) num
+# LRU limitado pelo tamanho total em bytes.
+_pdf_cache = OrderedDict()
+_pdf_cache_bytes = 0
+_pdf_cache_lock = threading.Lock()
+
+
+def _chave_pdf(relatorio: dict, nome_arquivo_html: str | None) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{PDF_TEMPLATE_VERSION}\0{nome_arquivo_html or ''}\0".encode("utf-8"))
+    digest.update(json.dumps(relatorio, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def gerar_pdf_bytes(
+    relatorio: dict,
+    nome_arquivo_html: str | None = None,
+) -> bytes:
+    """
+    Versão memoizada de gerar_pdf_relatorio que devolve os bytes do PDF.
+    """
+    global _pdf_cache_bytes
+
+    chave = _chave_pdf(relatorio, nome_arquivo_html)
+    with _pdf_cache_lock:
+        pdf = _pdf_cache.get(chave)
+        if pdf is not None:
+            _pdf_cache.move_to_end(chave)
+            return pdf
+
+    pdf = gerar_pdf_relatorio(relatorio=relatorio, nome_arquivo_html=nome_arquivo_html).getvalue()
+
+    with _pdf_cache_lock:
+        if chave not in _pdf_cache:
+            _pdf_cache[chave] = pdf
+            _pdf_cache_bytes += len(pdf)
+            while _pdf_cache_bytes > PDF_CACHE_MAX_BYTES and len(_pdf_cache) > 1:
+                _, antigo = _pdf_cache.popitem(last=False)
+                _pdf_cache_bytes -= len(antigo)
+
+    return pdf
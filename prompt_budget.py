@@ -0,0 +1,226 @@
+# ============================================================
+# Montagem do prompt com orçamento de tokens
+# ============================================================
+# O prompt é montado dentro de um orçamento configurável, com contagem
+# de tokens via tiktoken. Ordem de redução:
+#   1. HTML não auditável é removido (paths SVG, data URIs base64,
+#      corpos de scripts minificados) antes de qualquer corte;
+#   2. sinais chegam agregados por regra (contagem + exemplos); se não
+#      couberem, o número de exemplos por regra é reduzido;
+#   3. chunks recuperados são deduplicados e incluídos por ordem de
+#      relevância até esgotar o orçamento do contexto;
+#   4. só então, em último caso, o HTML é truncado.
+# O uso de tokens de cada seção é devolvido junto com o prompt.
+
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Fração do orçamento (após o template fixo) reservada a cada seção
+SIGNALS_MAX_SHARE = 0.15
+CONTEXT_MIN_SHARE = 0.30
+
+# Exemplos por regra no prompt; reduzidos em sequência quando o orçamento aperta
+SIGNAL_EXAMPLES_STEPS = (3, 1, 0)
+
+# Linhas do fonte exibidas por regra
+MAX_PROMPT_SIGNAL_LINES = 10
+
+# Scripts com corpo maior que isso são resumidos
+MAX_SCRIPT_CHARS = 500
+SCRIPT_KEYWORDS = re.compile(
+    r"setTimeout|setInterval|location\s*[.=]|\.submit\s*\(|\.focus\s*\(|\.blur\s*\(|"
+    r"onchange|oninput|addEventListener|refresh|animate",
+)
+
+DATA_URI_PATTERN = re.compile(r"(data:[\w/+.-]+;base64,)[A-Za-z0-9+/=\s]{64,}")
+SVG_PATH_PATTERN = re.compile(r"(\s(?:d|points)\s*=\s*)([\"'])[^\"']{60,}\2", re.IGNORECASE)
+SCRIPT_PATTERN = re.compile(r"(<script\b[^>]*>)(.*?)(</script\s*>)", re.IGNORECASE | re.DOTALL)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding(model: str):
+    global _encoding
+    if _encoding is not None:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is not None:
+            return _encoding
+        try:
+            import tiktoken
+
+            try:
+                _encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Sem acesso ao arquivo BPE (ambiente offline): usa estimativa
+            logger.warning(f"tiktoken indisponível, usando estimativa de tokens: {e}")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _get_encoding(model)
+    if not encoding:
+        return int(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    encoding = _get_encoding(model)
+    if not encoding:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens])
+
+
+# ============================================================
+# 1. Remoção de HTML não auditável
+# ============================================================
+def _summarize_script(match: re.Match) -> str:
+    open_tag, body, close_tag = match.groups()
+    if len(body) <= MAX_SCRIPT_CHARS:
+        return match.group(0)
+
+    # Mantém apenas trechos que possam ser evidência (timeouts, redirecionamentos...)
+    evidence = []
+    last_end = 0
+    for kw in SCRIPT_KEYWORDS.finditer(body):
+        if kw.start() < last_end:
+            continue
+        start = max(last_end, kw.start() - 40)
+        last_end = kw.end() + 60
+        evidence.append(body[start:last_end].strip())
+        if len(evidence) >= 5:
+            break
+
+    summary = f"/* script de {len(body)} caracteres omitido */"
+    if evidence:
+        summary += "\n" + "\n".join(f"/* … */ {snippet}" for snippet in evidence)
+    return f"{open_tag}{summary}{close_tag}"
+
+
+def strip_non_auditable_html(html: str) -> str:
+    """
+    Remove conteúdo que não serve como evidência WCAG mas consome muitos
+    tokens. Atributos e elementos relevantes (alt, role, aria-*, <title>
+    dentro do SVG) são preservados.
+    """
+    html = DATA_URI_PATTERN.sub(r"\1…", html)
+    html = SVG_PATH_PATTERN.sub(r"\1\2…\2", html)
+    html = SCRIPT_PATTERN.sub(_summarize_script, html)
+    return html
+
+
+# ============================================================
+# 2. Sinais agregados
+# ============================================================
+def format_signals(signals: list, max_examples: int) -> str:
+    """
+    Uma linha por regra disparada (critério, descrição, contagem e
+    linhas), seguida de até max_examples trechos representativos.
+    """
+    if not signals:
+        return "Nenhum sinal pré-detectado."
+
+    lines = []
+    for signal in signals:
+        line = f"- [{signal['criterion']}] {signal['description']} — {signal['count']} ocorrência(s)"
+        if signal["lines"] and max_examples:
+            shown = signal["lines"][:MAX_PROMPT_SIGNAL_LINES]
+            line += " (linhas " + ", ".join(str(n) for n in shown)
+            line += ", …)" if len(shown) < signal["count"] else ")"
+        lines.append(line)
+        for example in signal["examples"][:max_examples]:
+            lines.append(f"    ex: {example}")
+    return "\n".join(lines)
+
+
+# ============================================================
+# Montagem final
+# ============================================================
+def build_prompt(
+    template: str,
+    html: str,
+    signals: list,
+    documents: list,
+    budget: int,
+    model: str,
+) -> tuple[str, dict]:
+    """
+    Monta o prompt respeitando o orçamento de tokens. Retorna o prompt
+    e um dict com o uso de tokens por seção.
+    """
+    template_tokens = count_tokens(template.format(signals="", context="", input=""), model)
+    available = max(budget - template_tokens, 0)
+
+    # --- HTML: remove conteúdo não auditável antes de qualquer corte ---
+    original_html_tokens = count_tokens(html, model)
+    html = strip_non_auditable_html(html)
+    html_tokens = count_tokens(html, model)
+
+    # --- Sinais: agregados por regra, com menos exemplos se preciso ---
+    for max_examples in SIGNAL_EXAMPLES_STEPS:
+        signals_text = format_signals(signals, max_examples)
+        signals_tokens = count_tokens(signals_text, model)
+        if signals_tokens <= available * SIGNALS_MAX_SHARE:
+            break
+
+    # --- HTML: truncado apenas se não couber junto do contexto mínimo ---
+    html_truncated = False
+    html_limit = int(available * (1 - CONTEXT_MIN_SHARE)) - signals_tokens
+    if html_tokens > html_limit:
+        html_limit = max(html_limit, 0)
+        html = truncate_to_tokens(html, html_limit, model)
+        html += f"\n<!-- … HTML truncado: {html_tokens - html_limit} tokens omitidos … -->"
+        html_truncated = True
+        html_tokens = count_tokens(html, model)
+
+    # --- Contexto WCAG: deduplicado, em ordem de relevância ---
+    context_limit = max(available - signals_tokens - html_tokens, 0)
+    separator = "\n\n---\n\n"
+    separator_tokens = count_tokens(separator, model)
+
+    seen = set()
+    context_parts = []
+    context_tokens = 0
+    duplicates = 0
+    for doc in documents:
+        content = doc.page_content.strip()
+        if content in seen:
+            duplicates += 1
+            continue
+        seen.add(content)
+
+        doc_tokens = count_tokens(content, model) + (separator_tokens if context_parts else 0)
+        if context_tokens + doc_tokens > context_limit:
+            continue
+        context_parts.append(content)
+        context_tokens += doc_tokens
+
+    context = separator.join(context_parts)
+
+    prompt = template.format(context=context, input=html, signals=signals_text)
+
+    usage = {
+        "budget": budget,
+        "template": template_tokens,
+        "signals": signals_tokens,
+        "context": context_tokens,
+        "html": html_tokens,
+        "total": template_tokens + signals_tokens + context_tokens + html_tokens,
+        "html_original": original_html_tokens,
+        "html_truncated": html_truncated,
+        "signals_in": sum(signal["count"] for signal in signals),
+        "signal_rules": len(signals),
+        "signal_examples": max_examples,
+        "context_docs_in": len(documents),
+        "context_docs_kept": len(context_parts),
+        "context_docs_duplicated": duplicates,
+    }
+    return prompt, usage
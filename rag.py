@@ -1,22 +1,90 @@
 # pip install langchain==0.1.20 langchain-core==0.1.52 langchain-community==0.0.38 langchain-openai==0.1.7 langchain-text-splitters==0.0.1 chromadb pypdf python-dotenv beautifulsoup4 lxml
 
+import asyncio
 import re
+import time
 import logging
+import threading
+from bisect import bisect_right
 from collections import Counter
-
-import streamlit as st
-from bs4 import BeautifulSoup
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain.schema import Document
-
-from config import llm, OPENAI_API_KEY
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import ResultCache, make_cache_key, normalize_html
+from config import (
+    get_llm,
+    OPENAI_API_KEY,
+    MODEL,
+    EMBEDDING_MODEL,
+    EMBEDDING_PROVIDER,
+    LOCAL_EMBEDDING_DIM,
+    INDEX_DIR,
+    INDEX_TYPE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    IVF_NLIST,
+    IVF_NPROBE,
+    PQ_M,
+    PQ_NBITS,
+    PROMPT_TOKEN_BUDGET,
+    SEGMENT_CONCURRENCY,
+    LLM_MAX_CONCURRENCY,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_RETRIES,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_MEMORY_ITEMS,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_BYTES,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MEMORY_ITEMS,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_CACHE_MAX_BYTES,
+)
+from corpus import (
+    CRITERION_NUMBER,
+    SPLITTER_PARAMS,
+    WCAG_PDF_PATH,
+    build_index_documents,
+    corpus_sources,
+    embed_texts,
+    source_fingerprints,
+)
+from criteria_table import ensure_criteria_table, get_criteria_table
+from findings import (
+    FindingsStream,
+    REPORT_HEADER,
+    EMPTY_REPORT_TEXT,
+    dump_report,
+    load_report,
+    merge_findings,
+    parse_report,
+    render_finding,
+)
+from prompt_budget import build_prompt, count_tokens
+from rules import aggregate_signals, rule_id, run_rules, signal_count, DOCUMENT_RULES, DOCUMENT_SCOPED_RULES, ELEMENT_RULES, RULE_CRITERIA, RULES_BY_ID
+from rules_report import build_rules_report
+from segments import split_into_segments, INCREMENTAL_SEGMENT_CHARS
+from tracing import trace, set_attr, add_tokens, current_context
 from wcag_techniques import WCAG_FAILURE_TECHNIQUES
 
+# LangChain, OpenAI e FAISS são importados dentro das funções que os usam:
+# importar este módulo (regras, testes, CLI, PDF) não deve pagar esse custo.
+
 logger = logging.getLogger(__name__)
 
+# Tokens de saída reservados no orçamento por minuto a cada chamada
+# (acertados com o consumo real quando o provedor o informa)
+LLM_OUTPUT_TOKENS_ESTIMATE = 1500
+
+# Quantos documentos de contexto recuperar por auditoria. Com a busca
+# híbrida, 12 cobrem mais critérios que 18 da busca só vetorial
+# (benchmarks/bench_retrieval.py)
+RETRIEVAL_K = 12
+
+# Profundidade de cada lista (vetorial e BM25) antes da fusão RRF
+HYBRID_FETCH_K = 30
 
 # ============================================================
 # Função utilitária para validar se o input parece HTML
@@ -27,117 +95,282 @@ def is_html_like(text: str) -> bool:
 
 
 # ============================================================
-# MELHORIA 2: Chunking semântico por critério WCAG
+# CORREÇÃO: FAISS Vector Store (sem SQLite)
 # ============================================================
-def split_by_wcag_criteria(documents: list) -> list:
+# Usa FAISS em vez de ChromaDB para evitar sqlite3.OperationalError
+# em produção. FAISS é um vector store in-memory puro.
+# get_vectorstore() mantém uma única instância por processo; o índice
+# em disco (index_store) persiste entre processos e deploys.
+# As fontes do corpus, o chunking e os embeddings em lote ficam em corpus.py.
+
+_index_key = None
+
+
+def get_index_key() -> str:
     """
-    Divide os documentos WCAG por limite de critério de sucesso,
-    mantendo cada critério como um chunk coeso em vez de cortar
-    no meio com splitter genérico.
+    Chave de conteúdo do índice (versão do índice), calculada uma vez
+    por processo. Não depende de rede.
     """
-    full_text = "\n".join([doc.page_content for doc in documents])
+    global _index_key
+    if _index_key is None:
+        from index_store import compute_index_key
+
+        _index_key = compute_index_key(
+            sources=source_fingerprints(corpus_sources()),
+            techniques=WCAG_FAILURE_TECHNIQUES,
+            splitter_params=SPLITTER_PARAMS,
+            embedding_model=get_embedding_model_id(),
+            index_params=get_index_params(),
+        )
+    return _index_key
 
-    # Padrão para detectar início de critérios WCAG
-    # Captura variações como "Critério de Sucesso 1.1.1" ou "1.1.1 Conteúdo Não Textual"
-    criteria_pattern = r'(?=(?:Critério de Sucesso\s+|Success Criterion\s+)?\d+\.\d+\.\d+[\s\u2013\u2014–—-]+[A-ZÀ-Ú])'
 
-    sections = re.split(criteria_pattern, full_text)
+def get_index_params() -> dict:
+    from index_store import index_build_params
 
-    criterion_docs = []
-    fallback_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1200,
-        chunk_overlap=200,
+    return index_build_params(
+        INDEX_TYPE,
+        hnsw_m=HNSW_M,
+        hnsw_ef_construction=HNSW_EF_CONSTRUCTION,
+        ivf_nlist=IVF_NLIST,
+        pq_m=PQ_M,
+        pq_nbits=PQ_NBITS,
     )
 
-    for section in sections:
-        section = section.strip()
-        if not section:
-            continue
-
-        criterion_match = re.match(r'(\d+\.\d+\.\d+)', section)
-
-        if criterion_match:
-            criterion_num = criterion_match.group(1)
-            if len(section) > 2000:
-                sub_chunks = fallback_splitter.split_text(section)
-                for i, chunk in enumerate(sub_chunks):
-                    criterion_docs.append(Document(
-                        page_content=chunk,
-                        metadata={"criterion": criterion_num, "chunk_part": i},
-                    ))
-            else:
-                criterion_docs.append(Document(
-                    page_content=section,
-                    metadata={"criterion": criterion_num},
-                ))
-        else:
-            if len(section) > 200:
-                sub_chunks = fallback_splitter.split_text(section)
-                for chunk in sub_chunks:
-                    criterion_docs.append(Document(
-                        page_content=chunk,
-                        metadata={"type": "general"},
-                    ))
-
-    return criterion_docs
 
+def get_embedding_model_id() -> str:
+    from embedding_providers import embedding_model_id
+
+    return embedding_model_id(EMBEDDING_PROVIDER, EMBEDDING_MODEL, LOCAL_EMBEDDING_DIM)
 
-# ============================================================
-# Carrega a WCAG e aplica chunking semântico
-# ============================================================
-# ============================================================
-# CORREÇÃO: FAISS Vector Store (sem SQLite)
-# ============================================================
-# Usa FAISS em vez de ChromaDB para evitar sqlite3.OperationalError
-# em produção. FAISS é um vector store in-memory puro.
-# @st.cache_resource persiste entre requisições da sessão.
 
-@st.cache_resource
 def load_vectorstore():
     """
-    Carrega e inicializa o vectorstore FAISS com WCAG 2.1 + Técnicas de Falha.
-    FAISS é um vector store em memória que não usa banco de dados.
-    O cache persiste enquanto a sessão Streamlit estiver ativa.
+    Carrega o vectorstore FAISS com as fontes do corpus (WCAG 2.1 +
+    Técnicas de Falha + PDFs adicionais).
+    Se já existir um índice em disco com a mesma chave de conteúdo,
+    ele é carregado via mmap sem nenhuma chamada de embeddings;
+    caso contrário o índice é construído e salvo para os próximos processos.
     """
+    import shutil
+
+    from embedding_providers import create_embeddings
+    from index_store import (
+        build_criteria_index,
+        build_vectorstore,
+        configure_search,
+        index_path,
+        load_index,
+        save_index,
+    )
+
     try:
-        loader = PyPDFLoader("assets/WCAG21-completo-1-43.pdf")
-        docs = loader.load()
-    except FileNotFoundError:
-        st.error("❌ PDF WCAG não encontrado em 'assets/WCAG21-completo-1-43.pdf'")
-        st.stop()
-
-    chunks = split_by_wcag_criteria(docs)
-
-    # ============================================================
-    # MELHORIA 4: Adiciona Técnicas de Falha WCAG ao vectorstore
-    # ============================================================
-    technique_docs = [
-        Document(
-            page_content=tech["content"],
-            metadata={"type": "technique", "technique_id": tech["id"]},
+        index_key = get_index_key()
+    except FileNotFoundError as e:
+        logger.error(f"Fonte do corpus não encontrada: '{e.filename}'")
+        raise
+
+    # Modelo de embeddings (usado também para as queries em tempo de busca)
+    embedding_model = create_embeddings(
+        EMBEDDING_PROVIDER,
+        openai_model=EMBEDDING_MODEL,
+        api_key=OPENAI_API_KEY,
+        local_dim=LOCAL_EMBEDDING_DIM,
+    )
+    # O provedor local já é um produto de matrizes em CPU: só a API vale cache
+    if EMBEDDING_CACHE_ENABLED and EMBEDDING_PROVIDER == "openai":
+        from embedding_cache import CachedEmbeddings
+
+        embedding_model = CachedEmbeddings(
+            embedding_model,
+            cache=ResultCache(
+                db_path=EMBEDDING_CACHE_PATH,
+                memory_items=EMBEDDING_CACHE_MEMORY_ITEMS,
+                ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+                max_bytes=EMBEDDING_CACHE_MAX_BYTES,
+            ),
+            model=get_embedding_model_id(),
         )
-        for tech in WCAG_FAILURE_TECHNIQUES
-    ]
 
-    all_chunks = chunks + technique_docs
-
-    # Modelo de embeddings
-    embedding_model = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        api_key=OPENAI_API_KEY,
+    folder = index_path(INDEX_DIR, index_key)
+    vectorstore = load_index(folder, embedding_model)
+    if vectorstore is not None:
+        configure_search(vectorstore.index, ef_search=HNSW_EF_SEARCH, nprobe=IVF_NPROBE)
+        logger.info(f"Índice FAISS carregado de '{folder}'")
+        return vectorstore
+
+    # Tabela de critérios (nível, princípio, diretriz): extraída do mesmo PDF
+    ensure_criteria_table(WCAG_PDF_PATH, WCAG_FAILURE_TECHNIQUES)
+
+    sources = corpus_sources()
+    all_chunks = build_index_documents(sources)
+
+    # Embeddings em lotes paralelos; os lotes prontos ficam no checkpoint
+    # até o índice ser salvo (uma nova tentativa reaproveita-os)
+    checkpoint_dir = folder.with_name(f".embeddings-{folder.name}")
+    vectors = embed_texts(
+        embedding_model,
+        [doc.page_content for doc in all_chunks],
+        checkpoint_dir=checkpoint_dir,
     )
 
     # Criação do banco vetorial FAISS (sem SQLite, 100% em memória)
-    vectorstore = FAISS.from_documents(
-        documents=all_chunks,
-        embedding=embedding_model,
-    )
-    
+    index_params = get_index_params()
+    vectorstore = build_vectorstore(all_chunks, vectors, embedding_model, index_params)
+    configure_search(vectorstore.index, ef_search=HNSW_EF_SEARCH, nprobe=IVF_NPROBE)
+
+    documents_per_source = Counter(doc.metadata["source"] for doc in all_chunks)
+    save_index(vectorstore, folder, criteria=build_criteria_index(vectorstore), manifest={
+        "key": index_key,
+        "sources": [{**source, "documents": documents_per_source.get(source["id"], 0)} for source in sources],
+        "embedding_provider": EMBEDDING_PROVIDER,
+        "embedding_model": get_embedding_model_id(),
+        "index": index_params,
+        "splitter": SPLITTER_PARAMS,
+        "techniques": [tech["id"] for tech in WCAG_FAILURE_TECHNIQUES],
+        "documents": len(all_chunks),
+    })
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    logger.info(f"Índice FAISS ({index_params['type']}) construído e salvo em '{folder}'")
+
     return vectorstore
 
 
-# Inicializar vectorstore com cache
-vectorstore = load_vectorstore()
+# ============================================================
+# Singletons sob demanda + warmup explícito
+# ============================================================
+_vectorstore = None
+_vectorstore_lock = threading.Lock()
+
+
+def get_vectorstore():
+    """
+    Retorna o vectorstore do processo, carregando-o na primeira chamada.
+    """
+    global _vectorstore
+    if _vectorstore is None:
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                _vectorstore = load_vectorstore()
+    return _vectorstore
+
+
+_criteria_index = None
+_criteria_index_lock = threading.Lock()
+
+
+def get_criteria_index() -> dict:
+    """
+    Mapa critério -> ids de chunks e de técnicas, gravado junto do índice
+    (recalculado a partir do docstore se o arquivo não existir).
+    """
+    global _criteria_index
+    if _criteria_index is None:
+        from index_store import build_criteria_index, index_path, load_criteria_index
+
+        vectorstore = get_vectorstore()
+        with _criteria_index_lock:
+            if _criteria_index is None:
+                criteria = load_criteria_index(index_path(INDEX_DIR, get_index_key()))
+                if criteria is None:
+                    criteria = build_criteria_index(vectorstore)
+                _criteria_index = criteria
+    return _criteria_index
+
+
+_lexical_index = None
+_lexical_index_lock = threading.Lock()
+
+
+def get_lexical_index():
+    """
+    Índice BM25 sobre os mesmos documentos do FAISS, construído em
+    memória na primeira chamada (poucas dezenas de ms).
+    """
+    global _lexical_index
+    if _lexical_index is None:
+        from lexical_index import BM25Index
+
+        vectorstore = get_vectorstore()
+        with _lexical_index_lock:
+            if _lexical_index is None:
+                _lexical_index = BM25Index.from_vectorstore(vectorstore)
+    return _lexical_index
+
+
+_llm_scheduler = None
+_llm_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    """
+    Agendador das chamadas assíncronas ao LLM, único por processo.
+    """
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        from llm_scheduler import LLMScheduler
+
+        with _llm_scheduler_lock:
+            if _llm_scheduler is None:
+                _llm_scheduler = LLMScheduler(
+                    max_concurrency=LLM_MAX_CONCURRENCY,
+                    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                    max_retries=LLM_MAX_RETRIES,
+                )
+    return _llm_scheduler
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """
+    Cache de relatórios do processo (None se desativado via config).
+    """
+    global _result_cache
+    if _result_cache is None and RESULT_CACHE_ENABLED:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    db_path=RESULT_CACHE_PATH,
+                    memory_items=RESULT_CACHE_MEMORY_ITEMS,
+                    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+                    max_bytes=RESULT_CACHE_MAX_BYTES,
+                )
+    return _result_cache
+
+
+def warmup() -> dict:
+    """
+    Inicializa LLM e vectorstore antecipadamente (chamado uma vez pelo
+    servidor) e retorna o tempo de cold start de cada etapa, em segundos.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    get_llm()
+    timings["llm"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_criteria_table()
+    get_vectorstore()
+    get_criteria_index()
+    get_lexical_index()
+    timings["vectorstore"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prewarm_query_embeddings()
+    timings["query_embeddings"] = time.perf_counter() - start
+
+    timings["total"] = timings["llm"] + timings["vectorstore"] + timings["query_embeddings"]
+    get_result_cache()
+    logger.info(
+        f"Warmup concluído: llm={timings['llm']:.3f}s "
+        f"vectorstore={timings['vectorstore']:.3f}s "
+        f"query_embeddings={timings['query_embeddings']:.3f}s total={timings['total']:.3f}s"
+    )
+    return timings
 
 
 # ============================================================
@@ -146,125 +379,57 @@ vectorstore = load_vectorstore()
 def pre_analyze_html(html: str) -> list:
     """
     Analisa o HTML com BeautifulSoup e retorna sinais objetivos
-    de problemas de acessibilidade detectáveis programaticamente.
-    """
-    signals = []
-    soup = BeautifulSoup(html, "lxml")
-
-    # --- lang no <html> ---
-    html_tag = soup.find("html")
-    if html_tag and not html_tag.get("lang"):
-        signals.append("Ausência de atributo lang no elemento <html>")
-
-    # --- <title> ---
-    if not soup.find("title") or not (soup.find("title") and soup.find("title").get_text(strip=True)):
-        signals.append("Página sem elemento <title> ou <title> vazio")
-
-    # --- Imagens sem alt ---
-    for img in soup.find_all("img"):
-        if not img.has_attr("alt"):
-            signals.append(f"Imagem sem atributo alt: {str(img)[:100]}")
-
-    # --- Links com imagem sem alt como único conteúdo ---
-    for link in soup.find_all("a"):
-        imgs = link.find_all("img")
-        text = link.get_text(strip=True)
-        if imgs and not text:
-            for img in imgs:
-                if not img.get("alt"):
-                    signals.append(f"Link com imagem sem alt como único conteúdo: {str(link)[:120]}")
-
-    # --- Inputs sem label associado ---
-    for inp in soup.find_all("input"):
-        if inp.get("type") in ("hidden", "submit", "button", "image"):
-            continue
-        inp_id = inp.get("id")
-        has_label = False
-        if inp_id:
-            has_label = bool(soup.find("label", attrs={"for": inp_id}))
-        if not has_label and not inp.get("aria-label") and not inp.get("aria-labelledby"):
-            signals.append(f"Campo de formulário sem label associado: {str(inp)[:100]}")
-
-    # --- Select sem label ---
-    for select in soup.find_all("select"):
-        sel_id = select.get("id")
-        has_label = False
-        if sel_id:
-            has_label = bool(soup.find("label", attrs={"for": sel_id}))
-        if not has_label and not select.get("aria-label") and not select.get("aria-labelledby"):
-            signals.append(f"Select sem label associado: {str(select)[:100]}")
-
-    # --- Textarea sem label ---
-    for ta in soup.find_all("textarea"):
-        ta_id = ta.get("id")
-        has_label = False
-        if ta_id:
-            has_label = bool(soup.find("label", attrs={"for": ta_id}))
-        if not has_label and not ta.get("aria-label") and not ta.get("aria-labelledby"):
-            signals.append(f"Textarea sem label associado: {str(ta)[:100]}")
-
-    # --- Botões sem nome acessível ---
-    for btn in soup.find_all("button"):
-        text = btn.get_text(strip=True)
-        if not text and not btn.get("aria-label") and not btn.get("aria-labelledby") and not btn.get("title"):
-            signals.append(f"Botão sem nome acessível: {str(btn)[:100]}")
-
-    # --- Vídeo sem track ---
-    for video in soup.find_all("video"):
-        if not video.find("track"):
-            signals.append(f"Vídeo sem elemento <track> para legendas: {str(video)[:100]}")
-
-    # --- Links com texto genérico ---
-    generic_texts = {
-        "clique aqui", "saiba mais", "leia mais", "click here",
-        "read more", "more", "aqui", "ver mais", "veja mais",
-    }
-    for link in soup.find_all("a"):
-        text = link.get_text(strip=True).lower()
-        if text in generic_texts and not link.get("aria-label") and not link.get("aria-labelledby"):
-            signals.append(f"Link com texto genérico '{text}': {str(link)[:100]}")
-
-    # --- Hierarquia de headings ---
-    headings = soup.find_all(re.compile(r"^h[1-6]$"))
-    prev_level = 0
-    for h in headings:
-        level = int(h.name[1])
-        if prev_level > 0 and level > prev_level + 1:
-            signals.append(f"Hierarquia de títulos quebrada: {h.name} após h{prev_level}")
-        prev_level = level
-
-    # --- Elementos com role interativo sem suporte a teclado ---
-    for el in soup.find_all(attrs={"role": True}):
-        role = el.get("role")
-        if role in ("button", "link", "tab", "menuitem") and not el.get("tabindex"):
-            signals.append(f"Elemento com role='{role}' sem tabindex: {str(el)[:100]}")
-
-    # --- IDs duplicados ---
-    all_ids = [el.get("id") for el in soup.find_all(id=True)]
-    duplicates = [id_val for id_val, count in Counter(all_ids).items() if count > 1]
-    for dup in duplicates:
-        signals.append(f"ID duplicado no documento: id='{dup}'")
-
-    # --- Estilos inline com cores (sinal para verificação de contraste) ---
-    for el in soup.find_all(style=True):
-        style = el.get("style", "")
-        if "color" in style or "background" in style:
-            signals.append(f"Estilo inline com cores (verificar contraste): {str(el)[:120]}")
-
-    # --- Elementos <marquee> ou <blink> ---
-    for tag_name in ("marquee", "blink"):
-        if soup.find(tag_name):
-            signals.append(f"Elemento <{tag_name}> detectado (conteúdo em movimento sem controle)")
-
-    # --- Radio/checkbox sem fieldset ---
-    for form in soup.find_all("form"):
-        radios = form.find_all("input", attrs={"type": "radio"})
-        if radios and not form.find("fieldset"):
-            names = {r.get("name") for r in radios if r.get("name")}
-            for name in names:
-                signals.append(f"Grupo de radio buttons '{name}' sem <fieldset>/<legend>")
-
-    return signals
+    de problemas de acessibilidade detectáveis programaticamente,
+    agregados por regra (critério, contagem, linhas, exemplos e a
+    lista completa de ocorrências). As verificações ficam em rules.py.
+    """
+    return run_rules(html)
+
+
+def pre_analyze_file(file) -> list:
+    """
+    Sinais de um arquivo aberto (ex: upload grande), lido em blocos pelo
+    parser incremental: o documento inteiro não é decodificado numa str
+    nem vira árvore do BeautifulSoup.
+    """
+    from rules_streaming import run_rules_streaming_by_rule
+
+    return aggregate_signals(run_rules_streaming_by_rule(file))
+
+
+QUERY_PREFIX = "WCAG 2.1 acessibilidade web "
+GENERIC_QUERY = "WCAG 2.1 critérios de sucesso acessibilidade web auditoria HTML"
+
+# Palavra-chave do sinal -> critérios relacionados (e termos de busca)
+SIGNAL_TO_CRITERIA = {
+    "lang": "critério 3.1.1 idioma da página language",
+    "title": "critério 2.4.2 título da página page title",
+    "alt": "critério 1.1.1 conteúdo não textual alternativa texto imagem",
+    "label": "critério 1.3.1 informações relações 3.3.2 rótulos instruções formulário",
+    "botão sem nome": "critério 4.1.2 nome função valor button accessible name",
+    "track": "critério 1.2.1 1.2.2 legendas mídia vídeo captions",
+    "genérico": "critério 2.4.4 finalidade do link link purpose",
+    "hierarquia": "critério 1.3.1 informações relações estrutura headings",
+    "tabindex": "critério 2.1.1 teclado 4.1.2 nome função valor keyboard",
+    "contraste": "critério 1.4.3 contraste mínimo 1.4.6 contraste aprimorado",
+    "foco": "critério 2.4.7 foco visível focus visible outline",
+    "animação": "critério 2.2.2 pausar parar ocultar movimento automático animação",
+    "select": "critério 1.3.1 informações relações 3.3.2 rótulos select",
+    "textarea": "critério 1.3.1 informações relações 3.3.2 rótulos textarea",
+    "duplicado": "critério 4.1.1 análise parsing ID duplicado",
+    "marquee": "critério 2.2.2 pausar parar ocultar movimento automático",
+    "blink": "critério 2.2.2 pausar parar ocultar piscar",
+    "fieldset": "critério 1.3.1 informações relações agrupamento radio fieldset legend",
+    "imagem sem alt como único": "critério 1.1.1 conteúdo não textual link imagem",
+}
+
+
+def _signal_phrase(signal: dict) -> str | None:
+    signal_lower = signal["description"].lower()
+    for keyword, criteria in SIGNAL_TO_CRITERIA.items():
+        if keyword in signal_lower:
+            return criteria
+    return None
 
 
 def build_retrieval_query(signals: list) -> str:
@@ -272,50 +437,136 @@ def build_retrieval_query(signals: list) -> str:
     Constrói uma query enriquecida para o vectorstore baseada nos
     sinais de acessibilidade pré-detectados no HTML.
     """
-    signal_to_criteria = {
-        "lang": "critério 3.1.1 idioma da página language",
-        "title": "critério 2.4.2 título da página page title",
-        "alt": "critério 1.1.1 conteúdo não textual alternativa texto imagem",
-        "label": "critério 1.3.1 informações relações 3.3.2 rótulos instruções formulário",
-        "botão sem nome": "critério 4.1.2 nome função valor button accessible name",
-        "track": "critério 1.2.1 1.2.2 legendas mídia vídeo captions",
-        "genérico": "critério 2.4.4 finalidade do link link purpose",
-        "hierarquia": "critério 1.3.1 informações relações estrutura headings",
-        "tabindex": "critério 2.1.1 teclado 4.1.2 nome função valor keyboard",
-        "contraste": "critério 1.4.3 contraste mínimo 1.4.6 contraste aprimorado",
-        "select": "critério 1.3.1 informações relações 3.3.2 rótulos select",
-        "textarea": "critério 1.3.1 informações relações 3.3.2 rótulos textarea",
-        "duplicado": "critério 4.1.1 análise parsing ID duplicado",
-        "marquee": "critério 2.2.2 pausar parar ocultar movimento automático",
-        "blink": "critério 2.2.2 pausar parar ocultar piscar",
-        "fieldset": "critério 1.3.1 informações relações agrupamento radio fieldset legend",
-        "imagem sem alt como único": "critério 1.1.1 conteúdo não textual link imagem",
-    }
+    # Deduplica mantendo ordem
+    unique_parts = list(dict.fromkeys(
+        phrase for phrase in map(_signal_phrase, signals) if phrase
+    ))
+
+    if unique_parts:
+        return QUERY_PREFIX + " ".join(unique_parts)
+    return GENERIC_QUERY
+
+
+def prewarm_query_embeddings() -> int:
+    """
+    Pré-calcula (numa chamada em lote) os embeddings da query genérica
+    e das queries de um único sinal (uma por entrada de
+    SIGNAL_TO_CRITERIA). Só páginas sem sinais ou com um único tipo de
+    sinal se beneficiam: build_retrieval_query junta as frases de todos
+    os sinais numa query só, e as combinações de vários sinais (o caso
+    comum em páginas reais) não são pré-calculadas. Essas ficam quentes
+    pelo cache persistente a partir da primeira auditoria que as usa.
+    Falhas de rede não impedem a inicialização.
+    """
+    embeddings = get_vectorstore().embeddings
+    if not hasattr(embeddings, "prewarm"):
+        return 0
+
+    queries = [GENERIC_QUERY] + [QUERY_PREFIX + phrase for phrase in SIGNAL_TO_CRITERIA.values()]
+    try:
+        computed = embeddings.prewarm(queries)
+    except Exception as e:
+        logger.warning(f"Pré-aquecimento dos embeddings de query falhou: {e}")
+        return 0
+    logger.info(f"Embeddings de query pré-aquecidos: {computed} nova(s) de {len(queries)}")
+    return computed
 
-    query_parts = []
+
+def detected_criteria(signals: list) -> list:
+    """
+    Critérios apontados pelos sinais, na ordem dos sinais: o critério
+    da regra e os relacionados na tabela SIGNAL_TO_CRITERIA.
+    """
+    criteria = []
     for signal in signals:
-        signal_lower = signal.lower()
-        for keyword, criteria in signal_to_criteria.items():
-            if keyword in signal_lower:
-                query_parts.append(criteria)
-                break
+        criteria.append(signal["criterion"])
+        criteria.extend(CRITERION_NUMBER.findall(_signal_phrase(signal) or ""))
+    return list(dict.fromkeys(criteria))
 
-    # Deduplica mantendo ordem
-    seen = set()
-    unique_parts = []
-    for part in query_parts:
-        if part not in seen:
-            seen.add(part)
-            unique_parts.append(part)
 
-    if unique_parts:
-        return "WCAG 2.1 acessibilidade web " + " ".join(unique_parts)
-    return "WCAG 2.1 critérios de sucesso acessibilidade web auditoria HTML"
+def retrieve_context(signals: list) -> list:
+    """
+    Contexto WCAG por consulta direta ao mapa de critérios (sem
+    embeddings): técnicas e texto normativo de cada critério detectado,
+    intercalados para que todos os critérios apareçam antes de trechos
+    secundários. As técnicas das próprias regras vêm antes das demais.
+    A busca vetorial só completa as vagas restantes quando algum
+    critério não está no mapa ou nenhum sinal foi detectado.
+    """
+    vectorstore = get_vectorstore()
+    criteria_index = get_criteria_index()
+
+    with trace("criteria_lookup"):
+        rule_techniques = [
+            criteria_index["technique_ids"][technique]
+            for signal in signals
+            for technique in RULE_CRITERIA[RULES_BY_ID[signal["rule"]]]["techniques"]
+            if technique in criteria_index["technique_ids"]
+        ]
+
+        per_criterion = []
+        missing = []
+        for criterion in detected_criteria(signals):
+            techniques = criteria_index["techniques"].get(criterion, [])
+            techniques = [t for t in rule_techniques if t in techniques] + techniques
+            ids = list(dict.fromkeys(techniques + criteria_index["chunks"].get(criterion, [])))
+            if ids:
+                per_criterion.append(ids)
+            else:
+                missing.append(criterion)
+
+        documents = []
+        seen = set()
+        for rank in range(max((len(ids) for ids in per_criterion), default=0)):
+            for ids in per_criterion:
+                if rank < len(ids) and ids[rank] not in seen:
+                    seen.add(ids[rank])
+                    documents.append(vectorstore.docstore.search(ids[rank]))
+    set_attr("criteria_lookup_docs", len(documents))
+
+    leftover = RETRIEVAL_K - len(documents)
+    if leftover > 0 and (missing or not documents):
+        ids = hybrid_search(build_retrieval_query(signals), k=leftover, exclude=seen)
+        documents += [vectorstore.docstore.search(doc_id) for doc_id in ids]
+
+    return documents
+
+
+def vector_search(query: str, k: int) -> list:
+    """
+    Ids do docstore dos k vizinhos mais próximos da query no FAISS.
+    """
+    import numpy as np
+
+    vectorstore = get_vectorstore()
+    with trace("query_embedding"):
+        query_vector = vectorstore.embeddings.embed_query(query)
+    with trace("faiss_search"):
+        _, positions = vectorstore.index.search(np.asarray([query_vector], dtype=np.float32), k)
+    return [vectorstore.index_to_docstore_id[p] for p in positions[0] if p >= 0]
+
+
+def hybrid_search(query: str, k: int, exclude=()) -> list:
+    """
+    Busca híbrida: vizinhos do FAISS e ranking BM25 fundidos por RRF.
+    Retorna até k ids do docstore, ignorando os de `exclude`.
+    """
+    from lexical_index import reciprocal_rank_fusion
+
+    vector_ids = vector_search(query, HYBRID_FETCH_K)
+    with trace("bm25_search"):
+        lexical_ids = get_lexical_index().search(query, HYBRID_FETCH_K)
+
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids], k=HYBRID_FETCH_K)
+    return [doc_id for doc_id in fused if doc_id not in exclude][:k]
 
 
 # ============================================================
 # MELHORIA 1: Prompt com Few-Shot Examples
 # ============================================================
+# Incrementar sempre que o prompt mudar: invalida o cache de resultados
+PROMPT_VERSION = 5
+
 prompt_template = """<persona>
 Você é um Especialista Sênior em Acessibilidade Web certificado em WCAG 2.1.
 Você atua como auditor técnico com foco em análises objetivas, verificáveis e normativamente fundamentadas.
@@ -357,10 +608,11 @@ REGRAS OBRIGATÓRIAS:
 
 6. Cada falha DEVE conter:
    - Descrição objetiva
-   - Número exato do critério (ex: 1.4.3)
+   - Número exato do critério (ex: 1.4.3) e seu nome
    - Nível (A, AA ou AAA)
    - Trecho literal do HTML que comprova
    - Correção técnica direta
+   - Id da Técnica de Falha do contexto, quando houver
 
 7. Não use linguagem especulativa ou preventiva.
    Apenas falhas comprováveis.
@@ -382,6 +634,9 @@ onchange, oninput, redirecionamento automático ou submit automático.
 
 13. Cada sinal pré-detectado deve ser avaliado. Se o sinal corresponder a uma falha WCAG
 comprovável, inclua no relatório. Se não, ignore-o silenciosamente.
+Os sinais vêm agregados por regra: a contagem indica quantos elementos têm o problema
+e os exemplos ("ex:") são trechos representativos. Registre uma falha por regra, usando
+um exemplo como evidência e a contagem na descrição.
 </rules>
 
 <examples>
@@ -400,40 +655,57 @@ comprovável, inclua no relatório. Se não, ignore-o silenciosamente.
 ```
 
 Sinais pré-detectados:
-- Ausência de atributo lang no elemento <html>
-- Imagem sem atributo alt: <img src="logo.png">
-- Campo de formulário sem label associado: <input type="text" name="nome">
-- Botão sem nome acessível: <button></button>
+- [3.1.1] Ausência de atributo lang no elemento <html> — 1 ocorrência(s)
+    ex: <html>
+- [1.1.1] Imagem sem atributo alt — 1 ocorrência(s)
+    ex: <img src="logo.png"/>
+- [1.3.1] Campo de formulário sem label associado — 1 ocorrência(s)
+    ex: <input name="nome" type="text"/>
+- [4.1.2] Botão sem nome acessível — 1 ocorrência(s)
+    ex: <button></button>
 </example_html>
 
 <example_report>
-## Relatório de Acessibilidade WCAG 2.1
-
-### Critério 3.1.1 – Idioma da Página (Nível A)
-**Falha:** O elemento `<html>` não possui o atributo `lang`, impedindo que tecnologias assistivas identifiquem o idioma do conteúdo.
-**Evidência:** `<html>`
-**Correção:** Adicionar atributo lang: `<html lang="pt-BR">`
-
----
-
-### Critério 1.1.1 – Conteúdo Não Textual (Nível A)
-**Falha:** Imagem sem texto alternativo. Tecnologias assistivas não conseguem descrever o conteúdo da imagem ao usuário.
-**Evidência:** `<img src="logo.png">`
-**Correção:** Adicionar atributo alt descritivo: `<img src="logo.png" alt="Logotipo da empresa">`
-
----
-
-### Critério 1.3.1 – Informações e Relações (Nível A)
-**Falha:** Campo de entrada sem rótulo associado programaticamente. A relação entre o campo e seu propósito não é determinável por tecnologias assistivas.
-**Evidência:** `<input type="text" name="nome">`
-**Correção:** Associar um label: `<label for="nome">Nome</label><input type="text" id="nome" name="nome">`
-
----
-
-### Critério 4.1.2 – Nome, Função, Valor (Nível A)
-**Falha:** Botão sem nome acessível. Tecnologias assistivas não conseguem comunicar a função do botão ao usuário.
-**Evidência:** `<button></button>`
-**Correção:** Adicionar texto ao botão: `<button>Enviar</button>` ou usar `<button aria-label="Enviar"></button>`
+{{
+  "falhas": [
+    {{
+      "criterio": "3.1.1",
+      "nome": "Idioma da Página",
+      "nivel": "A",
+      "descricao": "O elemento `<html>` não possui o atributo `lang`, impedindo que tecnologias assistivas identifiquem o idioma do conteúdo.",
+      "evidencia": "<html>",
+      "correcao": "Adicionar atributo lang: `<html lang=\\"pt-BR\\">`",
+      "tecnica": "F87"
+    }},
+    {{
+      "criterio": "1.1.1",
+      "nome": "Conteúdo Não Textual",
+      "nivel": "A",
+      "descricao": "Imagem sem texto alternativo. Tecnologias assistivas não conseguem descrever o conteúdo da imagem ao usuário.",
+      "evidencia": "<img src=\\"logo.png\\">",
+      "correcao": "Adicionar atributo alt descritivo: `<img src=\\"logo.png\\" alt=\\"Logotipo da empresa\\">`",
+      "tecnica": "F65"
+    }},
+    {{
+      "criterio": "1.3.1",
+      "nome": "Informações e Relações",
+      "nivel": "A",
+      "descricao": "Campo de entrada sem rótulo associado programaticamente. A relação entre o campo e seu propósito não é determinável por tecnologias assistivas.",
+      "evidencia": "<input type=\\"text\\" name=\\"nome\\">",
+      "correcao": "Associar um label: `<label for=\\"nome\\">Nome</label><input type=\\"text\\" id=\\"nome\\" name=\\"nome\\">`",
+      "tecnica": "F68"
+    }},
+    {{
+      "criterio": "4.1.2",
+      "nome": "Nome, Função, Valor",
+      "nivel": "A",
+      "descricao": "Botão sem nome acessível. Tecnologias assistivas não conseguem comunicar a função do botão ao usuário.",
+      "evidencia": "<button></button>",
+      "correcao": "Adicionar texto ao botão: `<button>Enviar</button>` ou usar `<button aria-label=\\"Enviar\\"></button>`",
+      "tecnica": "F86"
+    }}
+  ]
+}}
 </example_report>
 </example>
 
@@ -453,51 +725,81 @@ Sinais pré-detectados:
 ```
 
 Sinais pré-detectados:
-- Hierarquia de títulos quebrada: h3 após h1
-- Link com texto genérico 'clique aqui': <a href="/detalhes">Clique aqui</a>
-- Vídeo sem elemento <track> para legendas: <video src="demo.mp4"></video>
-- Elemento com role='button' sem tabindex: <div role="button">Comprar</div>
+- [1.3.1] Hierarquia de títulos quebrada — 1 ocorrência(s)
+    ex: h3 após h1
+- [2.4.4] Link com texto genérico — 1 ocorrência(s)
+    ex: <a href="/detalhes">Clique aqui</a>
+- [1.2.2] Vídeo sem elemento <track> para legendas — 1 ocorrência(s)
+    ex: <video src="demo.mp4"></video>
+- [4.1.2] Elemento com role interativo sem tabindex — 1 ocorrência(s)
+    ex: <div role="button">Comprar</div>
 </example_html>
 
 <example_report>
-## Relatório de Acessibilidade WCAG 2.1
-
-### Critério 1.3.1 – Informações e Relações (Nível A)
-**Falha:** Hierarquia de títulos quebrada. O elemento `<h3>` aparece diretamente após `<h1>`, pulando o nível `<h2>`. Tecnologias assistivas dependem da hierarquia correta para navegação.
-**Evidência:** `<h1>Produtos</h1>` seguido de `<h3>Eletrônicos</h3>`
-**Correção:** Ajustar para hierarquia sequencial: `<h2>Eletrônicos</h2>`
-
----
-
-### Critério 2.4.4 – Finalidade do Link (Nível A)
-**Falha:** Link com texto genérico que não descreve seu destino ou propósito fora de contexto.
-**Evidência:** `<a href="/detalhes">Clique aqui</a>`
-**Correção:** Usar texto descritivo: `<a href="/detalhes">Ver detalhes do produto</a>`
-
----
-
-### Critério 1.2.1 – Apenas Áudio e Apenas Vídeo (Pré-gravado) (Nível A)
-**Falha:** Elemento de vídeo sem legendas ou transcrição. Pessoas com deficiência auditiva não conseguem acessar o conteúdo.
-**Evidência:** `<video src="demo.mp4"></video>`
-**Correção:** Adicionar track de legendas: `<video src="demo.mp4"><track kind="captions" src="legendas.vtt" srclang="pt" label="Português"></video>`
-
----
-
-### Critério 4.1.2 – Nome, Função, Valor (Nível A)
-**Falha:** Elemento com `role="button"` sem `tabindex`, tornando-o inacessível por teclado.
-**Evidência:** `<div role="button">Comprar</div>`
-**Correção:** Adicionar tabindex e handlers de teclado: `<div role="button" tabindex="0">Comprar</div>` ou usar elemento nativo: `<button>Comprar</button>`
+{{
+  "falhas": [
+    {{
+      "criterio": "1.3.1",
+      "nome": "Informações e Relações",
+      "nivel": "A",
+      "descricao": "Hierarquia de títulos quebrada. O elemento `<h3>` aparece diretamente após `<h1>`, pulando o nível `<h2>`. Tecnologias assistivas dependem da hierarquia correta para navegação.",
+      "evidencia": "<h1>Produtos</h1> seguido de <h3>Eletrônicos</h3>",
+      "correcao": "Ajustar para hierarquia sequencial: `<h2>Eletrônicos</h2>`",
+      "tecnica": "F91"
+    }},
+    {{
+      "criterio": "2.4.4",
+      "nome": "Finalidade do Link (Em Contexto)",
+      "nivel": "A",
+      "descricao": "Link com texto genérico que não descreve seu destino ou propósito fora de contexto.",
+      "evidencia": "<a href=\\"/detalhes\\">Clique aqui</a>",
+      "correcao": "Usar texto descritivo: `<a href=\\"/detalhes\\">Ver detalhes do produto</a>`",
+      "tecnica": "F89"
+    }},
+    {{
+      "criterio": "1.2.1",
+      "nome": "Apenas Áudio e Apenas Vídeo (Pré-gravado)",
+      "nivel": "A",
+      "descricao": "Elemento de vídeo sem legendas ou transcrição. Pessoas com deficiência auditiva não conseguem acessar o conteúdo.",
+      "evidencia": "<video src=\\"demo.mp4\\"></video>",
+      "correcao": "Adicionar track de legendas: `<video src=\\"demo.mp4\\"><track kind=\\"captions\\" src=\\"legendas.vtt\\" srclang=\\"pt\\" label=\\"Português\\"></video>`",
+      "tecnica": ""
+    }},
+    {{
+      "criterio": "4.1.2",
+      "nome": "Nome, Função, Valor",
+      "nivel": "A",
+      "descricao": "Elemento com `role=\\"button\\"` sem `tabindex`, tornando-o inacessível por teclado.",
+      "evidencia": "<div role=\\"button\\">Comprar</div>",
+      "correcao": "Adicionar tabindex e handlers de teclado: `<div role=\\"button\\" tabindex=\\"0\\">Comprar</div>` ou usar elemento nativo: `<button>Comprar</button>`",
+      "tecnica": "F59"
+    }}
+  ]
+}}
 </example_report>
 </example>
 </examples>
 
 <output_format>
-Relatório de Acessibilidade
+Responda APENAS com um objeto JSON válido, sem Markdown ao redor, no formato:
+{{
+  "falhas": [
+    {{
+      "criterio": "número exato do critério, ex: 1.4.3",
+      "nome": "nome do critério, ex: Contraste (Mínimo)",
+      "nivel": "A | AA | AAA",
+      "descricao": "descrição objetiva da falha",
+      "evidencia": "trecho literal do HTML que comprova a falha",
+      "correcao": "correção técnica direta",
+      "tecnica": "id da Técnica de Falha (ex: F65) ou string vazia"
+    }}
+  ]
+}}
 
 - Liste apenas falhas comprovadas
-- Agrupe por critério
-- Separe cada critério com "---"
+- Falhas do mesmo critério devem ficar em sequência
 - Não inclua observações preventivas
+- Sem falhas comprovadas: {{"falhas": []}}
 </output_format>
 
 <sinais_pre_detectados>
@@ -526,7 +828,7 @@ def get_vectorstore_chunks() -> list:
     Retorna lista de chunks do vectorstore formatados para exibição.
     """
     try:
-        all_docs = vectorstore.get()
+        all_docs = get_vectorstore().get()
         chunks_data = []
 
         for i, doc in enumerate(all_docs['documents'], 1):
@@ -544,33 +846,431 @@ def get_vectorstore_chunks() -> list:
 
 
 # ============================================================
-# Função principal chamada pelo Streamlit
+# Preparação comum às variantes síncrona e em streaming
 # ============================================================
-def analyze_html(user_input: str) -> str:
-    if not is_html_like(user_input):
-        return (
-            "Entrada inválida: este sistema analisa exclusivamente "
-            "código HTML para auditoria de acessibilidade WCAG."
-        )
+def prepare_audit(user_input: str, signals: list | None = None) -> dict:
+    """
+    Executa a pré-análise, consulta o cache e, se necessário, a
+    recuperação de contexto. Retorna um dict com "report" (hit de cache)
+    ou "prompt" pronto para o LLM, além da chave de cache.
+    Sinais já calculados (ex: por segmento) podem ser informados.
+    """
+    set_attr("html_chars", len(user_input))
 
     # MELHORIA 3: Pré-análise do HTML para extrair sinais objetivos
-    signals = pre_analyze_html(user_input)
-    signals_text = "\n".join(f"- {s}" for s in signals) if signals else "Nenhum sinal pré-detectado."
+    if signals is None:
+        with trace("parse_rules"):
+            signals = pre_analyze_html(user_input)
+    set_attr("signal_count", signal_count(signals))
+
+    # Cache endereçado por conteúdo: HTML idêntico não paga embedding/LLM de novo
+    result_cache = get_result_cache()
+    cache_key = None
+    if result_cache is not None:
+        with trace("cache_lookup"):
+            cache_key = make_cache_key(normalize_html(user_input), signals, *_audit_context())
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            set_attr("cache_hit", True)
+            return {"report": load_report(cached), "cache_key": cache_key, "signals": signals}
+
+    # Recupera chunks da WCAG + Técnicas de Falha dos critérios detectados
+    # (consulta direta; busca vetorial só para completar)
+    relevant_docs = retrieve_context(signals)
+    set_attr("retrieved_chunks", len(relevant_docs))
 
-    # Query enriquecida com base nos sinais detectados
-    query = build_retrieval_query(signals)
+    # Monta o prompt com few-shot, sinais, contexto WCAG e HTML
+    # dentro do orçamento de tokens
+    with trace("prompt_format"):
+        formatted_prompt, token_usage = build_prompt(
+            template=prompt_template,
+            html=user_input,
+            signals=signals,
+            documents=relevant_docs,
+            budget=PROMPT_TOKEN_BUDGET,
+            model=MODEL,
+        )
+    set_attr("prompt_tokens", token_usage)
+    logger.info(f"Uso de tokens do prompt: {token_usage}")
+
+    return {
+        "prompt": formatted_prompt,
+        "cache_key": cache_key,
+        "signals": signals,
+        "token_usage": token_usage,
+    }
 
-    # Recupera chunks relevantes da WCAG + Técnicas de Falha
-    relevant_docs = vectorstore.similarity_search(query, k=18)
-    context = "\n\n---\n\n".join([doc.page_content for doc in relevant_docs])
 
-    # Monta o prompt com few-shot, sinais, contexto WCAG e HTML
-    formatted_prompt = prompt_template.format(
-        context=context,
-        input=user_input,
-        signals=signals_text,
-    )
+def _audit_context() -> tuple:
+    # Tudo além do HTML e dos sinais que muda o relatório do LLM
+    return (PROMPT_VERSION, PROMPT_TOKEN_BUDGET, RETRIEVAL_K, MODEL, get_index_key())
+
+
+def audit_version(mode: str) -> str:
+    """
+    Versão de tudo, além do HTML, que determina o relatório de um modo
+    (prompt, orçamento, modelo, índice). O modo "rules" não depende do
+    prompt nem do índice. Usada pela CLI para decidir se pode retomar.
+    """
+    if mode == "rules":
+        return make_cache_key(mode)
+    return make_cache_key(mode, *_audit_context())
+
+
+def _store_report(cache_key: str | None, report: dict) -> None:
+    result_cache = get_result_cache()
+    if result_cache is not None and cache_key is not None:
+        result_cache.put(cache_key, dump_report(report))
+
+
+def _json_llm():
+    # Modo JSON do provedor: a resposta é sempre um objeto JSON
+    return get_llm().bind(response_format={"type": "json_object"})
+
+
+def run_audit(audit: dict) -> dict:
+    """
+    Conclui uma auditoria preparada: devolve o hit de cache ou envia
+    o prompt ao LLM, valida as falhas e grava o relatório no cache.
+    """
+    if "report" in audit:
+        return audit["report"]
 
     # Envia para o LLM
-    response = llm.invoke(formatted_prompt)
-    return response.content
+    with trace("llm"):
+        response = _json_llm().invoke(audit["prompt"])
+    return _finish_audit(audit, response)
+
+
+async def run_audit_async(audit: dict) -> dict:
+    """
+    Variante assíncrona de run_audit: a chamada (ainvoke) passa pelo
+    agendador compartilhado (limite de concorrência, tokens por minuto,
+    backoff e coalescência de prompts idênticos).
+    """
+    if "report" in audit:
+        return audit["report"]
+
+    prompt = audit["prompt"]
+    with trace("llm"):
+        response = await get_llm_scheduler().run(
+            key=make_cache_key("llm", MODEL, prompt),
+            factory=lambda: _json_llm().ainvoke(prompt),
+            tokens=audit["token_usage"]["total"] + LLM_OUTPUT_TOKENS_ESTIMATE,
+            usage=_response_tokens,
+        )
+    return _finish_audit(audit, response)
+
+
+def _finish_audit(audit: dict, response) -> dict:
+    _record_llm_tokens(audit, response.content, getattr(response, "response_metadata", None))
+
+    # Validação única: daqui em diante só circula o objeto estruturado
+    report = parse_report(response.content)
+    set_attr("findings", len(report["falhas"]))
+    _store_report(audit["cache_key"], report)
+
+    return report
+
+
+def _response_tokens(response) -> int | None:
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+def _record_llm_tokens(audit: dict, report: str, metadata: dict | None = None) -> None:
+    # Usa a contagem do provedor quando disponível; senão, a estimativa local
+    usage = (metadata or {}).get("token_usage") or {}
+    add_tokens(
+        input_tokens=usage.get("prompt_tokens") or audit["token_usage"]["total"],
+        output_tokens=usage.get("completion_tokens") or count_tokens(report, MODEL),
+    )
+
+
+# ============================================================
+# Auditoria segmentada de documentos grandes
+# ============================================================
+def analyze_segmented(user_input: str) -> dict:
+    """
+    Divide o documento em segmentos alinhados a landmarks, audita cada
+    um em paralelo (até SEGMENT_CONCURRENCY chamadas simultâneas) e funde
+    os relatórios por critério. O tempo total acompanha o segmento mais
+    lento, não a soma dos segmentos.
+    """
+    segments = split_into_segments(user_input)
+
+    # Regras de documento (lang, title, IDs, headings, contraste, CSS)
+    # rodam uma vez sobre o HTML completo; cada ocorrência vai para o
+    # segmento que contém o elemento
+    routed = route_document_signals(segments, run_rules(user_input, DOCUMENT_RULES))
+
+    def audit_segment(i: int) -> dict:
+        return run_audit(_prepare_segment(segments[i], routed[i]))
+
+    # Cada segmento roda numa cópia do contexto atual, para que suas
+    # etapas entrem no mesmo registro de trace da requisição
+    with ThreadPoolExecutor(max_workers=max(1, SEGMENT_CONCURRENCY)) as pool:
+        futures = [
+            pool.submit(current_context().run, audit_segment, i)
+            for i in range(len(segments))
+        ]
+        reports = [future.result() for future in futures]
+
+    # Atributos do documento inteiro (os segmentos sobrescrevem os seus)
+    set_attr("segments", len(segments))
+    set_attr("html_chars", len(user_input))
+
+    logger.info(f"Auditoria segmentada: {len(segments)} segmento(s)")
+    return merge_findings(reports)
+
+
+def route_document_signals(segments: list, document_signals: list) -> list:
+    """
+    Sinais de documento de cada segmento (mesma ordem de `segments`).
+    As regras que descrevem o documento como um todo (DOCUMENT_SCOPED_RULES)
+    e as ocorrências sem posição no fonte ficam no segmento do documento;
+    as demais vão para o segmento cujo trecho no fonte contém o elemento.
+    Assim o contraste de um parágrafo do <main> só pesa no segmento do
+    <main>, não no do documento.
+    """
+    scoped = {rule_id(rule) for rule in DOCUMENT_SCOPED_RULES}
+    # Trechos não se sobrepõem e seguem a ordem do documento
+    located = sorted((segment["span"], i) for i, segment in enumerate(segments) if segment["span"] is not None)
+    starts = [span[0] for span, _ in located]
+
+    buckets = [{} for _ in segments]
+    for signal in document_signals:
+        for occurrence in signal["occurrences"]:
+            target = 0  # segmento do documento
+            offset = occurrence.get("offset")
+            if signal["rule"] not in scoped and offset is not None:
+                position = bisect_right(starts, offset) - 1
+                if position >= 0 and offset < located[position][0][1]:
+                    target = located[position][1]
+            buckets[target].setdefault(signal["rule"], []).append(occurrence)
+
+    return [
+        aggregate_signals([(RULES_BY_ID[rule], occurrences) for rule, occurrences in bucket.items()])
+        for bucket in buckets
+    ]
+
+
+def _prepare_segment(segment: dict, document_signals: list) -> dict:
+    with trace("parse_rules"):
+        # Segmentos são HTML reserializado: linhas não seriam as do arquivo
+        signals = run_rules(segment["html"], ELEMENT_RULES, source_positions=False)
+    return prepare_audit(segment["html"], signals=document_signals + signals)
+
+
+async def analyze_segmented_async(user_input: str) -> dict:
+    """
+    Variante assíncrona de analyze_segmented: a preparação de cada
+    segmento roda em thread e as chamadas ao LLM ficam a cargo do
+    agendador, que aplica o limite global de concorrência.
+    """
+    segments = await asyncio.to_thread(split_into_segments, user_input)
+    document_signals = await asyncio.to_thread(run_rules, user_input, DOCUMENT_RULES)
+    routed = route_document_signals(segments, document_signals)
+
+    async def audit_segment(i: int) -> dict:
+        audit = await asyncio.to_thread(_prepare_segment, segments[i], routed[i])
+        return await run_audit_async(audit)
+
+    reports = await asyncio.gather(*(audit_segment(i) for i in range(len(segments))))
+
+    set_attr("segments", len(segments))
+    set_attr("html_chars", len(user_input))
+
+    logger.info(f"Auditoria segmentada: {len(segments)} segmento(s)")
+    return merge_findings(reports)
+
+
+# ============================================================
+# Reauditoria incremental por seção
+# ============================================================
+def _section_key(segment: dict, document_signals: list) -> str:
+    # Markup da seção + sinais de documento atribuídos a ela (ver
+    # route_document_signals). Sem linhas nem offsets: editar outra seção
+    # desloca as posições no arquivo, mas não muda estes sinais. O
+    # segmento do documento só recebe lang, title, IDs duplicados e o que
+    # está fora das seções; mudar cores ou texto de uma seção muda a chave
+    # dessa seção, não a do documento
+    signals = [(s["rule"], s["count"], s["examples"]) for s in document_signals]
+    return make_cache_key("section", segment["fingerprint"], signals, *_audit_context())
+
+
+def _plan_incremental(user_input: str) -> dict:
+    """
+    Segmenta o documento e busca no cache as falhas de cada seção pela
+    sua impressão digital. Seções sem entrada (novas ou alteradas) ficam
+    com report None e são as únicas que vão ao retrieval e ao LLM.
+    """
+    segments = split_into_segments(user_input, max_chars=INCREMENTAL_SEGMENT_CHARS)
+    document_signals = route_document_signals(segments, run_rules(user_input, DOCUMENT_RULES))
+    keys = [_section_key(segment, signals) for segment, signals in zip(segments, document_signals)]
+
+    result_cache = get_result_cache()
+    reports = []
+    for key in keys:
+        cached = result_cache.get(key) if result_cache is not None else None
+        reports.append(load_report(cached) if cached is not None else None)
+
+    changed = sum(1 for report in reports if report is None)
+    set_attr("segments", len(segments))
+    set_attr("segments_changed", changed)
+    logger.info(f"Auditoria incremental: {changed} de {len(segments)} seção(ões) alterada(s)")
+    return {"segments": segments, "document_signals": document_signals, "keys": keys, "reports": reports}
+
+
+def analyze_incremental(user_input: str) -> dict:
+    """
+    Como analyze_segmented, mas reaproveita as falhas guardadas das
+    seções inalteradas desde a última auditoria: no ciclo de edição de
+    um componente, só a seção editada paga retrieval e LLM.
+    """
+    plan = _plan_incremental(user_input)
+    reports = plan["reports"]
+
+    def audit_section(i: int) -> dict:
+        report = run_audit(_prepare_segment(plan["segments"][i], plan["document_signals"][i]))
+        _store_report(plan["keys"][i], report)
+        return report
+
+    changed = [i for i, report in enumerate(reports) if report is None]
+    with ThreadPoolExecutor(max_workers=max(1, SEGMENT_CONCURRENCY)) as pool:
+        futures = {i: pool.submit(current_context().run, audit_section, i) for i in changed}
+        for i, future in futures.items():
+            reports[i] = future.result()
+
+    set_attr("html_chars", len(user_input))
+    return merge_findings(reports)
+
+
+async def analyze_incremental_async(user_input: str) -> dict:
+    plan = await asyncio.to_thread(_plan_incremental, user_input)
+    reports = plan["reports"]
+
+    async def audit_section(i: int) -> None:
+        audit = await asyncio.to_thread(_prepare_segment, plan["segments"][i], plan["document_signals"][i])
+        reports[i] = await run_audit_async(audit)
+        _store_report(plan["keys"][i], reports[i])
+
+    await asyncio.gather(*(audit_section(i) for i, report in enumerate(reports) if report is None))
+
+    set_attr("html_chars", len(user_input))
+    return merge_findings(reports)
+
+
+# ============================================================
+# Função principal chamada pelo Streamlit
+# ============================================================
+ANALYSIS_MODES = ("full", "segmented", "incremental", "rules")
+
+def analyze_html(user_input: str, mode: str = "full", signals: list | None = None) -> dict:
+    """
+    Retorna o relatório estruturado ({"falhas": [...]}, ver findings.py).
+
+    mode="full": um único prompt com o documento inteiro.
+    mode="segmented": auditoria paralela por segmentos (documentos grandes).
+    mode="incremental": por segmentos, reaproveitando as falhas das seções
+    inalteradas desde a última auditoria (ciclo de edição).
+    mode="rules": apenas regras determinísticas, sem retrieval, LLM ou rede.
+    Sinais já calculados (ex: pela CLI em outro processo) evitam refazer
+    a pré-análise no modo "full".
+    """
+    if not is_html_like(user_input):
+        raise ValueError(INVALID_INPUT_MESSAGE)
+
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Modo de análise desconhecido: {mode}")
+
+    with trace("analyze_html", mode=mode):
+        if mode == "rules":
+            with trace("parse_rules"):
+                signals = run_rules(user_input)
+            return build_rules_report(signals)
+        if mode == "segmented":
+            return analyze_segmented(user_input)
+        if mode == "incremental":
+            return analyze_incremental(user_input)
+        return run_audit(prepare_audit(user_input, signals=signals))
+
+
+async def analyze_html_async(user_input: str, mode: str = "full", signals: list | None = None) -> dict:
+    """
+    Variante assíncrona de analyze_html (mesmos modos e retorno). Parse,
+    regras e retrieval rodam em thread; a espera pelo LLM não ocupa
+    nenhuma thread.
+    """
+    if not is_html_like(user_input):
+        raise ValueError(INVALID_INPUT_MESSAGE)
+
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Modo de análise desconhecido: {mode}")
+
+    with trace("analyze_html", mode=mode):
+        if mode == "rules":
+            with trace("parse_rules"):
+                signals = await asyncio.to_thread(run_rules, user_input)
+            return build_rules_report(signals)
+        if mode == "segmented":
+            return await analyze_segmented_async(user_input)
+        if mode == "incremental":
+            return await analyze_incremental_async(user_input)
+        audit = await asyncio.to_thread(prepare_audit, user_input, signals)
+        return await run_audit_async(audit)
+
+
+def analyze_html_stream(user_input: str, signals: list | None = None):
+    """
+    Variante em streaming de analyze_html: gera o relatório em Markdown,
+    uma falha por vez, à medida que cada objeto JSON fecha na resposta
+    do LLM. O relatório estruturado é o valor de retorno do gerador
+    (use `relatorio = yield from analyze_html_stream(...)`); None se a
+    entrada for inválida. O relatório é gravado no cache ao final.
+    Sinais já calculados (ex: de um upload grande, sobre o arquivo
+    inteiro) evitam refazer a pré-análise sobre user_input.
+    """
+    if not is_html_like(user_input):
+        yield INVALID_INPUT_MESSAGE
+        return None
+
+    stream_start = time.perf_counter()
+    with trace("analyze_html", mode="stream"):
+        audit = prepare_audit(user_input, signals=signals)
+        if "report" in audit:
+            yield from _render_stream(audit["report"]["falhas"])
+            return audit["report"]
+
+        yield f"{REPORT_HEADER}\n\n"
+        findings_stream = FindingsStream()
+        previous = None
+        with trace("llm"):
+            first_chunk = True
+            for chunk in _json_llm().stream(audit["prompt"]):
+                if not chunk.content:
+                    continue
+                if first_chunk:
+                    set_attr("llm_first_token_s", time.perf_counter() - stream_start)
+                    first_chunk = False
+                for finding in findings_stream.feed(chunk.content):
+                    yield render_finding(finding, previous)
+                    previous = finding
+
+        report = findings_stream.close()
+        if not report["falhas"]:
+            yield EMPTY_REPORT_TEXT
+        set_attr("findings", len(report["falhas"]))
+        _record_llm_tokens(audit, findings_stream.text)
+        _store_report(audit["cache_key"], report)
+        return report
+
+
+def _render_stream(findings: list):
+    yield f"{REPORT_HEADER}\n\n"
+    previous = None
+    for finding in findings:
+        yield render_finding(finding, previous)
+        previous = finding
+    if not findings:
+        yield EMPTY_REPORT_TEXT
@@ -0,0 +1,697 @@
+# ============================================================
+# Motor de regras da pré-análise HTML (passada única + índices)
+# ============================================================
+# O DOM é percorrido uma única vez. Durante a passada são montados
+# índices (elementos por tag, por id, labels por "for", sequência de
+# headings, etc.) e cada verificação vira uma regra que apenas consome
+# esses índices — sem novos find_all/find sobre a árvore inteira.
+
+import re
+from bisect import bisect_right
+from collections import Counter
+
+from bs4 import BeautifulSoup, Tag
+
+from config import STREAMING_PARSE_THRESHOLD
+
+HEADING_PATTERN = re.compile(r"^h[1-6]$")
+
+INPUT_TYPES_WITHOUT_LABEL = ("hidden", "submit", "button", "image")
+
+INTERACTIVE_ROLES = ("button", "link", "tab", "menuitem")
+
+FOCUSABLE_TAGS = ("button", "select", "textarea", "summary", "iframe")
+
+# Movimento automático acima disto precisa de controle (WCAG 2.2.2)
+MAX_ANIMATION_SECONDS = 5
+
+GENERIC_LINK_TEXTS = {
+    "clique aqui", "saiba mais", "leia mais", "click here",
+    "read more", "more", "aqui", "ver mais", "veja mais",
+}
+
+
+# ============================================================
+# Posições no fonte (evidências sem reserializar o DOM)
+# ============================================================
+# O tree builder lxml do BeautifulSoup não informa sourceline/sourcepos.
+# Uma varredura linear do HTML original registra o offset de cada tag
+# de abertura, por nome, na ordem do documento; o k-ésimo elemento
+# <nome> do DOM corresponde ao k-ésimo "<nome" do fonte. Nomes em que
+# as contagens divergem (tags implícitas como <tbody>, ou descartadas
+# pelo parser) ficam sem posição e usam a tag reconstruída dos atributos.
+SOURCE_TAG_PATTERN = re.compile(
+    r"<!--.*?(?:-->|\Z)"
+    r"|<!\[CDATA\[.*?(?:\]\]>|\Z)"
+    r"|<(script|style)\b[^>]*>.*?(?:</\1\s*>|\Z)"
+    r"|<([a-zA-Z][^\s/>]*)",
+    re.DOTALL | re.IGNORECASE,
+)
+
+START_TAG_PATTERN = re.compile(
+    r"<[^\s/>]+(?:\s+[^\s=>/]+(?:\s*=\s*(?:\"[^\"]*\"|'[^']*'|[^\s>]+))?)*\s*/?>",
+)
+
+
+def scan_source_tags(html: str) -> dict:
+    """
+    Offsets das tags de abertura no HTML original, por nome (minúsculo).
+    Comentários, CDATA e o conteúdo de <script>/<style> são ignorados.
+    """
+    offsets = {}
+    for match in SOURCE_TAG_PATTERN.finditer(html):
+        name = match.group(1) or match.group(2)
+        if name:
+            offsets.setdefault(name.lower(), []).append(match.start())
+    return offsets
+
+
+def _element_offset(index: dict, el: Tag) -> int | None:
+    source = index["source"]
+    if source is None:
+        return None
+
+    # Mapeamento elemento -> offset montado sob demanda, por nome de tag
+    by_name = index["offsets"].get(el.name)
+    if by_name is None:
+        if source["tags"] is None:
+            source["tags"] = scan_source_tags(source["html"])
+        elements = _tags(index, el.name)
+        positions = source["tags"].get(el.name, [])
+        by_name = {}
+        if len(positions) == len(elements):
+            by_name = {id(e): pos for e, pos in zip(elements, positions)}
+        index["offsets"][el.name] = by_name
+    return by_name.get(id(el))
+
+
+def _line_of(index: dict, offset: int) -> int:
+    source = index["source"]
+    if source["newlines"] is None:
+        source["newlines"] = [m.start() for m in re.finditer("\n", source["html"])]
+    return bisect_right(source["newlines"], offset) + 1
+
+
+def start_tag(el: Tag) -> str:
+    # Reconstruída só com nome e atributos: O(atributos), não O(subárvore)
+    attrs = "".join(
+        f' {key}="{" ".join(value) if isinstance(value, list) else value}"'
+        for key, value in el.attrs.items()
+    )
+    return f"<{el.name}{attrs}>"
+
+
+# ============================================================
+# Passada única: construção dos índices
+# ============================================================
+def build_dom_index(soup: BeautifulSoup, html: str | None = None) -> dict:
+    """
+    Percorre o DOM uma vez e devolve os índices usados pelas regras.
+    Listas preservam a ordem do documento. Com o HTML original, as
+    evidências citam o trecho e a linha exatos do fonte.
+    """
+    index = {
+        "source": None if html is None else {"html": html, "tags": None, "newlines": None},
+        "offsets": {},
+        "by_tag": {},
+        "by_id": {},
+        "ids": [],
+        "labels_for": set(),
+        "headings": [],
+        "with_role": [],
+        "with_style": [],
+        "elements": [],
+        "declarations": {},
+        "stylesheet": None,
+        "contrast": None,
+        # Dados de subárvore, indexados por id(tag) do ancestral
+        "link_imgs": {},
+        "video_has_track": set(),
+        "form_radios": {},
+        "form_has_fieldset": set(),
+    }
+
+    by_tag = index["by_tag"]
+
+    for el in soup.descendants:
+        if not isinstance(el, Tag):
+            continue
+
+        name = el.name
+        by_tag.setdefault(name, []).append(el)
+        index["elements"].append(el)
+
+        el_id = el.get("id")
+        if el_id is not None:
+            index["ids"].append(el_id)
+            index["by_id"].setdefault(el_id, []).append(el)
+
+        if el.get("role") is not None:
+            index["with_role"].append(el)
+
+        if el.get("style") is not None:
+            index["with_style"].append(el)
+
+        if HEADING_PATTERN.match(name):
+            index["headings"].append(el)
+        elif name == "label":
+            label_for = el.get("for")
+            if label_for is not None:
+                index["labels_for"].add(label_for)
+        elif name == "img":
+            # Imagens dentro de links: O(profundidade) por imagem
+            for parent in el.parents:
+                if parent.name == "a":
+                    index["link_imgs"].setdefault(id(parent), []).append(el)
+        elif name == "track":
+            for parent in el.parents:
+                if parent.name == "video":
+                    index["video_has_track"].add(id(parent))
+        elif name == "fieldset":
+            for parent in el.parents:
+                if parent.name == "form":
+                    index["form_has_fieldset"].add(id(parent))
+        elif name == "input" and el.get("type") == "radio":
+            for parent in el.parents:
+                if parent.name == "form":
+                    index["form_radios"].setdefault(id(parent), []).append(el)
+
+    return index
+
+
+def _tags(index: dict, name: str) -> list:
+    return index["by_tag"].get(name, [])
+
+
+def _style_blocks(index: dict) -> list:
+    """(CSS, atributo media) de cada <style> de CSS, na ordem do documento."""
+    return [
+        (style.string or "", style.get("media"))
+        for style in _tags(index, "style")
+        if style.get("type", "text/css").lower() == "text/css"
+    ]
+
+
+def _stylesheet(index: dict) -> dict:
+    """Folhas <style> do documento, parseadas e indexadas uma vez."""
+    if index["stylesheet"] is None:
+        from stylesheet import parse_style_blocks
+
+        index["stylesheet"] = parse_style_blocks(_style_blocks(index))
+    return index["stylesheet"]
+
+
+def _declarations(index: dict, el: Tag) -> dict:
+    """
+    Declarações CSS em vigor no elemento (regras dos <style> que casam
+    com ele + atributo style), calculadas uma vez por elemento.
+    """
+    declarations = index["declarations"].get(id(el))
+    if declarations is None:
+        from stylesheet import computed_declarations, parse_declarations
+
+        style = el.get("style")
+        if _tags(index, "style"):
+            declarations = computed_declarations(_stylesheet(index)["index"], el, style)
+        else:
+            declarations = parse_declarations(style) if style else {}
+        index["declarations"][id(el)] = declarations
+    return declarations
+
+
+def _css_mentions(index: dict, *terms: str) -> bool:
+    """
+    Algum atributo style ou regra das folhas declara um dos termos? Evita
+    calcular a cascata de todos os elementos em páginas sem esse CSS.
+    """
+    for el in index["with_style"]:
+        style = el.get("style", "").lower()
+        if any(term in style for term in terms):
+            return True
+    if _tags(index, "style"):
+        for rule in _stylesheet(index)["rules"]:
+            for prop, value, _ in rule["declarations"]:
+                if any(term in prop or term in value for term in terms):
+                    return True
+    return False
+
+
+def _contrast(index: dict) -> dict:
+    """
+    Contraste dos elementos com texto, calculado uma vez por documento
+    e compartilhado pelas regras de 1.4.3/1.4.6. Páginas sem cores
+    declaradas não importam NumPy nem percorrem os ancestrais.
+    """
+    if index["contrast"] is None:
+        if _css_mentions(index, "color", "background"):
+            from contrast import analyze_contrast
+
+            index["contrast"] = analyze_contrast(index["elements"], lambda el: _declarations(index, el))
+        else:
+            index["contrast"] = {"measured": [], "undetermined": []}
+    return index["contrast"]
+
+
+def focusable(el: Tag) -> bool:
+    if el.get("tabindex") is not None:
+        return el.get("tabindex").strip() != "-1"
+    if el.name == "a":
+        return el.get("href") is not None
+    if el.name == "input":
+        return el.get("type", "").lower() != "hidden"
+    return el.name in FOCUSABLE_TAGS
+
+
+def _has_label(index: dict, el: Tag) -> bool:
+    el_id = el.get("id")
+    has_label = bool(el_id) and el_id in index["labels_for"]
+    return has_label or bool(el.get("aria-label")) or bool(el.get("aria-labelledby"))
+
+
+# ============================================================
+# Regras — cada uma consome os índices e devolve ocorrências
+# ============================================================
+# Uma ocorrência é {"evidence": trecho, "line": linha no fonte ou None}.
+# A descrição do problema fica em RULE_CRITERIA; aggregate_signals
+# agrupa as ocorrências de cada regra num único registro.
+MAX_EVIDENCE_CHARS = 100
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _occurrence(
+    index: dict, el: Tag | None, evidence: str | None = None, suffix: str = "", prefix: str = "",
+) -> dict:
+    """
+    Evidência = tag de abertura do elemento, recortada do HTML original
+    quando a posição é conhecida (custo proporcional ao trecho, não à
+    subárvore), com prefixo/sufixo opcionais (ex: razão medida, texto
+    do link). O offset no fonte (quando conhecido) permite atribuir a
+    ocorrência ao segmento que contém o elemento (rag, modo incremental).
+    """
+    offset = None if el is None else _element_offset(index, el)
+    if evidence is None:
+        if offset is not None:
+            html = index["source"]["html"]
+            match = START_TAG_PATTERN.match(html, offset, offset + 4 * MAX_EVIDENCE_CHARS)
+            end = match.end() if match else html.find(">", offset, offset + MAX_EVIDENCE_CHARS) + 1
+            evidence = html[offset:end] if end > offset else html[offset:offset + MAX_EVIDENCE_CHARS]
+        else:
+            evidence = start_tag(el)
+        evidence = WHITESPACE_PATTERN.sub(" ", (prefix + evidence + suffix)[:MAX_EVIDENCE_CHARS])
+    line = _line_of(index, offset) if offset is not None else None
+    return {"evidence": evidence, "line": line, "offset": offset}
+
+
+def rule_html_lang(index: dict) -> list:
+    html_tags = _tags(index, "html")
+    if html_tags and not html_tags[0].get("lang"):
+        return [_occurrence(index, html_tags[0])]
+    return []
+
+
+def rule_page_title(index: dict) -> list:
+    titles = _tags(index, "title")
+    if not titles:
+        return [_occurrence(index, None, "")]
+    if not titles[0].get_text(strip=True):
+        return [_occurrence(index, titles[0], suffix="</title>")]
+    return []
+
+
+def rule_img_alt(index: dict) -> list:
+    return [
+        _occurrence(index, img)
+        for img in _tags(index, "img")
+        if not img.has_attr("alt")
+    ]
+
+
+def rule_link_image_only(index: dict) -> list:
+    occurrences = []
+    for link in _tags(index, "a"):
+        imgs = index["link_imgs"].get(id(link))
+        if imgs and not link.get_text(strip=True):
+            for img in imgs:
+                if not img.get("alt"):
+                    img_tag = _occurrence(index, img)["evidence"]
+                    occurrences.append(_occurrence(index, link, suffix=img_tag))
+    return occurrences
+
+
+def rule_input_label(index: dict) -> list:
+    return [
+        _occurrence(index, inp)
+        for inp in _tags(index, "input")
+        if inp.get("type") not in INPUT_TYPES_WITHOUT_LABEL and not _has_label(index, inp)
+    ]
+
+
+def rule_select_label(index: dict) -> list:
+    return [
+        _occurrence(index, select)
+        for select in _tags(index, "select")
+        if not _has_label(index, select)
+    ]
+
+
+def rule_textarea_label(index: dict) -> list:
+    return [
+        _occurrence(index, ta)
+        for ta in _tags(index, "textarea")
+        if not _has_label(index, ta)
+    ]
+
+
+def rule_button_name(index: dict) -> list:
+    return [
+        _occurrence(index, btn, suffix="</button>")
+        for btn in _tags(index, "button")
+        if not btn.get_text(strip=True)
+        and not btn.get("aria-label")
+        and not btn.get("aria-labelledby")
+        and not btn.get("title")
+    ]
+
+
+def rule_video_track(index: dict) -> list:
+    return [
+        _occurrence(index, video)
+        for video in _tags(index, "video")
+        if id(video) not in index["video_has_track"]
+    ]
+
+
+def rule_generic_link_text(index: dict) -> list:
+    occurrences = []
+    for link in _tags(index, "a"):
+        text = link.get_text(strip=True)
+        if text.lower() in GENERIC_LINK_TEXTS and not link.get("aria-label") and not link.get("aria-labelledby"):
+            occurrences.append(_occurrence(index, link, suffix=f"{text}</a>"))
+    return occurrences
+
+
+def rule_heading_hierarchy(index: dict) -> list:
+    occurrences = []
+    prev_level = 0
+    for h in index["headings"]:
+        level = int(h.name[1])
+        if prev_level > 0 and level > prev_level + 1:
+            occurrences.append(_occurrence(index, h, f"{h.name} após h{prev_level}"))
+        prev_level = level
+    return occurrences
+
+
+def rule_role_tabindex(index: dict) -> list:
+    return [
+        _occurrence(index, el)
+        for el in index["with_role"]
+        if el.get("role") in INTERACTIVE_ROLES and not el.get("tabindex")
+    ]
+
+
+def rule_duplicate_ids(index: dict) -> list:
+    return [
+        _occurrence(index, index["by_id"][id_val][1], f"id='{id_val}'")
+        for id_val, count in Counter(index["ids"]).items()
+        if count > 1
+    ]
+
+
+def _ratio_prefix(ratio: float, required: float) -> str:
+    return f"[{ratio:.2f}:1 < {required:g}:1] "
+
+
+def rule_contrast_minimum(index: dict) -> list:
+    return [
+        _occurrence(index, m["element"], prefix=_ratio_prefix(m["ratio"], m["required_aa"]))
+        for m in _contrast(index)["measured"]
+        if m["ratio"] < m["required_aa"]
+    ]
+
+
+def rule_contrast_enhanced(index: dict) -> list:
+    # Só os que passam no AA: os demais já constam em 1.4.3
+    return [
+        _occurrence(index, m["element"], prefix=_ratio_prefix(m["ratio"], m["required_aaa"]))
+        for m in _contrast(index)["measured"]
+        if m["required_aa"] <= m["ratio"] < m["required_aaa"]
+    ]
+
+
+def rule_contrast_undetermined(index: dict) -> list:
+    return [_occurrence(index, el) for el in _contrast(index)["undetermined"]]
+
+
+def rule_moving_content(index: dict) -> list:
+    return [
+        _occurrence(index, _tags(index, tag_name)[0])
+        for tag_name in ("marquee", "blink")
+        if _tags(index, tag_name)
+    ]
+
+
+def focus_outline_removed(focus_index: dict | None, el: Tag) -> bool:
+    """
+    Outline removido no foco (atributo style, regras em repouso ou
+    :focus/:focus-visible que casam com o elemento) sem que nenhuma
+    regra de foco que case com ele dê outro indicador visual.
+    """
+    from stylesheet import cascade, has_focus_indicator, matching_rules, removes_outline
+
+    matched = matching_rules(focus_index, el) if focus_index is not None else []
+    if not removes_outline(cascade(matched, el.get("style"))):
+        return False
+    focus_rules = [rule for rule in matched if any(c["states"] for _, c in rule["parts"])]
+    return not has_focus_indicator(cascade(focus_rules))
+
+
+def blinks(declarations: dict) -> bool:
+    return "blink" in declarations.get("text-decoration", "") or "blink" in declarations.get("text-decoration-line", "")
+
+
+def long_animation(declarations: dict) -> str | None:
+    """Duração ("infinita" ou "12s") de animações acima de 5 s, senão None."""
+    from stylesheet import animation_seconds
+
+    seconds = animation_seconds(declarations)
+    if seconds is None or seconds <= MAX_ANIMATION_SECONDS:
+        return None
+    return "infinita" if seconds == float("inf") else f"{seconds:g}s"
+
+
+def rule_focus_outline_removed(index: dict) -> list:
+    if not _css_mentions(index, "outline"):
+        return []
+    focus_index = _stylesheet(index)["focus_index"] if _tags(index, "style") else None
+    return [
+        _occurrence(index, el)
+        for el in index["elements"]
+        if focusable(el) and focus_outline_removed(focus_index, el)
+    ]
+
+
+def rule_css_blink(index: dict) -> list:
+    if not _css_mentions(index, "blink"):
+        return []
+    return [
+        _occurrence(index, el, prefix="[text-decoration: blink] ")
+        for el in index["elements"]
+        if blinks(_declarations(index, el))
+    ]
+
+
+def rule_css_animation(index: dict) -> list:
+    """
+    Animações CSS infinitas ou com mais de 5 s. Uma regra
+    @media (prefers-reduced-motion) no documento conta como controle.
+    """
+    if not _css_mentions(index, "animation"):
+        return []
+    if _tags(index, "style") and _stylesheet(index)["reduced_motion"]:
+        return []
+
+    occurrences = []
+    for el in index["elements"]:
+        duration = long_animation(_declarations(index, el))
+        if duration is not None:
+            occurrences.append(_occurrence(index, el, prefix=f"[animação {duration}] "))
+    return occurrences
+
+
+def rule_radio_fieldset(index: dict) -> list:
+    occurrences = []
+    for form in _tags(index, "form"):
+        radios = index["form_radios"].get(id(form))
+        if radios and id(form) not in index["form_has_fieldset"]:
+            first_by_name = {}
+            for radio in radios:
+                if radio.get("name"):
+                    first_by_name.setdefault(radio.get("name"), radio)
+            for name, radio in first_by_name.items():
+                occurrences.append(_occurrence(index, radio, f"name='{name}'"))
+    return occurrences
+
+
+# Ordem das regras = ordem dos sinais no relatório
+RULES = [
+    rule_html_lang,
+    rule_page_title,
+    rule_img_alt,
+    rule_link_image_only,
+    rule_input_label,
+    rule_select_label,
+    rule_textarea_label,
+    rule_button_name,
+    rule_video_track,
+    rule_generic_link_text,
+    rule_heading_hierarchy,
+    rule_role_tabindex,
+    rule_duplicate_ids,
+    rule_contrast_minimum,
+    rule_contrast_enhanced,
+    rule_contrast_undetermined,
+    rule_moving_content,
+    rule_css_blink,
+    rule_css_animation,
+    rule_focus_outline_removed,
+    rule_radio_fieldset,
+]
+
+
+# Descrição do sinal, critério WCAG, nível e Técnica de Falha
+# (wcag_techniques) de cada regra. O nível da tabela de critérios
+# (criteria_table) prevalece; o daqui vale se a tabela não carregar.
+# "conclusive": False marca regras que só indicam algo a verificar
+# (não entram no relatório determinístico do modo "rules").
+RULE_CRITERIA = {
+    rule_html_lang: {"signal": "Ausência de atributo lang no elemento <html>", "criterion": "3.1.1", "name": "Idioma da Página", "level": "A", "techniques": ["F87"]},
+    rule_page_title: {"signal": "Página sem elemento <title> ou <title> vazio", "criterion": "2.4.2", "name": "Página com Título", "level": "A", "techniques": ["F25"]},
+    rule_img_alt: {"signal": "Imagem sem atributo alt", "criterion": "1.1.1", "name": "Conteúdo Não Textual", "level": "A", "techniques": ["F65"]},
+    rule_link_image_only: {"signal": "Link com imagem sem alt como único conteúdo", "criterion": "1.1.1", "name": "Conteúdo Não Textual", "level": "A", "techniques": ["F3"]},
+    rule_input_label: {"signal": "Campo de formulário sem label associado", "criterion": "1.3.1", "name": "Informações e Relações", "level": "A", "techniques": ["F68"]},
+    rule_select_label: {"signal": "Select sem label associado", "criterion": "1.3.1", "name": "Informações e Relações", "level": "A", "techniques": ["F68"]},
+    rule_textarea_label: {"signal": "Textarea sem label associado", "criterion": "1.3.1", "name": "Informações e Relações", "level": "A", "techniques": ["F68"]},
+    rule_button_name: {"signal": "Botão sem nome acessível", "criterion": "4.1.2", "name": "Nome, Função, Valor", "level": "A", "techniques": ["F86"]},
+    rule_video_track: {"signal": "Vídeo sem elemento <track> para legendas", "criterion": "1.2.2", "name": "Legendas (Pré-gravadas)", "level": "A", "techniques": ["F79"]},
+    rule_generic_link_text: {"signal": "Link com texto genérico", "criterion": "2.4.4", "name": "Finalidade do Link (Em Contexto)", "level": "A", "techniques": ["F89"]},
+    rule_heading_hierarchy: {"signal": "Hierarquia de títulos quebrada", "criterion": "1.3.1", "name": "Informações e Relações", "level": "A", "techniques": ["F91"]},
+    rule_role_tabindex: {"signal": "Elemento com role interativo sem tabindex", "criterion": "4.1.2", "name": "Nome, Função, Valor", "level": "A", "techniques": ["F59"]},
+    rule_duplicate_ids: {"signal": "ID duplicado no documento", "criterion": "4.1.1", "name": "Análise", "level": "A", "techniques": ["F77"]},
+    rule_contrast_minimum: {"signal": "Texto com contraste abaixo do mínimo (4.5:1; 3:1 para texto grande)", "criterion": "1.4.3", "name": "Contraste (Mínimo)", "level": "AA", "techniques": ["F24"]},
+    rule_contrast_enhanced: {"signal": "Texto com contraste abaixo do aprimorado (7:1; 4.5:1 para texto grande)", "criterion": "1.4.6", "name": "Contraste (Aprimorado)", "level": "AAA", "techniques": ["F24"]},
+    rule_contrast_undetermined: {"signal": "Cores de texto/fundo não calculáveis (imagem, gradiente ou variável CSS): verificar contraste", "criterion": "1.4.3", "name": "Contraste (Mínimo)", "level": "AA", "techniques": ["F24"], "conclusive": False},
+    rule_moving_content: {"signal": "Elemento <marquee>/<blink> detectado (conteúdo em movimento sem controle)", "criterion": "2.2.2", "name": "Colocar em Pausa, Parar, Ocultar", "level": "A", "techniques": ["F47", "F4"]},
+    rule_css_blink: {"signal": "CSS com text-decoration: blink (texto piscante)", "criterion": "2.2.2", "name": "Colocar em Pausa, Parar, Ocultar", "level": "A", "techniques": ["F4"]},
+    rule_css_animation: {"signal": "Animação CSS infinita ou com mais de 5 s sem @media (prefers-reduced-motion): verificar controle de pausa", "criterion": "2.2.2", "name": "Colocar em Pausa, Parar, Ocultar", "level": "A", "techniques": ["F47"], "conclusive": False},
+    rule_focus_outline_removed: {"signal": "Indicador de foco removido via CSS (outline: none/0) sem outro estilo de foco", "criterion": "2.4.7", "name": "Foco Visível", "level": "AA", "techniques": ["F78"]},
+    rule_radio_fieldset: {"signal": "Grupo de radio buttons sem <fieldset>/<legend>", "criterion": "1.3.1", "name": "Informações e Relações", "level": "A", "techniques": ["F62"]},
+}
+
+
+def rule_id(rule) -> str:
+    return rule.__name__.removeprefix("rule_")
+
+
+RULES_BY_ID = {rule_id(rule): rule for rule in RULES}
+
+
+# Regras que só fazem sentido sobre o documento inteiro (não sobre
+# fragmentos/segmentos): idioma, título, IDs, hierarquia de títulos e
+# as que dependem da cascata das folhas <style> (que ficam no segmento
+# do documento, longe dos elementos a que se aplicam)
+DOCUMENT_RULES = [
+    rule_html_lang,
+    rule_page_title,
+    rule_heading_hierarchy,
+    rule_duplicate_ids,
+    rule_contrast_minimum,
+    rule_contrast_enhanced,
+    rule_contrast_undetermined,
+    rule_css_blink,
+    rule_css_animation,
+    rule_focus_outline_removed,
+]
+
+ELEMENT_RULES = [rule for rule in RULES if rule not in DOCUMENT_RULES]
+
+# Dentre as regras de documento, as que descrevem o documento como um
+# todo. As demais (contraste, CSS, hierarquia de títulos) precisam do
+# documento inteiro para serem avaliadas, mas apontam elementos de uma
+# seção específica
+DOCUMENT_SCOPED_RULES = [rule_html_lang, rule_page_title, rule_duplicate_ids]
+
+
+def utf8_size_at_least(text: str, size: int) -> bool:
+    """
+    len(text.encode("utf-8")) >= size, sem codificar quando os limites
+    bastam (cada caractere ocupa de 1 a 4 bytes).
+    """
+    if len(text) >= size:
+        return True
+    if 4 * len(text) < size:
+        return False
+    return len(text.encode("utf-8")) >= size
+
+
+def run_rules_by_rule(html: str, rules: list = RULES, source_positions: bool = True) -> list:
+    """
+    Faz o parse do HTML, constrói os índices numa única passada
+    e executa cada regra sobre eles. Retorna pares (regra, ocorrências)
+    na ordem das regras. source_positions=False para HTML que não é o
+    fonte original (ex: segmentos reserializados), cujas linhas não
+    corresponderiam às do arquivo. A partir de STREAMING_PARSE_THRESHOLD
+    bytes (UTF-8) usa o parser incremental (rules_streaming.py), com
+    memória proporcional à profundidade da árvore.
+    """
+    if utf8_size_at_least(html, STREAMING_PARSE_THRESHOLD):
+        from rules_streaming import run_rules_streaming_by_rule
+
+        return run_rules_streaming_by_rule(html, rules, source_positions)
+
+    soup = BeautifulSoup(html, "lxml")
+    index = build_dom_index(soup, html if source_positions else None)
+
+    return [(rule, rule(index)) for rule in rules]
+
+
+# ============================================================
+# Agregação: um registro por regra disparada
+# ============================================================
+# Em vez de uma linha por elemento (3.000 imagens sem alt = 3.000 linhas
+# quase idênticas), cada regra vira um registro com contagem, linhas e
+# alguns exemplos distintos. A lista completa fica em "occurrences".
+MAX_SIGNAL_EXAMPLES = 5
+MAX_SIGNAL_LINES = 20
+
+
+def aggregate_signals(results: list) -> list:
+    signals = []
+    for rule, occurrences in results:
+        if not occurrences:
+            continue
+        meta = RULE_CRITERIA[rule]
+        examples = list(dict.fromkeys(o["evidence"] for o in occurrences if o["evidence"]))
+        lines = [o["line"] for o in occurrences if o["line"] is not None]
+        signals.append({
+            "rule": rule_id(rule),
+            "criterion": meta["criterion"],
+            "description": meta["signal"],
+            "count": len(occurrences),
+            "lines": lines[:MAX_SIGNAL_LINES],
+            "examples": examples[:MAX_SIGNAL_EXAMPLES],
+            "occurrences": occurrences,
+        })
+    return signals
+
+
+def run_rules(html: str, rules: list = RULES, source_positions: bool = True) -> list:
+    """
+    Executa as regras e devolve os sinais agregados (um registro por
+    regra com ocorrências).
+    """
+    return aggregate_signals(run_rules_by_rule(html, rules, source_positions))
+
+
+def signal_count(signals: list) -> int:
+    return sum(signal["count"] for signal in signals)
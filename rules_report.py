@@ -0,0 +1,69 @@
+# ============================================================
+# Relatório determinístico (modo "rules"): sem retrieval e sem LLM
+# ============================================================
+# Cada sinal agregado do motor de regras é mapeado diretamente para o seu
+# critério e Técnica de Falha (o nível vem da tabela de critérios), e vira o mesmo relatório
+# estruturado (findings.py) que o LLM devolve.
+# Nenhuma chamada de rede, nenhuma chave de API.
+
+from criteria_table import criterion_level
+from findings import criterion_sort_key
+from rules import RULE_CRITERIA, RULES_BY_ID
+from wcag_techniques import WCAG_FAILURE_TECHNIQUES
+
+# Quantas evidências literais mostrar por regra
+MAX_EVIDENCE_PER_CRITERION = 5
+
+
+def _technique_field(content: str, field: str) -> str:
+    for line in content.split("\n"):
+        if line.startswith(f"{field}:"):
+            return line[len(field) + 1:].strip()
+    return ""
+
+
+# id da técnica -> {"falha": ..., "correcao": ...}
+TECHNIQUE_TEXTS = {
+    tech["id"]: {
+        "falha": _technique_field(tech["content"], "Falha"),
+        "correcao": _technique_field(tech["content"], "Correção"),
+    }
+    for tech in WCAG_FAILURE_TECHNIQUES
+}
+
+
+def build_rules_report(signals: list) -> dict:
+    """
+    Recebe os sinais agregados de rules.run_rules e monta o relatório
+    estruturado (findings), com uma falha por regra disparada.
+    """
+    findings = []
+    for signal in signals:
+        meta = RULE_CRITERIA[RULES_BY_ID[signal["rule"]]]
+        if not meta.get("conclusive", True):
+            continue
+
+        technique_ids = meta["techniques"]
+        texts = TECHNIQUE_TEXTS.get(technique_ids[0], {})
+        description = texts.get("falha") or signal["description"]
+
+        occurrences = f"{signal['count']} ocorrência(s)"
+        if signal["lines"]:
+            occurrences += ", linha(s) " + ", ".join(str(line) for line in signal["lines"])
+            if len(signal["lines"]) < signal["count"]:
+                occurrences += ", …"
+
+        evidences = signal["examples"][:MAX_EVIDENCE_PER_CRITERION] or [signal["description"]]
+        findings.append({
+            "criterio": meta["criterion"],
+            "nome": meta["name"],
+            "nivel": criterion_level(meta["criterion"]) or meta["level"],
+            "descricao": f"{description} ({occurrences})",
+            "evidencia": " | ".join(e.replace("\n", " ") for e in evidences),
+            "correcao": texts.get("correcao", ""),
+            "tecnica": ", ".join(technique_ids),
+        })
+
+    # Ordem estável: falhas do mesmo critério ficam juntas
+    findings.sort(key=lambda f: criterion_sort_key(f["criterio"]))
+    return {"falhas": findings}
@@ -0,0 +1,422 @@
+# ============================================================
+# Pré-análise em streaming para documentos grandes
+# ============================================================
+# Alternativa a run_rules_by_rule para HTML de vários megabytes: o
+# documento é entregue em blocos ao parser incremental do lxml
+# (HTMLPullParser) e as regras são avaliadas nos eventos de abertura e
+# fechamento de cada elemento, sem montar a árvore do BeautifulSoup.
+#
+# Ao fechar um elemento, seus filhos já processados são descartados;
+# ficam vivos apenas os ancestrais abertos e o irmão anterior de cada
+# um (para seletores "+"). A memória cresce com a profundidade da
+# árvore, não com o tamanho do documento. O que sobra de estado global
+# é proporcional ao que as regras precisam lembrar: ids vistos (IDs
+# duplicados), valores de label[for] e as ocorrências encontradas.
+#
+# Os elementos abertos são espelhados num esqueleto de Tags do
+# BeautifulSoup (só nome e atributos), para reaproveitar a cascata de
+# stylesheet.py, o estilo herdado de contrast.py e os predicados de
+# rules.py. Diferenças em relação à passada sobre o DOM completo:
+#   - a evidência é a tag de abertura reconstruída (nome + atributos);
+#     a linha vem do parser (sourceline);
+#   - folhas <style> só valem para os elementos que vêm depois delas;
+#   - o combinador "~" só enxerga o irmão imediatamente anterior.
+
+import codecs
+
+from bs4 import BeautifulSoup, Tag
+from lxml import etree
+
+from contrast import NON_RENDERED_TAGS, ROOT_STYLE, measure_contrast, own_style
+from rules import (
+    GENERIC_LINK_TEXTS,
+    HEADING_PATTERN,
+    INPUT_TYPES_WITHOUT_LABEL,
+    INTERACTIVE_ROLES,
+    MAX_EVIDENCE_CHARS,
+    RULES,
+    WHITESPACE_PATTERN,
+    aggregate_signals,
+    blinks,
+    focus_outline_removed,
+    focusable,
+    long_animation,
+    rule_button_name,
+    rule_contrast_enhanced,
+    rule_contrast_minimum,
+    rule_contrast_undetermined,
+    rule_css_animation,
+    rule_css_blink,
+    rule_duplicate_ids,
+    rule_focus_outline_removed,
+    rule_generic_link_text,
+    rule_heading_hierarchy,
+    rule_html_lang,
+    rule_img_alt,
+    rule_input_label,
+    rule_link_image_only,
+    rule_moving_content,
+    rule_page_title,
+    rule_radio_fieldset,
+    rule_role_tabindex,
+    rule_select_label,
+    rule_textarea_label,
+    rule_video_track,
+    start_tag,
+)
+from stylesheet import computed_declarations, parse_declarations, parse_style_blocks
+
+# Tamanho de cada bloco entregue ao parser
+CHUNK_CHARS = 64 * 1024
+
+# Elementos com texto acumulados antes de medir o contraste em lote
+CONTRAST_BATCH = 4096
+
+# Texto guardado de links/botões/títulos: basta para saber se é vazio
+# ou genérico ("clique aqui")
+MAX_TEXT_CHARS = 200
+
+# Elementos cujo texto (de toda a subárvore) alguma regra consulta
+TEXT_TAGS = ("a", "button", "title")
+
+LABEL_RULES = {"input": rule_input_label, "select": rule_select_label, "textarea": rule_textarea_label}
+
+
+def _chunks(source):
+    """Blocos de texto de uma str ou de um arquivo binário/texto."""
+    if isinstance(source, str):
+        for start in range(0, len(source), CHUNK_CHARS):
+            yield source[start:start + CHUNK_CHARS]
+        return
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    while True:
+        block = source.read(CHUNK_CHARS)
+        if not block:
+            break
+        yield decoder.decode(block) if isinstance(block, bytes) else block
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class StreamingRuleEngine:
+    """
+    Avalia RULES sobre eventos start/end do lxml. Cada elemento aberto
+    tem um frame (dict) com o Tag do esqueleto, a linha, o estilo
+    herdado e o estado que as regras precisam até o fechamento.
+    """
+
+    def __init__(self, source_positions: bool = True):
+        self.source_positions = source_positions
+        self.results = {rule: [] for rule in RULES}
+
+        self.root = BeautifulSoup("", "html.parser")
+        self.frames = []
+        self.links = []
+        self.videos = []
+        self.forms = []
+        self.capturing = 0
+
+        self.ids = {}
+        self.labels_for = set()
+        self.unlabeled = []
+        self.prev_heading = 0
+        self.html_seen = False
+        self.title_seen = False
+        self.moving = {}
+
+        self.style_blocks = []
+        self.sheet = None
+        self.sheet_mentions_outline = False
+        self.contrast_batch = []
+
+    # ========================================================
+    # Ocorrências
+    # ========================================================
+    def _occurrence(self, frame: dict | None, evidence: str | None = None, suffix: str = "", prefix: str = "") -> dict:
+        if evidence is None:
+            evidence = WHITESPACE_PATTERN.sub(" ", (prefix + start_tag(frame["tag"]) + suffix)[:MAX_EVIDENCE_CHARS])
+        line = frame["line"] if frame is not None and self.source_positions else None
+        # Sem offset no fonte: o parser incremental só informa a linha
+        return {"evidence": evidence, "line": line, "offset": None}
+
+    def _add(self, rule, frame: dict | None, **kwargs) -> None:
+        self.results[rule].append(self._occurrence(frame, **kwargs))
+
+    # ========================================================
+    # Texto: repassado do filho ao pai só enquanto há quem o leia
+    # ========================================================
+    def _harvest(self, el, frame: dict, children: list) -> None:
+        """
+        Lê o texto direto de `el` (el.text e as "caudas" dos filhos já
+        fechados em `children`) e descarta esses filhos do lxml.
+        """
+        pieces = []
+        if not frame["text_read"]:
+            pieces.append(el.text)
+            frame["text_read"] = True
+        for child in children:
+            pieces.append(child.tail)
+            el.remove(child)
+
+        for piece in pieces:
+            if piece and piece.strip():
+                frame["own_text"] = True
+                if frame["text"] is not None:
+                    frame["text"].append(piece.strip())
+
+    # ========================================================
+    # Eventos
+    # ========================================================
+    def start(self, el) -> None:
+        parent = self.frames[-1] if self.frames else None
+        if parent is not None:
+            # O parser pode estar à frente dos eventos: só os irmãos
+            # anteriores a este elemento estão fechados
+            previous = list(el.itersiblings(preceding=True))
+            previous.reverse()
+            self._harvest(el.getparent(), parent, previous)
+        parent_tag = parent["tag"] if parent is not None else self.root
+
+        tag = Tag(name=el.tag, attrs=dict(el.attrib))
+        parent_tag.append(tag)
+        # Do esqueleto, só o irmão imediatamente anterior fica vivo
+        while len(parent_tag.contents) > 2:
+            parent_tag.contents[0].extract()
+
+        name = el.tag
+        frame = {
+            "tag": tag,
+            "line": el.sourceline,
+            "text": [] if name in TEXT_TAGS or self.capturing else None,
+            "text_read": False,
+            "own_text": False,
+        }
+        if name in TEXT_TAGS:
+            self.capturing += 1
+
+        declarations = self._declarations(tag)
+        frame["style"] = own_style(tag, parent["style"] if parent is not None else ROOT_STYLE, declarations)
+        self.frames.append(frame)
+
+        self._check_start(frame, tag, declarations)
+
+    def end(self, el) -> None:
+        frame = self.frames.pop()
+        self._harvest(el, frame, list(el))
+        tag = frame["tag"]
+        name = tag.name
+
+        if frame["text"] is not None:
+            text = "".join(frame["text"])[:MAX_TEXT_CHARS]
+            frame["text"] = text
+            if self.frames and self.frames[-1]["text"] is not None and text:
+                self.frames[-1]["text"].append(text)
+        if name in TEXT_TAGS:
+            self.capturing -= 1
+
+        self._check_end(frame, tag, el)
+
+        if self.sheet is not None:
+            self.sheet["index"]["ancestors"].pop(id(tag), None)
+            self.sheet["focus_index"]["ancestors"].pop(id(tag), None)
+        tag.clear()
+
+    # ========================================================
+    # CSS
+    # ========================================================
+    def _add_style_block(self, tag: Tag, css: str) -> None:
+        if tag.get("type", "text/css").lower() != "text/css":
+            return
+        self.style_blocks.append((css, tag.get("media")))
+        self.sheet = parse_style_blocks(self.style_blocks)
+        self.sheet_mentions_outline = any(
+            "outline" in prop for rule in self.sheet["rules"] for prop, _, _ in rule["declarations"]
+        )
+
+    def _declarations(self, tag: Tag) -> dict:
+        style = tag.get("style")
+        if self.sheet is not None and self.sheet["rules"]:
+            return computed_declarations(self.sheet["index"], tag, style)
+        return parse_declarations(style) if style else {}
+
+    # ========================================================
+    # Regras avaliadas na abertura (atributos e cascata)
+    # ========================================================
+    def _check_start(self, frame: dict, tag: Tag, declarations: dict) -> None:
+        name = tag.name
+
+        if name == "html":
+            if not self.html_seen and not tag.get("lang"):
+                self._add(rule_html_lang, frame)
+            self.html_seen = True
+        elif name == "img":
+            if not tag.has_attr("alt"):
+                self._add(rule_img_alt, frame)
+            if not tag.get("alt") and self.links:
+                evidence = self._occurrence(frame)["evidence"]
+                for link in self.links:
+                    link["imgs"].append(evidence)
+        elif name == "a":
+            frame["imgs"] = []
+            self.links.append(frame)
+        elif name == "video":
+            frame["has_track"] = False
+            self.videos.append(frame)
+        elif name == "track":
+            for video in self.videos:
+                video["has_track"] = True
+        elif name == "form":
+            frame["radios"] = {}
+            frame["has_fieldset"] = False
+            self.forms.append(frame)
+        elif name == "fieldset":
+            for form in self.forms:
+                form["has_fieldset"] = True
+        elif name == "label" and tag.get("for") is not None:
+            self.labels_for.add(tag.get("for"))
+        elif name in ("marquee", "blink"):
+            self.moving.setdefault(name, self._occurrence(frame))
+        elif HEADING_PATTERN.match(name):
+            level = int(name[1])
+            if self.prev_heading > 0 and level > self.prev_heading + 1:
+                self._add(rule_heading_hierarchy, frame, evidence=f"{name} após h{self.prev_heading}")
+            self.prev_heading = level
+
+        if name in LABEL_RULES:
+            if name != "input" or tag.get("type") not in INPUT_TYPES_WITHOUT_LABEL:
+                if not tag.get("aria-label") and not tag.get("aria-labelledby"):
+                    # label[for] pode vir depois do campo: decidido no final
+                    self.unlabeled.append((LABEL_RULES[name], tag.get("id"), self._occurrence(frame)))
+            if name == "input" and tag.get("type") == "radio" and tag.get("name"):
+                for form in self.forms:
+                    form["radios"].setdefault(
+                        tag.get("name"), self._occurrence(frame, evidence=f"name='{tag.get('name')}'")
+                    )
+
+        if tag.get("role") in INTERACTIVE_ROLES and not tag.get("tabindex"):
+            self._add(rule_role_tabindex, frame)
+
+        el_id = tag.get("id")
+        if el_id is not None:
+            if el_id not in self.ids:
+                self.ids[el_id] = None
+            elif self.ids[el_id] is None:
+                self.ids[el_id] = self._occurrence(frame, evidence=f"id='{el_id}'")
+
+        if declarations:
+            if blinks(declarations):
+                self._add(rule_css_blink, frame, prefix="[text-decoration: blink] ")
+            duration = long_animation(declarations)
+            if duration is not None:
+                self._add(rule_css_animation, frame, prefix=f"[animação {duration}] ")
+        if (self.sheet_mentions_outline or "outline" in tag.get("style", "")) and focusable(tag):
+            focus_index = self.sheet["focus_index"] if self.sheet is not None else None
+            if focus_outline_removed(focus_index, tag):
+                self._add(rule_focus_outline_removed, frame)
+
+    # ========================================================
+    # Regras avaliadas no fechamento (texto e descendentes)
+    # ========================================================
+    def _check_end(self, frame: dict, tag: Tag, el) -> None:
+        name = tag.name
+
+        if name == "style":
+            self._add_style_block(tag, el.text or "")
+        elif name == "title":
+            if not self.title_seen and not frame["text"]:
+                self._add(rule_page_title, frame, suffix="</title>")
+            self.title_seen = True
+        elif name == "a":
+            self.links.remove(frame)
+            text = frame["text"]
+            if frame["imgs"] and not text:
+                for img in frame["imgs"]:
+                    self._add(rule_link_image_only, frame, suffix=img)
+            if text.lower() in GENERIC_LINK_TEXTS and not tag.get("aria-label") and not tag.get("aria-labelledby"):
+                self._add(rule_generic_link_text, frame, suffix=f"{text}</a>")
+        elif name == "button":
+            if not frame["text"] and not tag.get("aria-label") and not tag.get("aria-labelledby") and not tag.get("title"):
+                self._add(rule_button_name, frame, suffix="</button>")
+        elif name == "video":
+            self.videos.remove(frame)
+            if not frame["has_track"]:
+                self._add(rule_video_track, frame)
+        elif name == "form":
+            self.forms.remove(frame)
+            if not frame["has_fieldset"]:
+                self.results[rule_radio_fieldset].extend(frame["radios"].values())
+
+        if frame["own_text"] and frame["style"][4] and name not in NON_RENDERED_TAGS:
+            self.contrast_batch.append((frame, frame["style"]))
+            if len(self.contrast_batch) >= CONTRAST_BATCH:
+                self._flush_contrast()
+
+    def _flush_contrast(self) -> None:
+        if not self.contrast_batch:
+            return
+        frames, styles = zip(*self.contrast_batch)
+        self.contrast_batch = []
+        contrast = measure_contrast(frames, styles)
+        for m in contrast["measured"]:
+            if m["ratio"] < m["required_aa"]:
+                rule, required = rule_contrast_minimum, m["required_aa"]
+            elif m["ratio"] < m["required_aaa"]:
+                rule, required = rule_contrast_enhanced, m["required_aaa"]
+            else:
+                continue
+            self._add(rule, m["element"], prefix=f"[{m['ratio']:.2f}:1 < {required:g}:1] ")
+        for frame in contrast["undetermined"]:
+            self._add(rule_contrast_undetermined, frame)
+
+    # ========================================================
+    # Fim do documento
+    # ========================================================
+    def finish(self) -> dict:
+        self._flush_contrast()
+        if not self.title_seen:
+            self.results[rule_page_title].append({"evidence": "", "line": None})
+        self.results[rule_moving_content] = [self.moving[name] for name in ("marquee", "blink") if name in self.moving]
+        self.results[rule_duplicate_ids] = [occurrence for occurrence in self.ids.values() if occurrence]
+        for rule, field_id, occurrence in self.unlabeled:
+            if not field_id or field_id not in self.labels_for:
+                self.results[rule].append(occurrence)
+        if self.sheet is not None and self.sheet["reduced_motion"]:
+            self.results[rule_css_animation] = []
+
+        # Regras que emitem no fechamento: volta à ordem do documento
+        for occurrences in self.results.values():
+            occurrences.sort(key=lambda occurrence: occurrence["line"] or 0)
+        return self.results
+
+
+def run_rules_streaming_by_rule(source, rules: list = RULES, source_positions: bool = True) -> list:
+    """
+    Mesmo contrato de run_rules_by_rule, para uma str ou um arquivo
+    aberto (binário UTF-8 ou texto), lido em blocos.
+    """
+    engine = StreamingRuleEngine(source_positions)
+    parser = etree.HTMLPullParser(events=("start", "end"))
+
+    def drain():
+        for event, el in parser.read_events():
+            # Comentários e instruções de processamento não têm tag str
+            if not isinstance(el.tag, str):
+                continue
+            if event == "start":
+                engine.start(el)
+            else:
+                engine.end(el)
+
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        drain()
+    parser.close()
+    drain()
+
+    results = engine.finish()
+    return [(rule, results[rule]) for rule in rules]
+
+
+def run_rules_streaming(source, rules: list = RULES, source_positions: bool = True) -> list:
+    return aggregate_signals(run_rules_streaming_by_rule(source, rules, source_positions))
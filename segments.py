@@ -0,0 +1,163 @@
+# ============================================================
+# Segmentação de documentos grandes e fusão de relatórios
+# ============================================================
+# Documentos grandes são divididos em segmentos alinhados a landmarks
+# (header, nav, main/sections, aside, footer e formulários grandes).
+# Cada segmento é auditado separadamente (sinais, contexto e LLM
+# próprios) e os relatórios estruturados parciais são fundidos por
+# critério (findings.merge_findings).
+#
+# Cada segmento leva uma impressão digital (hash do markup normalizado):
+# na reauditoria incremental, só os segmentos cuja impressão mudou
+# voltam ao retrieval e ao LLM. Leva também o trecho [início, fim) que
+# ocupa no fonte, para receber as ocorrências das regras de documento
+# (contraste, CSS) que caem dentro dele.
+
+import hashlib
+import re
+
+from bs4 import BeautifulSoup, Comment, Tag
+
+from rules import scan_source_tags
+
+LANDMARK_TAGS = {"header", "nav", "main", "aside", "footer"}
+LANDMARK_ROLES = {"banner", "navigation", "main", "complementary", "contentinfo", "search", "form"}
+
+# Dentro de um landmark grande, estes filhos viram segmentos próprios
+SUBSECTION_TAGS = {"section", "article", "form"}
+
+# Landmarks maiores que isso são subdivididos em sections/articles/forms
+MAX_SEGMENT_CHARS = 20000
+
+# Na reauditoria incremental a granularidade é menor: editar uma seção
+# de um <main> médio não deve invalidar o <main> inteiro
+INCREMENTAL_SEGMENT_CHARS = 2000
+
+# Formulários fora de landmarks viram segmento próprio a partir deste tamanho
+LARGE_FORM_CHARS = 4000
+
+DOCUMENT_SEGMENT = "documento"
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def fingerprint(html: str) -> str:
+    """
+    Hash estável do markup: espaços em branco colapsados, de modo que
+    reindentação ou quebras de linha não invalidem o segmento.
+    """
+    return hashlib.sha256(WHITESPACE_PATTERN.sub(" ", html).strip().encode("utf-8")).hexdigest()
+
+
+def _is_landmark(el: Tag) -> bool:
+    return el.name in LANDMARK_TAGS or el.get("role") in LANDMARK_ROLES
+
+
+def _segment_name(el: Tag, position: int) -> str:
+    name = el.name
+    if el.get("id"):
+        name += f"#{el['id']}"
+    elif el.get("role"):
+        name += f"[role={el['role']}]"
+    return f"{name} ({position})"
+
+
+def _collect(parent: Tag, found: list, max_chars: int) -> None:
+    for child in parent.children:
+        if not isinstance(child, Tag):
+            continue
+
+        if _is_landmark(child):
+            if len(str(child)) > max_chars and child.find(SUBSECTION_TAGS):
+                # Landmark grande: seções internas viram segmentos e o
+                # restante do landmark fica no segmento do documento
+                _collect_subsections(child, found)
+            else:
+                found.append(child)
+        elif child.name == "form" and len(str(child)) > LARGE_FORM_CHARS:
+            found.append(child)
+        else:
+            _collect(child, found, max_chars)
+
+
+def _collect_subsections(parent: Tag, found: list) -> None:
+    for child in parent.children:
+        if not isinstance(child, Tag):
+            continue
+        if child.name in SUBSECTION_TAGS or _is_landmark(child):
+            found.append(child)
+        else:
+            _collect_subsections(child, found)
+
+
+def _next_outside(el: Tag) -> Tag | None:
+    """Primeiro elemento após a subárvore de `el`, na ordem do documento."""
+    node = el
+    while isinstance(node, Tag):
+        sibling = node.find_next_sibling()
+        if sibling is not None:
+            return sibling
+        node = node.parent
+    return None
+
+
+def _source_spans(html: str, soup: BeautifulSoup, elements: list) -> list:
+    """
+    Trecho [início, fim) de cada elemento no fonte, pela mesma
+    correspondência de rules.py (k-ésimo <nome> do DOM = k-ésimo "<nome"
+    do fonte). None quando a posição não é conhecida.
+    """
+    source_tags = None
+    offsets = {}
+
+    def offset_of(el: Tag) -> int | None:
+        nonlocal source_tags
+        if el.name not in offsets:
+            if source_tags is None:
+                source_tags = scan_source_tags(html)
+            same_name = soup.find_all(el.name)
+            positions = source_tags.get(el.name, [])
+            offsets[el.name] = (
+                {id(e): pos for e, pos in zip(same_name, positions)} if len(positions) == len(same_name) else {}
+            )
+        return offsets[el.name].get(id(el))
+
+    spans = []
+    for el in elements:
+        start = offset_of(el)
+        following = _next_outside(el)
+        end = len(html) if following is None else offset_of(following)
+        spans.append((start, end) if start is not None and end is not None else None)
+    return spans
+
+
+def split_into_segments(html: str, max_chars: int = MAX_SEGMENT_CHARS) -> list:
+    """
+    Divide o HTML em segmentos. Retorna uma lista de dicts
+    {"name": str, "html": str, "fingerprint": str, "span": (início, fim)
+    no fonte ou None}. O primeiro é sempre
+    o segmento do documento: o esqueleto (<html>, <head>, conteúdo fora
+    de landmarks) com marcadores no lugar dos segmentos extraídos.
+    Landmarks maiores que `max_chars` são subdivididos.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    root = soup.body or soup
+
+    found = []
+    _collect(root, found, max_chars)
+    # Antes de extrair os segmentos: os trechos dependem da árvore inteira
+    spans = _source_spans(html, soup, found)
+
+    segments = []
+    for position, (el, span) in enumerate(zip(found, spans), 1):
+        name = _segment_name(el, position)
+        segment_html = str(el)
+        segments.append({"name": name, "html": segment_html, "fingerprint": fingerprint(segment_html), "span": span})
+        el.replace_with(Comment(f" segmento '{name}' auditado separadamente "))
+
+    document_html = str(soup)
+    segments.insert(0, {
+        "name": DOCUMENT_SEGMENT, "html": document_html, "fingerprint": fingerprint(document_html), "span": None,
+    })
+    return segments
+
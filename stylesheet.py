@@ -0,0 +1,510 @@
+# ============================================================
+# Folhas de estilo embutidas: tabela de regras e índice de seletores
+# ============================================================
+# Os blocos <style> são parseados uma vez numa tabela de regras
+# (seletor, especificidade, ordem, declarações). Cada regra entra num
+# balde pela parte mais à direita do seletor (id, senão a primeira
+# classe, senão a tag, senão o balde universal) e, dentro dele, pela
+# chave de um ancestral obrigatório. Para um elemento só são testadas
+# as regras dos baldes do seu id, das suas classes e da sua tag cujo
+# ancestral exigido existe, como fazem os navegadores, em vez de
+# avaliar todos os seletores contra todos os nós.
+#
+# Suporte: seletores de tipo, universal, #id, .classe, [atributo] com
+# os operadores = ~= |= ^= $= *=, combinadores (descendente, >, +, ~),
+# :link/:root e pseudo-classes de estado (:hover, :focus...), que só
+# entram no índice de foco. Regras com seletores não suportados (ex:
+# :nth-child, :not) são ignoradas; @media print e @keyframes também.
+
+import re
+
+from bs4 import Tag
+
+# Pseudo-classes que só valem num estado de interação
+STATE_PSEUDO_CLASSES = {"hover", "focus", "focus-visible", "focus-within", "active", "visited", "target"}
+
+# Estados em que o indicador de foco é exibido
+FOCUS_STATES = frozenset({"focus", "focus-visible"})
+
+# Propriedades que, num estilo :focus, substituem o outline removido
+FOCUS_INDICATOR_PROPERTIES = ("box-shadow", "text-decoration", "color")
+
+# Blocos @ cujo conteúdo são regras comuns
+GROUPING_AT_RULES = ("@media", "@supports", "@layer", "@container")
+
+REDUCED_MOTION_PATTERN = re.compile(r"prefers-reduced-motion\s*:\s*reduce")
+TIME_PATTERN = re.compile(r"(\d*\.?\d+)(ms|s)")
+COUNT_PATTERN = re.compile(r"\d*\.?\d+")
+COMMENT_PATTERN = re.compile(r"/\*.*?(?:\*/|\Z)", re.DOTALL)
+COMPOUND_PART_PATTERN = re.compile(
+    r"(?P<tag>\*|[a-zA-Z][\w-]*)"
+    r"|#(?P<id>[\w-]+)"
+    r"|\.(?P<cls>[\w-]+)"
+    r"|\[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<val>\"[^\"]*\"|'[^']*'|[^\]\s]+)\s*(?:[is]\s*)?)?\]"
+    r"|::(?P<pelem>[\w-]+)"
+    r"|:(?P<pclass>[\w-]+)(?P<args>\([^)]*\))?"
+)
+
+
+# ============================================================
+# Declarações
+# ============================================================
+def parse_declaration_list(text: str) -> list:
+    """
+    "color: #333; outline: none !important" -> [("color", "#333", False),
+    ("outline", "none", True)], na ordem do texto.
+    """
+    declarations = []
+    for part in text.split(";"):
+        prop, sep, value = part.partition(":")
+        if not sep:
+            continue
+        value = value.strip().lower()
+        important = value.endswith("!important")
+        if important:
+            value = value[: -len("!important")].strip()
+        if value:
+            declarations.append((prop.strip().lower(), value, important))
+    return declarations
+
+
+def parse_declarations(style: str) -> dict:
+    """
+    "color: #333; background: white !important" -> {"color": "#333",
+    "background": "white"}. A última declaração de cada propriedade vence.
+    """
+    return {prop: value for prop, value, _ in parse_declaration_list(style)}
+
+
+# ============================================================
+# Seletores
+# ============================================================
+def _split_top_level(text: str, separators: str) -> list:
+    """Divide fora de colchetes/parênteses/aspas."""
+    if not any(char in text for char in "([\"'"):
+        return re.split("[" + re.escape(separators) + "]", text)
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif depth == 0 and char in separators:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _parse_compound(text: str) -> dict | None:
+    compound = {"tag": None, "id": None, "classes": [], "attrs": [], "states": [], "pseudo_element": None}
+    position = 0
+    while position < len(text):
+        match = COMPOUND_PART_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            return None
+        position = match.end()
+        if match.group("tag"):
+            compound["tag"] = None if match.group("tag") == "*" else match.group("tag").lower()
+        elif match.group("id"):
+            compound["id"] = match.group("id")
+        elif match.group("cls"):
+            compound["classes"].append(match.group("cls"))
+        elif match.group("attr"):
+            value = match.group("val")
+            if value and value[0] in "\"'":
+                value = value[1:-1]
+            compound["attrs"].append((match.group("attr").lower(), match.group("op"), value))
+        elif match.group("pelem"):
+            compound["pseudo_element"] = match.group("pelem").lower()
+        else:
+            name = match.group("pclass").lower()
+            if match.group("args") is not None:
+                return None
+            if name in STATE_PSEUDO_CLASSES:
+                compound["states"].append(name)
+            elif name == "link":
+                compound["tag"] = compound["tag"] or "a"
+                compound["attrs"].append(("href", None, None))
+            elif name == "root":
+                compound["tag"] = "html"
+            elif name in ("before", "after", "first-line", "first-letter"):
+                compound["pseudo_element"] = name
+            else:
+                return None
+    return compound
+
+
+def parse_selector(text: str) -> list | None:
+    """
+    Seletor complexo -> lista [(combinador, compound), ...] da esquerda
+    para a direita (o combinador liga ao compound anterior). None se o
+    seletor usar algo não suportado.
+    """
+    text = re.sub(r"\s*([>+~])\s*", r" \1 ", text.strip())
+    tokens = [t for t in _split_top_level(text, " \t\n") if t]
+    parts = []
+    combinator = " "
+    for token in tokens:
+        if token in (">", "+", "~"):
+            combinator = token
+            continue
+        compound = _parse_compound(token)
+        if compound is None:
+            return None
+        parts.append((combinator, compound))
+        combinator = " "
+    return parts or None
+
+
+def specificity(parts: list) -> tuple:
+    a = b = c = 0
+    for _, compound in parts:
+        a += compound["id"] is not None
+        b += len(compound["classes"]) + len(compound["attrs"]) + len(compound["states"])
+        c += (compound["tag"] is not None) + (compound["pseudo_element"] is not None)
+    return a, b, c
+
+
+# ============================================================
+# Parse das folhas
+# ============================================================
+def _matching_brace(css: str, start: int) -> int:
+    depth = 0
+    for i in range(start, len(css)):
+        if css[i] == "{":
+            depth += 1
+        elif css[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(css)
+
+
+def _media_applies(query: str) -> bool:
+    query = query.lower()
+    if "print" in query and "screen" not in query and "all" not in query:
+        return False
+    # Estilos para quem pediu menos movimento não valem no caso padrão
+    return REDUCED_MOTION_PATTERN.search(query) is None
+
+
+def parse_stylesheet(css: str, first_order: int = 0) -> dict:
+    """
+    Parseia um bloco CSS. Retorna {"rules": [...], "reduced_motion": bool}.
+    Cada regra: {"selector", "parts", "specificity", "order",
+    "declarations"}; "order" segue a ordem no documento.
+    """
+    css = COMMENT_PATTERN.sub(" ", css)
+    sheet = {"rules": [], "reduced_motion": False}
+    _parse_block(css, 0, len(css), first_order, sheet)
+    return sheet
+
+
+def _parse_block(css: str, start: int, end: int, first_order: int, sheet: dict) -> None:
+    position = start
+    while position < end:
+        brace = css.find("{", position, end)
+        if brace < 0:
+            return
+        prelude = css[position:brace].strip()
+        close = _matching_brace(css, brace)
+
+        if prelude.startswith("@"):
+            # @import/@charset terminados em ";" antes do bloco
+            if ";" in prelude:
+                position = position + css[position:brace].rfind(";") + 1
+                continue
+            at_rule = prelude.split(None, 1)[0].lower()
+            if at_rule in GROUPING_AT_RULES:
+                if at_rule == "@media" and "prefers-reduced-motion" in prelude.lower():
+                    sheet["reduced_motion"] = True
+                if at_rule != "@media" or _media_applies(prelude[len("@media"):]):
+                    _parse_block(css, brace + 1, close, first_order, sheet)
+            # @keyframes, @font-face, @page...: ignorados
+        else:
+            declarations = parse_declaration_list(css[brace + 1:close])
+            for selector in _split_top_level(prelude, ","):
+                selector = " ".join(selector.split())
+                parts = parse_selector(selector) if selector else None
+                if parts is None:
+                    continue
+                sheet["rules"].append({
+                    "selector": selector,
+                    "parts": parts,
+                    "specificity": specificity(parts),
+                    "order": first_order + len(sheet["rules"]),
+                    "declarations": declarations,
+                })
+        position = close + 1
+
+
+# ============================================================
+# Índice de seletores
+# ============================================================
+def _compound_key(compound: dict):
+    if compound["id"] is not None:
+        return "#" + compound["id"]
+    if compound["classes"]:
+        return "." + compound["classes"][0]
+    return compound["tag"]
+
+
+def _ancestor_key(parts: list):
+    """
+    Chave de um ancestral obrigatório (compound à esquerda ligado por
+    espaço ou ">"): regras como "#menu a > span" só são testadas em
+    <span> que tenham um ancestral #menu.
+    """
+    if len(parts) < 2 or parts[-1][0] not in (" ", ">"):
+        return None
+    return _compound_key(parts[-2][1])
+
+
+def build_selector_index(rules: list, states: frozenset = frozenset()) -> dict:
+    """
+    Baldes pela chave da parte mais à direita do seletor (id, senão a
+    primeira classe, senão a tag, senão universal) e, dentro de cada
+    balde, pela chave de um ancestral obrigatório. Entram só as regras
+    cujas pseudo-classes de estado estão em `states` (vazio = estilo em
+    repouso, usado na cascata); regras de pseudo-elemento ficam de fora.
+    """
+    index = {"buckets": {}, "ancestors": {}}
+    for rule in rules:
+        compounds = [compound for _, compound in rule["parts"]]
+        if any(compound["pseudo_element"] for compound in compounds):
+            continue
+        if any(state not in states for compound in compounds for state in compound["states"]):
+            continue
+        bucket = index["buckets"].setdefault(_compound_key(compounds[-1]), {})
+        bucket.setdefault(_ancestor_key(rule["parts"]), []).append(rule)
+    return index
+
+
+def _own_keys(el: Tag) -> list:
+    keys = [el.name] + ["." + cls for cls in _classes(el)]
+    if el.get("id") is not None:
+        keys.append("#" + el.get("id"))
+    return keys
+
+
+def _ancestor_keys(selector_index: dict, el: Tag) -> frozenset:
+    """Chaves (tag, .classe, #id) de todos os ancestrais, memoizadas por pai."""
+    cache = selector_index["ancestors"]
+    chain = []
+    parent = el.parent
+    while isinstance(parent, Tag) and parent.name != "[document]" and id(parent) not in cache:
+        chain.append(parent)
+        parent = parent.parent
+    keys = cache.get(id(parent), frozenset()) if isinstance(parent, Tag) else frozenset()
+    for ancestor in reversed(chain):
+        keys = keys | frozenset(_own_keys(ancestor))
+        cache[id(ancestor)] = keys
+    return keys
+
+
+def _classes(el: Tag) -> list:
+    value = el.get("class") or []
+    return value.split() if isinstance(value, str) else value
+
+
+def _attr_matches(el: Tag, name: str, op: str | None, expected: str | None) -> bool:
+    value = el.get(name)
+    if value is None:
+        return False
+    if op is None:
+        return True
+    if isinstance(value, list):
+        value = " ".join(value)
+    if op == "=":
+        return value == expected
+    if op == "~=":
+        return expected in value.split()
+    if op == "|=":
+        return value == expected or value.startswith(expected + "-")
+    if op == "^=":
+        return bool(expected) and value.startswith(expected)
+    if op == "$=":
+        return bool(expected) and value.endswith(expected)
+    return bool(expected) and expected in value
+
+
+def compound_matches(el: Tag, compound: dict) -> bool:
+    if compound["tag"] is not None and el.name != compound["tag"]:
+        return False
+    if compound["id"] is not None and el.get("id") != compound["id"]:
+        return False
+    if compound["classes"]:
+        classes = _classes(el)
+        if any(cls not in classes for cls in compound["classes"]):
+            return False
+    return all(_attr_matches(el, *attr) for attr in compound["attrs"])
+
+
+def _previous_elements(el: Tag):
+    for sibling in el.previous_siblings:
+        if isinstance(sibling, Tag):
+            yield sibling
+
+
+def _matches_from(el: Tag, parts: list, i: int) -> bool:
+    combinator, compound = parts[i]
+    if not compound_matches(el, compound):
+        return False
+    if i == 0:
+        return True
+
+    if combinator == " ":
+        candidates = (p for p in el.parents if isinstance(p, Tag) and p.name != "[document]")
+    elif combinator == ">":
+        parent = el.parent
+        candidates = [parent] if isinstance(parent, Tag) and parent.name != "[document]" else []
+    elif combinator == "+":
+        candidates = [next(_previous_elements(el), None)]
+        candidates = [c for c in candidates if c is not None]
+    else:
+        candidates = _previous_elements(el)
+    return any(_matches_from(candidate, parts, i - 1) for candidate in candidates)
+
+
+def selector_matches(el: Tag, parts: list) -> bool:
+    return _matches_from(el, parts, len(parts) - 1)
+
+
+def matching_rules(selector_index: dict, el: Tag) -> list:
+    """Regras que casam com o elemento, testando só as dos seus baldes."""
+    buckets = selector_index["buckets"]
+    ancestors = None
+    candidates = []
+    for key in [None] + _own_keys(el):
+        bucket = buckets.get(key)
+        if bucket is None:
+            continue
+        candidates += bucket.get(None, [])
+        if len(bucket) > (None in bucket):
+            if ancestors is None:
+                ancestors = _ancestor_keys(selector_index, el)
+            if len(bucket) <= len(ancestors):
+                candidates += [r for k, rs in bucket.items() if k in ancestors for r in rs]
+            else:
+                candidates += [r for k in ancestors for r in bucket.get(k, [])]
+    return [rule for rule in candidates if selector_matches(el, rule["parts"])]
+
+
+def cascade(rules: list, inline: str | None = None) -> dict:
+    """
+    Aplica a cascata às regras que casam com o elemento (e ao atributo
+    style): !important, depois inline, especificidade e ordem no fonte.
+    """
+    weighted = []
+    for rule in rules:
+        for prop, value, important in rule["declarations"]:
+            weighted.append(((important, False, rule["specificity"], rule["order"]), prop, value))
+    if inline:
+        for position, (prop, value, important) in enumerate(parse_declaration_list(inline)):
+            weighted.append(((important, True, (0, 0, 0), position), prop, value))
+
+    weighted.sort(key=lambda item: item[0])
+    return {prop: value for _, prop, value in weighted}
+
+
+def computed_declarations(selector_index: dict, el: Tag, inline: str | None = None) -> dict:
+    """
+    Declarações em vigor no elemento. Propriedades herdadas dos
+    ancestrais não são incluídas (a herança fica com quem consome).
+    """
+    return cascade(matching_rules(selector_index, el), inline)
+
+
+# ============================================================
+# Folhas do documento
+# ============================================================
+def parse_style_blocks(blocks: list) -> dict:
+    """
+    blocks: [(texto CSS, atributo media)], na ordem do documento. Blocos media="print" são ignorados. Retorna a
+    tabela de regras e os índices de seletores em repouso e em foco.
+    """
+    rules, reduced_motion = [], False
+    for css, media in blocks:
+        if media and not _media_applies(media):
+            continue
+        sheet = parse_stylesheet(css, len(rules))
+        rules += sheet["rules"]
+        reduced_motion = reduced_motion or sheet["reduced_motion"]
+
+    return {
+        "rules": rules,
+        "reduced_motion": reduced_motion,
+        "index": build_selector_index(rules),
+        "focus_index": build_selector_index(rules, FOCUS_STATES),
+    }
+
+
+# ============================================================
+# Propriedades usadas pelas regras
+# ============================================================
+def removes_outline(declarations: dict) -> bool:
+    """outline: none/0, outline-style: none ou outline-width: 0."""
+    outline = declarations.get("outline", "").split()
+    if outline and ("none" in outline or outline[0] in ("0", "0px")):
+        return True
+    if declarations.get("outline-style") in ("none", "hidden"):
+        return True
+    return declarations.get("outline-width") in ("0", "0px")
+
+
+def has_focus_indicator(declarations: dict) -> bool:
+    """Alguma mudança visual além do outline (ex: box-shadow, borda, fundo)."""
+    for prop, value in declarations.items():
+        if prop.startswith("outline"):
+            if not removes_outline({prop: value}):
+                return True
+        elif prop in FOCUS_INDICATOR_PROPERTIES or prop.startswith(("border", "background")):
+            if value not in ("none", "0", "transparent", "inherit", "initial", "unset"):
+                return True
+    return False
+
+
+def _seconds(value: str) -> float:
+    number, unit = TIME_PATTERN.fullmatch(value).groups()
+    return float(number) / (1000 if unit == "ms" else 1)
+
+
+def animation_seconds(declarations: dict) -> float | None:
+    """
+    Duração total da animação (duração x repetições; inf se infinita).
+    None quando não há animação. Os longhands prevalecem sobre o
+    shorthand; com várias animações, vale a mais longa.
+    """
+    longest = None
+    for animation in _split_top_level(declarations.get("animation", ""), ","):
+        tokens = animation.split()
+        if not tokens or tokens == ["none"]:
+            continue
+        times = [token for token in tokens if TIME_PATTERN.fullmatch(token)]
+        counts = [token for token in tokens if COUNT_PATTERN.fullmatch(token)]
+        duration = _seconds(times[0]) if times else 0.0
+        count = float("inf") if "infinite" in tokens else float(counts[0]) if counts else 1.0
+        total = duration * count if duration else 0.0
+        longest = total if longest is None else max(longest, total)
+
+    if "animation-name" in declarations and declarations["animation-name"] == "none":
+        return None
+    if "animation-duration" in declarations or "animation-iteration-count" in declarations:
+        durations = [
+            _seconds(value) for value in declarations.get("animation-duration", "0s").replace(",", " ").split()
+            if TIME_PATTERN.fullmatch(value)
+        ] or [0.0]
+        count_value = declarations.get("animation-iteration-count", "1")
+        count = float("inf") if "infinite" in count_value else max(
+            (float(value) for value in count_value.replace(",", " ").split() if COUNT_PATTERN.fullmatch(value)),
+            default=1.0,
+        )
+        total = max(durations) * count if max(durations) else 0.0
+        longest = total if longest is None else max(longest, total)
+    return longest
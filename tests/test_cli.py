@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from cli import discover_files, run_batch
+
+PAGE = '<html lang="pt-BR"><head><title>{}</title></head><body><img src="x.png"></body></html>'
+
+
+def _write(path, title):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(PAGE.format(title), encoding="utf-8")
+    return path
+
+
+def test_same_named_files_get_distinct_report_paths(tmp_path):
+    a = _write(tmp_path / "a" / "index.html", "A")
+    b = _write(tmp_path / "b" / "index.html", "B")
+
+    files = discover_files([str(a), str(b)])
+
+    relatives = sorted(str(relative) for _, relative in files)
+    assert relatives == ["a/index.html", "b/index.html"]
+
+
+def test_directories_with_same_layout_do_not_collide(tmp_path):
+    _write(tmp_path / "site1" / "docs" / "index.html", "1")
+    _write(tmp_path / "site2" / "docs" / "index.html", "2")
+
+    files = discover_files([str(tmp_path / "site1"), str(tmp_path / "site2")])
+
+    relatives = sorted(str(relative) for _, relative in files)
+    assert relatives == ["site1/docs/index.html", "site2/docs/index.html"]
+
+
+def test_single_directory_keeps_its_own_layout(tmp_path):
+    _write(tmp_path / "site" / "docs" / "index.html", "1")
+
+    files = discover_files([str(tmp_path / "site")])
+
+    assert [str(relative) for _, relative in files] == ["docs/index.html"]
+
+
+def test_file_listed_twice_is_audited_once(tmp_path):
+    page = _write(tmp_path / "site" / "index.html", "1")
+    file_list = tmp_path / "lista.txt"
+    file_list.write_text(f"{page}\n", encoding="utf-8")
+
+    files = discover_files([str(tmp_path / "site")], str(file_list))
+
+    assert len(files) == 1
+
+
+def test_batch_writes_one_report_per_same_named_file(tmp_path):
+    a = _write(tmp_path / "in" / "a" / "index.html", "A")
+    b = _write(tmp_path / "in" / "b" / "index.html", "B")
+    output = tmp_path / "out"
+
+    summary = asyncio.run(run_batch(discover_files([str(a), str(b)]), output, mode="rules", workers=1))
+
+    assert summary["erros"] == []
+    assert (output / "a" / "index.html.md").exists()
+    assert (output / "b" / "index.html.md").exists()
+    reports = {entry["report"] for entry in summary["arquivos_detalhe"]}
+    assert len(reports) == 2
+
+
+def test_resumed_files_do_not_enter_latency_percentiles(tmp_path):
+    a = _write(tmp_path / "in" / "a.html", "A")
+    b = _write(tmp_path / "in" / "b.html", "B")
+    output = tmp_path / "out"
+    asyncio.run(run_batch(discover_files([str(a)]), output, mode="rules", workers=1))
+
+    # Latência absurda gravada para o arquivo que será retomado
+    progress = output / "progresso.jsonl"
+    entries = [json.loads(line) for line in progress.read_text(encoding="utf-8").splitlines()]
+    for entry in entries:
+        entry["latency"] = 1000.0
+    progress.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+
+    summary = asyncio.run(run_batch(discover_files([str(a), str(b)]), output, mode="rules", workers=1))
+
+    assert summary["retomados"] == 1
+    assert summary["auditados"] == 1
+    assert summary["latencia_p95_s"] < 1000.0
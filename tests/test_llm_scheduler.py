@@ -0,0 +1,32 @@
+import asyncio
+
+from llm_scheduler import TokenBudget
+
+
+def test_reservation_is_clamped_to_capacity():
+    budget = TokenBudget(tokens_per_minute=1000)
+
+    reserved = asyncio.run(budget.acquire(5000))
+
+    assert reserved == 1000
+    assert budget.available < 1
+
+
+def test_settle_credits_only_what_was_reserved():
+    budget = TokenBudget(tokens_per_minute=1000)
+    reserved = asyncio.run(budget.acquire(5000))
+
+    # O pedido consumiu 800 tokens: sobram 200 da reserva de 1000 (e não
+    # 4200 da estimativa original de 5000)
+    budget.settle(reserved, 800)
+
+    assert 200 <= budget.available < 201
+
+
+def test_settle_charges_usage_above_the_reservation():
+    budget = TokenBudget(tokens_per_minute=1000)
+    reserved = asyncio.run(budget.acquire(100))
+
+    budget.settle(reserved, 600)
+
+    assert 400 <= budget.available < 401
@@ -0,0 +1,38 @@
+from rag import route_document_signals
+from rules import DOCUMENT_RULES, run_rules
+from segments import DOCUMENT_SEGMENT, split_into_segments
+
+PAD = "<p>" + "lorem ipsum " * 200 + "</p>"
+
+
+def _page(color="#777"):
+    return (
+        '<html><head><title>T</title><style>.fraco{color:#aaa}</style></head><body>'
+        f'<main><section id="s1"><p style="color:{color}">um</p>{PAD}</section>'
+        f'<section id="s2"><p class="fraco">dois</p><i id="x"></i><b id="x"></b>{PAD}</section></main>'
+        "</body></html>"
+    )
+
+
+def _routed(html):
+    segments = split_into_segments(html, max_chars=2000)
+    routed = route_document_signals(segments, run_rules(html, DOCUMENT_RULES))
+    return {segment["name"]: {s["rule"]: s for s in signals} for segment, signals in zip(segments, routed)}
+
+
+def test_section_local_signals_go_to_their_section():
+    routed = _routed(_page())
+
+    assert set(routed[DOCUMENT_SEGMENT]) == {"html_lang", "duplicate_ids"}
+    assert "contrast_minimum" in routed["section#s1 (1)"]
+    assert "contrast_minimum" in routed["section#s2 (2)"]
+    assert routed["section#s1 (1)"]["contrast_minimum"]["count"] == 1
+
+
+def test_editing_one_section_keeps_document_signals():
+    before = _routed(_page())
+    after = _routed(_page(color="#999"))
+
+    assert after[DOCUMENT_SEGMENT] == before[DOCUMENT_SEGMENT]
+    assert after["section#s2 (2)"] == before["section#s2 (2)"]
+    assert after["section#s1 (1)"] != before["section#s1 (1)"]
@@ -0,0 +1,211 @@
+# ============================================================
+# Instrumentação por etapa do pipeline (latência e tokens)
+# ============================================================
+# Cada etapa (parse/regras, embedding da query, busca FAISS, montagem
+# do prompt, LLM, PDF) é medida com trace(nome). A primeira chamada
+# abre um registro por requisição; as chamadas aninhadas viram etapas
+# desse registro. Os tempos também alimentam histogramas cumulativos
+# exportados em formato texto do Prometheus (arquivo e/ou endpoint HTTP).
+#
+# Desativado (padrão), trace() devolve um contexto nulo e set_attr()
+# retorna imediatamente: o custo é desprezível.
+
+import contextvars
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import TRACING_ENABLED, METRICS_FILE
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores (segundos) dos buckets dos histogramas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Quantos registros por requisição manter para consulta (painel de debug)
+MAX_RECENT_TRACES = 100
+
+_enabled = TRACING_ENABLED
+_current = contextvars.ContextVar("wcag_trace", default=None)
+_lock = threading.Lock()
+_NULL_CONTEXT = nullcontext()
+
+_histograms = {}  # etapa -> {"buckets": [...], "sum": float, "count": int}
+_counters = {}    # nome -> float
+_recent = deque(maxlen=MAX_RECENT_TRACES)
+
+
+def enable(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+# ============================================================
+# Registro por requisição
+# ============================================================
+def trace(name: str, **attrs):
+    """
+    Mede a etapa `name`. Fora de um trace ativo, abre um novo registro
+    por requisição, finalizado ao sair do bloco.
+    """
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _traced(name, attrs)
+
+
+@contextmanager
+def _traced(name: str, attrs: dict):
+    record = _current.get()
+    token = None
+    if record is None:
+        record = {"trace": name, "timestamp": time.time(), "stages": {}, "attrs": {}}
+        token = _current.set(record)
+    if attrs:
+        with _lock:
+            record["attrs"].update(attrs)
+
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            record["stages"][name] = record["stages"].get(name, 0.0) + elapsed
+        _observe(name, elapsed)
+
+        if token is not None:
+            record["total_s"] = elapsed
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Gerador finalizado em outro contexto (ex: stream abandonado)
+                pass
+            _finish(record)
+
+
+def set_attr(key: str, value) -> None:
+    if not _enabled:
+        return
+    record = _current.get()
+    if record is not None:
+        with _lock:
+            record["attrs"][key] = value
+
+
+def add_tokens(input_tokens: int = 0, output_tokens: int = 0) -> None:
+    if not _enabled:
+        return
+    record = _current.get()
+    with _lock:
+        _counters["input_tokens"] = _counters.get("input_tokens", 0) + input_tokens
+        _counters["output_tokens"] = _counters.get("output_tokens", 0) + output_tokens
+        if record is not None:
+            attrs = record["attrs"]
+            attrs["input_tokens"] = attrs.get("input_tokens", 0) + input_tokens
+            attrs["output_tokens"] = attrs.get("output_tokens", 0) + output_tokens
+
+
+def current_context():
+    """
+    Contexto a propagar para threads (ex: segmentos auditados em paralelo),
+    para que as etapas delas entrem no mesmo registro.
+    """
+    return contextvars.copy_context()
+
+
+def _observe(stage: str, seconds: float) -> None:
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+
+def _finish(record: dict) -> None:
+    with _lock:
+        _recent.append(record)
+        _counters["requests"] = _counters.get("requests", 0) + 1
+    logger.info(f"trace {record['trace']}: {record}")
+    if METRICS_FILE:
+        try:
+            write_prometheus(METRICS_FILE)
+        except OSError as e:
+            logger.warning(f"Falha ao exportar métricas: {e}")
+
+
+def recent_traces() -> list:
+    with _lock:
+        return list(_recent)
+
+
+# ============================================================
+# Exportação Prometheus (formato texto)
+# ============================================================
+def export_prometheus() -> str:
+    lines = [
+        "# HELP wcag_stage_seconds Duração de cada etapa do pipeline de auditoria.",
+        "# TYPE wcag_stage_seconds histogram",
+    ]
+    with _lock:
+        for stage, hist in sorted(_histograms.items()):
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                lines.append(f'wcag_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'wcag_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'wcag_stage_seconds_sum{{stage="{stage}"}} {hist["sum"]}')
+            lines.append(f'wcag_stage_seconds_count{{stage="{stage}"}} {hist["count"]}')
+
+        lines.append("# HELP wcag_tokens_total Tokens enviados e recebidos do LLM.")
+        lines.append("# TYPE wcag_tokens_total counter")
+        lines.append(f'wcag_tokens_total{{direction="input"}} {_counters.get("input_tokens", 0)}')
+        lines.append(f'wcag_tokens_total{{direction="output"}} {_counters.get("output_tokens", 0)}')
+
+        lines.append("# HELP wcag_requests_total Requisições rastreadas.")
+        lines.append("# TYPE wcag_requests_total counter")
+        lines.append(f"wcag_requests_total {_counters.get('requests', 0)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(export_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """
+    Serve /metrics (qualquer caminho) em uma thread daemon.
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Métricas Prometheus em http://0.0.0.0:{port}/metrics")
+    return server
@@ -234,6 +234,19 @@ WCAG_FAILURE_TECHNIQUES = [
             "Correção: Remover efeitos de piscar e fornecer conteúdo estático."
         ),
     },
+    {
+        "id": "F78",
+        "content": (
+            "Técnica de Falha F78 — Critério 2.4.7 Foco Visível (Nível AA)\n"
+            "Falha: Estilo CSS que remove ou torna invisível o indicador de foco padrão.\n"
+            "Quando o CSS define outline: none ou outline: 0 para links, botões e campos "
+            "(em :focus ou no estilo geral) sem outro indicador, quem navega pelo teclado "
+            "não sabe qual elemento tem o foco.\n"
+            "Aplica-se quando: folha de estilo ou atributo style remove o outline de elementos "
+            "focáveis sem regra :focus/:focus-visible com borda, sombra ou fundo alternativos.\n"
+            "Correção: Manter o outline ou definir um estilo :focus-visible claramente visível."
+        ),
+    },
     {
         "id": "F79",
         "content": (